@@ -0,0 +1,63 @@
+"""Bill history lookups over a year of synthetic bills.
+
+    python benchmarks/bench_history.py [bills_per_day]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from smart_tray.history import BillHistory  # noqa: E402
+
+
+def timed(label, fn, repeat=200):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        found = fn()
+    print(f"{label:<32} {(time.perf_counter() - start) / repeat * 1000:7.3f} ms  ({len(found)} bills)")
+
+
+def main(per_day=400, days=365, lanes=8):
+    path = os.path.join(tempfile.gettempdir(), "bench_history.db")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    history = BillHistory(path)
+    products = [(f"{kind} {i}", random.randint(5, 300) * 10)
+                for kind in ("Shirt", "Denim", "Saree", "Kurta", "Scarf") for i in range(400)]
+    t0 = time.time() - days * 86400
+    serial = 0
+    epcs = []
+    start = time.perf_counter()
+    for day in range(days):
+        bills = []
+        for n in range(per_day):
+            rows = []
+            for name, price in random.sample(products, random.randint(1, 7)):
+                serial += 1
+                rows.append([f"E2{serial:022X}", name, price, 1, price])
+            subtotal = sum(r[4] for r in rows)
+            bills.append({"lane": str(random.randint(1, lanes)), "rows": rows, "subtotal": subtotal,
+                          "discount": 0, "total": subtotal, "ts": t0 + day * 86400 + n * 86400 / per_day})
+        history.record_many(bills)
+        epcs.append(rows[0][0])
+    print(f"{days * per_day} bills, {serial} lines written in {time.perf_counter() - start:.1f} s "
+          f"({os.path.getsize(path) / 2 ** 20:.0f} MiB)")
+
+    month = t0 + 200 * 86400
+    timed("by EPC", lambda: history.find(epc=random.choice(epcs)))
+    timed("by product, one month", lambda: history.find(product="Denim 12", since=month, until=month + 30 * 86400))
+    timed("by lane, one day", lambda: history.find(lane="3", since=month, until=month + 86400))
+    timed("by time, one hour", lambda: history.find(since=month, until=month + 3600))
+    timed("latest 50", lambda: history.find())
+    history.close()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
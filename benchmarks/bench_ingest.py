@@ -0,0 +1,37 @@
+"""Ingest throughput of the headless tray engine (no UI work per read).
+
+    python benchmarks/bench_ingest.py [reads]
+"""
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from smart_tray import Tray  # noqa: E402
+
+
+def main(reads=200_000):
+    with open(os.path.join(ROOT, "product_db.json")) as f:
+        product_db = json.load(f)
+    epcs = list(product_db) + ["E200STRAYTAG000000000000"]
+    stream = [random.choice(epcs) for _ in range(reads)]
+
+    tray = Tray(product_db)
+    start = time.perf_counter()
+    for epc in stream:
+        tray.scan(epc)
+    elapsed = time.perf_counter() - start
+    print(f"scan:    {reads / elapsed:>12,.0f} reads/s  ({elapsed * 1e6 / reads:.2f} µs/read)")
+
+    start = time.perf_counter()
+    for _ in range(10_000):
+        tray.summary()
+    elapsed = time.perf_counter() - start
+    print(f"summary: {elapsed * 1e6 / 10_000:>12.2f} µs")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
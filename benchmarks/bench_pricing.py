@@ -0,0 +1,95 @@
+"""Per-scan cost of incremental rule evaluation vs. re-pricing the whole tray.
+
+Also checks that item rules sharing units do not discount a unit twice.
+
+    python benchmarks/bench_pricing.py [rules] [lines]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from smart_tray import RuleSet, Tray  # noqa: E402
+
+
+def make_catalog(products, categories):
+    return {
+        f"E2{i:022X}": {"name": f"P{i % (products // 4)}", "price": random.randint(5, 300) * 10,
+                        "category": f"C{i % categories}"}
+        for i in range(products)
+    }
+
+
+def make_rules(n, catalog, categories):
+    names = sorted({p["name"] for p in catalog.values()})
+    rules = []
+    for i in range(n):
+        kind = i % 3
+        if kind == 0:
+            rules.append({"id": f"pct{i}", "type": "percent", "match": {"category": f"C{i % categories}"}, "percent": 5})
+        elif kind == 1:
+            rules.append({"id": f"bogo{i}", "type": "bogo", "match": {"name": random.choice(names)}, "buy": 2, "get": 1})
+        else:
+            rules.append({"id": f"set{i}", "type": "bundle", "price": 500,
+                          "components": [{"name": random.choice(names)}, {"name": random.choice(names)}]})
+    return rules
+
+
+def check_claims():
+    """A unit made free by BOGO must not also be priced into a bundle."""
+    catalog = {"J1": {"name": "Jeans", "price": 100, "category": "Bottoms"},
+               "J2": {"name": "Jeans", "price": 100, "category": "Bottoms"},
+               "J3": {"name": "Jeans", "price": 80, "category": "Bottoms"},
+               "K1": {"name": "Kurti", "price": 50, "category": "Tops"}}
+    rules = [{"id": "bogo", "type": "bogo", "match": {"name": "Jeans"}, "buy": 1, "get": 1},
+             {"id": "set", "type": "bundle", "components": [{"name": "Kurti"}, {"category": "Bottoms"}], "price": 120}]
+    tray = Tray(catalog)
+    pricing = RuleSet(rules, catalog).attach(tray)
+    for epc in catalog:
+        tray.scan(epc)
+    # BOGO takes J3 free with a Jeans at 100; the set gets Kurti + the other Jeans (150 -> 120)
+    assert pricing.applied() == [("bogo", 80), ("set", 30)], pricing.applied()
+    print(f"claims:      BOGO + bundle sharing units: {pricing.item_discount} off, no unit discounted twice")
+
+
+def main(n_rules=500, lines=5000):
+    check_claims()
+    categories = 200
+    catalog = make_catalog(20_000, categories)
+    rules = make_rules(n_rules, catalog, categories)
+    epcs = random.sample(list(catalog), lines)
+
+    start = time.perf_counter()
+    ruleset = RuleSet(rules, catalog)
+    print(f"compile {n_rules} rules: {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+    tray = Tray(catalog)
+    ruleset.attach(tray)
+    start = time.perf_counter()
+    for epc in epcs:
+        tray.scan(epc)
+    elapsed = time.perf_counter() - start
+    print(f"incremental: {elapsed * 1e6 / lines:8.2f} µs/scan while filling a {lines}-line tray")
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        tray.summary()
+    print(f"summary:     {(time.perf_counter() - start) * 1e3:8.3f} µs")
+
+    # baseline: price the full tray from scratch after each scan (sampled)
+    sample = 20
+    start = time.perf_counter()
+    for _ in range(sample):
+        full = RuleSet(rules, catalog)
+        fresh = Tray(catalog)
+        fresh.items = {epc: dict(line) for epc, line in tray.items.items()}
+        full.attach(fresh)
+        fresh.summary()
+    elapsed = time.perf_counter() - start
+    print(f"full re-eval:{elapsed * 1e6 / sample:8.0f} µs/scan at {lines} lines")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,42 @@
+"""ESC/POS receipt render + file write time per bill.
+
+    python benchmarks/bench_receipt.py [lines]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from smart_tray import Receipt, ReceiptPrinter, Tray, open_sink  # noqa: E402
+
+
+def main(lines=30, bills=2000):
+    catalog = {f"E2{i:022X}": {"name": f"Item {i % 900}", "price": random.randint(5, 300) * 10}
+               for i in range(5000)}
+    tray = Tray(catalog, lane=3)
+    for epc in random.sample(list(catalog), lines):
+        for _ in range(random.randint(1, 3)):
+            tray.scan(epc)
+    bill = tray.snapshot()
+    receipt = Receipt()
+
+    start = time.perf_counter()
+    for _ in range(bills):
+        data = receipt.render(bill)
+    render_us = (time.perf_counter() - start) / bills * 1e6
+
+    path = os.path.join(tempfile.gettempdir(), "bench_receipt.bin")
+    printer = ReceiptPrinter(open_sink(path), receipt)
+    start = time.perf_counter()
+    for _ in range(bills):
+        printer.print_bill(bill)
+    print_us = (time.perf_counter() - start) / bills * 1e6
+    printer.close()
+    os.remove(path)
+    print(f"{lines} lines, {len(data)} bytes: render {render_us:.1f} µs, render + file write {print_us:.1f} µs")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 30)
@@ -0,0 +1,77 @@
+"""Multi-core scaling of SQLite-shared trays: N worker processes, one lane each.
+
+    python benchmarks/bench_shared_trays.py [max_workers] [seconds]
+
+Each worker scans inventory rounds of 50 EPCs into its lane with
+``scan_many``. Compares one database file for all lanes (writers serialize
+on its WAL lock) with one file per lane (``{lane}`` in the store path).
+"""
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from smart_tray import SqliteStore, Tray  # noqa: E402
+
+ROUND = 50
+
+
+def make_catalog():
+    rng = random.Random(7)
+    return {f"E2{i:022X}": {"name": f"Item {i % 900}", "price": rng.randint(5, 300) * 10} for i in range(5000)}
+
+
+def worker(path, lane, seconds, start, counts):
+    catalog = make_catalog()
+    tray = SqliteStore(path).tray_factory(catalog, lane=lane) if path else Tray(catalog, lane=lane)
+    rng = random.Random(lane)
+    epcs = list(catalog)
+    rounds = [rng.sample(epcs, ROUND) for _ in range(64)]
+    start.wait()
+    reads, deadline, i = 0, time.perf_counter() + seconds, 0
+    while time.perf_counter() < deadline:
+        tray.scan_many(rounds[i % len(rounds)])
+        reads += ROUND
+        i += 1
+        if i % 40 == 0:
+            tray.complete()  # keep bills a realistic size
+    counts[lane] = reads
+
+
+def run(path, workers, seconds):
+    start = multiprocessing.Event()
+    counts = multiprocessing.Array("q", workers)
+    procs = [multiprocessing.Process(target=worker, args=(path, lane, seconds, start, counts))
+             for lane in range(workers)]
+    for p in procs:
+        p.start()
+    time.sleep(0.5)  # let every worker open its store
+    start.set()
+    for p in procs:
+        p.join()
+    return sum(counts) / seconds
+
+
+def main(max_workers=None, seconds=2.0):
+    max_workers = max_workers or max(4, os.cpu_count() or 1)
+    tmp = tempfile.mkdtemp(prefix="bench_shared_")
+    try:
+        print(f"{os.cpu_count()} CPUs, {ROUND}-read rounds, {seconds:.0f} s per point")
+        print(f"{'workers':>7} {'in-process':>14} {'one file':>14} {'file per lane':>14}")
+        workers = 1
+        while workers <= max_workers:
+            local = run(None, workers, seconds)
+            single = run(os.path.join(tmp, f"w{workers}.db"), workers, seconds)
+            sharded = run(os.path.join(tmp, f"w{workers}-{{lane}}.db"), workers, seconds)
+            print(f"{workers:7} {local:12,.0f}/s {single:12,.0f}/s {sharded:12,.0f}/s")
+            workers *= 2
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else None, float(sys.argv[2]) if len(sys.argv) > 2 else 2.0)
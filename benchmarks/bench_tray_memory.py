@@ -0,0 +1,47 @@
+"""Memory per line and summary/export cost: dict-backed Tray vs CompactTray.
+
+    python benchmarks/bench_tray_memory.py [lines]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from smart_tray import CatalogIndex, CompactTray, Tray  # noqa: E402
+
+
+def measure(name, tray, reads):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for epc in reads:
+        tray.scan(epc)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        tray.summary()
+    summary_us = (time.perf_counter() - start) * 1e3
+
+    start = time.perf_counter()
+    tray.write_csv(os.path.join(tempfile.gettempdir(), "bench_tray.csv"))
+    export_ms = (time.perf_counter() - start) * 1e3
+    print(f"{name:12} {(after - before) / len(tray):7.1f} B/line   summary {summary_us:6.2f} µs   csv {export_ms:6.2f} ms")
+
+
+def main(lines=5000):
+    catalog = {f"E2{i:022X}": {"name": f"Item {i % 900}", "price": random.randint(5, 300) * 10}
+               for i in range(50_000)}
+    index = CatalogIndex(catalog)
+    # reads arrive as fresh strings from the reader, not the catalog's key objects
+    reads = [epc.lower() + "\r" for epc in random.sample(list(catalog), lines)]
+
+    measure("Tray", Tray(catalog), reads)
+    measure("CompactTray", CompactTray(index), reads)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
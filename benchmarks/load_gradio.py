@@ -0,0 +1,222 @@
+"""Concurrent-cashier load test for the Gradio billing app.
+
+    python benchmarks/load_gradio.py [--sessions 1,2,4,8,16] [--duration 20]
+    python benchmarks/load_gradio.py --url http://127.0.0.1:7860   # app already running
+
+Starts ``finalCodes/rfid_billing_ui_final.py`` (unless ``--url`` is given)
+in a throwaway state directory with a copy of the catalog, so its bill
+history, journal and read log never touch the repo's. Then for each session
+count N runs N independent ``gradio_client`` sessions, each looping through
+a cashier-like mix of scan / qty change / CSV export / complete against the
+app's named endpoints. Per level it reports, for every
+endpoint, the latency distribution (submit to result) and the queue wait
+(submit until the job is seen processing; polled every ~2 ms), plus the
+server's CPU use and resident memory.
+
+Needs ``gradio_client`` (ships with gradio); ``psutil`` is used for server
+stats when installed, ``/proc`` otherwise (Linux).
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+from gradio_client import Client
+from gradio_client.utils import Status
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+APP = os.path.join(ROOT, "finalCodes", "rfid_billing_ui_final.py")
+POLL = 0.002
+
+# endpoint, weight: one cashier scans a lot, fixes a qty now and then, completes per ~15 scans
+MIX = [("scan", 70), ("inc", 6), ("dec", 6), ("remove", 2), ("export_csv", 4), ("complete", 6), ("reset", 1)]
+ENDPOINT_ARGS = {"scan": 1, "inc": 1, "dec": 1, "remove": 1}  # endpoints taking an EPC
+
+
+# ── SERVER ─────────────────────────────────────────────────────────────────────
+def state_dir(catalog):
+    """Temp dir laid out like the repo root: the app keeps its files in ``../`` of its cwd."""
+    state = tempfile.mkdtemp(prefix="load_gradio")
+    os.mkdir(os.path.join(state, "finalCodes"))
+    shutil.copy(catalog, os.path.join(state, "product_db.json"))
+    rules = os.path.join(ROOT, "pricing_rules.json")
+    if os.path.exists(rules):
+        shutil.copy(rules, state)
+    return state
+
+
+def start_app(app, port, state):
+    env = dict(os.environ, GRADIO_SERVER_PORT=str(port), GRADIO_ANALYTICS_ENABLED="False")
+    env.pop("SMART_TRAY_SOLD", None)  # one EPC per product: the registry would reject repeat sales
+    proc = subprocess.Popen([sys.executable, os.path.abspath(app)], cwd=os.path.join(state, "finalCodes"), env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}/"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            sys.exit(f"app exited with code {proc.returncode}")
+        try:
+            urllib.request.urlopen(url, timeout=1)
+            return proc, url
+        except OSError:
+            time.sleep(0.25)
+    proc.kill()
+    sys.exit("app did not come up within 60 s")
+
+
+class ProcessStats:
+    """CPU seconds and RSS of the server process (psutil, else /proc)."""
+
+    def __init__(self, pid):
+        self.pid = pid
+        try:
+            import psutil
+            self.proc = psutil.Process(pid)
+        except ImportError:
+            self.proc = None
+        self.ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    def cpu_seconds(self):
+        if self.proc is not None:
+            t = self.proc.cpu_times()
+            return t.user + t.system
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / self.ticks
+        except OSError:
+            return None
+
+    def rss_mb(self):
+        if self.proc is not None:
+            return self.proc.memory_info().rss / 2**20
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+        return None
+
+
+# ── SESSIONS ───────────────────────────────────────────────────────────────────
+def timed_call(client, endpoint, args):
+    """(latency, queue wait) in seconds for one event."""
+    start = time.perf_counter()
+    job = client.submit(*args, api_name=f"/{endpoint}")
+    started = None
+    while not job.done():
+        if started is None and job.status().code in (Status.PROCESSING, Status.ITERATING, Status.PROGRESS):
+            started = time.perf_counter()
+        time.sleep(POLL)
+    job.result()  # raises if the event failed
+    end = time.perf_counter()
+    return end - start, (started or end) - start
+
+
+def session(client, epcs, stop, samples, errors):
+    rng = random.Random()
+    endpoints, weights = zip(*MIX)
+    scanned = []
+    while not stop.is_set():
+        endpoint = rng.choices(endpoints, weights)[0]
+        if endpoint == "scan":
+            # ~5% stray tags from neighbouring racks
+            epc = rng.choice(epcs) if rng.random() > 0.05 else f"E200STRAY{rng.randrange(10**6):015d}"
+            scanned.append(epc)
+        elif endpoint in ENDPOINT_ARGS:
+            epc = rng.choice(scanned) if scanned else rng.choice(epcs)
+        elif endpoint in ("complete", "reset"):
+            scanned.clear()
+        args = [epc] if endpoint in ENDPOINT_ARGS else []
+        try:
+            latency, wait = timed_call(client, endpoint, args)
+        except Exception as e:
+            errors.append(f"{endpoint}: {e}")
+            continue
+        samples.append((endpoint, latency, wait))
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100 * len(sorted_values)))]
+
+
+def run_level(url, n, duration, epcs, stats):
+    clients = [Client(url, verbose=False, download_files=False) for _ in range(n)]
+    samples, errors, stop = [], [], threading.Event()
+    threads = [threading.Thread(target=session, args=(c, epcs, stop, samples, errors), daemon=True)
+               for c in clients]
+    cpu0, t0 = stats.cpu_seconds() if stats else None, time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    cpu1 = stats.cpu_seconds() if stats else None
+    for c in clients:
+        if hasattr(c, "close"):  # gradio_client >= 1.0
+            c.close()
+
+    print(f"\n── {n} session(s): {len(samples) / elapsed:,.1f} events/s, {len(errors)} errors", end="")
+    if cpu0 is not None and cpu1 is not None:
+        print(f", server CPU {100 * (cpu1 - cpu0) / elapsed:.0f}%", end="")
+    rss = stats.rss_mb() if stats else None
+    print(f", RSS {rss:.0f} MB" if rss is not None else "")
+    print(f"{'endpoint':<11}{'n':>6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'wait p50':>10}{'wait p95':>10}")
+    for endpoint, _ in MIX:
+        lat = sorted(l for e, l, _ in samples if e == endpoint)
+        wait = sorted(w for e, _, w in samples if e == endpoint)
+        if not lat:
+            continue
+        row = [percentile(lat, p) * 1e3 for p in (50, 95, 99, 100)] + [percentile(wait, p) * 1e3 for p in (50, 95)]
+        print(f"{endpoint:<11}{len(lat):>6}" + "".join(f"{v:>9.1f}" for v in row[:4])
+              + "".join(f"{v:>10.1f}" for v in row[4:]))
+    for error in errors[:3]:
+        print(f"  ⚠️ {error}")
+    return samples, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for the Gradio billing app")
+    parser.add_argument("--app", default=APP, help="Gradio app to launch (needs the same api_name endpoints)")
+    parser.add_argument("--url", help="test an already running app instead of launching one")
+    parser.add_argument("--port", type=int, default=7861)
+    parser.add_argument("--sessions", default="1,2,4,8,16", help="comma-separated session counts")
+    parser.add_argument("--duration", type=float, default=20, help="seconds per session count")
+    parser.add_argument("--catalog", default=os.path.join(ROOT, "product_db.json"))
+    args = parser.parse_args()
+
+    with open(args.catalog) as f:
+        epcs = list(json.load(f))
+    proc = state = None
+    try:
+        if args.url:
+            url, stats = args.url, None
+        else:
+            state = state_dir(args.catalog)
+            proc, url = start_app(args.app, args.port, state)
+            stats = ProcessStats(proc.pid)
+        for n in (int(s) for s in args.sessions.split(",")):
+            run_level(url, n, args.duration, epcs, stats)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(10)
+        if state is not None:
+            shutil.rmtree(state, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 import gradio as gr
-import json, os, pandas as pd
+import os, sys, pandas as pd
 import threading, time, random
 import tempfile
 from reportlab.lib.pagesizes import letter
@@ -9,7 +9,8 @@ from reportlab.lib.styles import getSampleStyleSheet
 import serial  # Make sure pyserial is installed
 import serial.tools.list_ports
 
-
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from smart_tray import COLUMNS, Tray, summary_text as format_summary
 
 # ── PRODUCT DATABASE ───────────────────────────────────────────────────────────
 product_db = {
@@ -25,34 +26,18 @@ product_db = {
     "E2000017221101441890VCXZ": {"name": "Chinos", "price": 1350}
 }
 
-scanned_items = {}
+tray = Tray(product_db)
 TEST_EPCS = list(product_db.keys())
 
 # ── BILLING LOGIC ──────────────────────────────────────────────────────────────
 def get_bill_df():
-    return pd.DataFrame([
-        {"EPC": epc, "Name": item["name"], "Price": item["price"],
-         "Qty": item["qty"], "Total": item["price"] * item["qty"]}
-        for epc, item in scanned_items.items()
-    ], columns=["EPC", "Name", "Price", "Qty", "Total"])
+    return pd.DataFrame(tray.rows(), columns=COLUMNS)
 
 def summary_text():
-    df = get_bill_df()
-    total = df["Total"].sum() if not df.empty else 0
-    return f"Subtotal: {total:.0f} BDT\nDiscount: 0 BDT\nTotal: {total:.0f} BDT"
+    return format_summary(tray.summary())
 
 def scan_epc(epc):
-    epc = epc.strip().upper()
-    if epc not in product_db:
-        return
-    if epc in scanned_items:
-        scanned_items[epc]["qty"] += 1
-    else:
-        scanned_items[epc] = {
-            "name": product_db[epc]["name"],
-            "price": product_db[epc]["price"],
-            "qty": 1
-        }
+    tray.scan(epc)
 
 def export_csv():
     df = get_bill_df()
@@ -160,7 +145,7 @@ with gr.Blocks(theme=gr.themes.Soft()) as demo:
         return f"✅ Scanned: {epc}", get_bill_df(), summary_text()
 
     def manual_reset():
-        scanned_items.clear()
+        tray.reset()
         return "🧹 Tray cleared", get_bill_df(), summary_text()
 
     scan_btn.click(manual_scan, inputs=[manual_in], outputs=[status, bill_tbl, summary])
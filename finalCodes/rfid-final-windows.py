@@ -1,14 +1,16 @@
 import gradio as gr
-import json, os, pandas as pd
-import threading, time, random
+import os, sys, pandas as pd
+import time, random
 import tempfile
-import serial
-import winsound
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from smart_tray import COLUMNS, Feedback, Tray, summary_text as format_summary
+from smart_tray.supervisor import SerialSupervisor
+
 # ── PRODUCT DATABASE ───────────────────────────────────────────────────────────
 product_db = {
     "E2000017221101441890ABCD": {"name": "T-Shirt", "price": 750},
@@ -23,35 +25,21 @@ product_db = {
     "E2000017221101441890VCXZ": {"name": "Chinos", "price": 1350}
 }
 
-scanned_items = {}
+tray = Tray(product_db)
+# beeps on a background worker; bursts of reads coalesce into one chirp
+feedback = Feedback()
+feedback.attach(tray)
 TEST_EPCS = list(product_db.keys())
 
 # ── BILLING LOGIC ──────────────────────────────────────────────────────────────
 def get_bill_df():
-    return pd.DataFrame([
-        {"EPC": epc, "Name": item["name"], "Price": item["price"],
-         "Qty": item["qty"], "Total": item["price"] * item["qty"]}
-        for epc, item in scanned_items.items()
-    ], columns=["EPC", "Name", "Price", "Qty", "Total"])
+    return pd.DataFrame(tray.rows(), columns=COLUMNS)
 
 def summary_text():
-    df = get_bill_df()
-    total = df["Total"].sum() if not df.empty else 0
-    return f"Subtotal: {total:.0f} BDT\nDiscount: 0 BDT\nTotal: {total:.0f} BDT"
+    return format_summary(tray.summary())
 
 def scan_epc(epc):
-    epc = epc.strip().upper()
-    if epc not in product_db:
-        return
-    if epc in scanned_items:
-        scanned_items[epc]["qty"] += 1
-    else:
-        scanned_items[epc] = {
-            "name": product_db[epc]["name"],
-            "price": product_db[epc]["price"],
-            "qty": 1
-        }
-    winsound.Beep(1000, 200)  # Beep on scan
+    tray.scan(epc)
 
 def export_csv():
     df = get_bill_df()
@@ -128,7 +116,7 @@ with gr.Blocks(theme=gr.themes.Soft()) as demo:
         return f"✅ Scanned: {epc}", get_bill_df(), summary_text()
 
     def manual_reset():
-        scanned_items.clear()
+        tray.reset()
         return "\U0001F9F9 Tray cleared", get_bill_df(), summary_text()
 
     scan_btn.click(manual_scan, inputs=[manual_in], outputs=[status, bill_tbl, summary])
@@ -139,20 +127,12 @@ with gr.Blocks(theme=gr.themes.Soft()) as demo:
 
     demo.load(refresh_ui, None, [bill_tbl, summary], every=1)
 
-    def read_from_rfid_serial():
-        try:
-            ser = serial.Serial("COM3", baudrate=9600, timeout=1)
-            print("✅ RFID reader connected on COM3")
-            while True:
-                raw = ser.readline().decode('utf-8').strip()
-                if raw:
-                    print(f"📡 Read tag: {raw}")
-                    scan_epc(raw)
-        except Exception as e:
-            print("❌ Error reading RFID:", e)
+    # reopens COM3 after a cable bump or replug instead of giving up
+    rfid_reader = SerialSupervisor("COM3", 9600, lambda epcs: [scan_epc(epc) for epc in epcs])
 
     def start_thread():
-        threading.Thread(target=read_from_rfid_serial, daemon=True).start()
+        if rfid_reader.state == "stopped":
+            rfid_reader.start()
 
     demo.load(start_thread)
 
@@ -1,98 +1,137 @@
 import gradio as gr
-import json, os, pandas as pd
+import os, sys, pandas as pd
 from datetime import datetime
-import threading, serial, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from smart_tray import (COLUMNS, LiveCatalog, ReceiptPrinter, RuleSet, StockTake, Tray, load_product_db,
+                        open_sink, snapshot_builder, summary_text as format_summary)
+from smart_tray.commission import SerialLedger, commission, write_job
+from smart_tray.history import BillHistory
+from smart_tray.journal import TrayJournal
+from smart_tray.readlog import ReadLog, parse_time
+from smart_tray.sold import SoldRegistry
+from smart_tray.strays import ReadFilter
+from smart_tray.supervisor import SerialSupervisor
+from smart_tray.sync import CatalogNode, HttpTransport
 
 # --- Persistent Product DB ---
 PRODUCT_DB_FILE = "../product_db.json"
-if os.path.exists(PRODUCT_DB_FILE):
-    with open(PRODUCT_DB_FILE, "r") as f:
-        product_db = json.load(f)
+PRODUCT_SNAPSHOT_FILE = "../product_db.snap"
+# every version is published as a shared mmap snapshot and swapped in atomically;
+# Admin saves and external edits of the JSON file both go through a new version
+catalog = LiveCatalog(load_product_db(PRODUCT_DB_FILE), path=PRODUCT_DB_FILE,
+                      build=snapshot_builder(PRODUCT_SNAPSHOT_FILE))
+catalog.watch()
+# lane node of a store master (python -m smart_tray.sync master): pull its catalog
+# deltas instead of copying product_db.json around; edit products on the master then
+CATALOG_MASTER = os.environ.get("SMART_TRAY_MASTER")   # e.g. "http://10.0.0.2:8100"
+if CATALOG_MASTER:
+    CatalogNode(catalog, HttpTransport(CATALOG_MASTER)).start()
+
+tray = Tray(catalog)
+
+# --- Pricing rules (category %, BOGO, bundles; see smart_tray.pricing) ---
+PRICING_RULES_FILE = "../pricing_rules.json"
+if os.path.exists(PRICING_RULES_FILE):
+    pricing_rules = RuleSet.load(PRICING_RULES_FILE, catalog)
 else:
-    product_db = {
-        "EPC001": {"name": "Men's Tee",     "price": 1290},
-        "EPC002": {"name": "Jeans",          "price": 1890},
-        "EPC003": {"name": "Kurti",          "price": 1150},
-        "EPC004": {"name": "Formal Shirt",   "price": 1490},
-    }
-    with open(PRODUCT_DB_FILE, "w") as f:
-        json.dump(product_db, f, indent=2)
-
-scanned_items = {}
-
-SERIAL_PORT = "/dev/ttyUSB0"   # or "COM3" on Windows
-BAUD_RATE   = 115200
-
-
-def save_product_db():
-    with open(PRODUCT_DB_FILE, "w") as f:
-        json.dump(product_db, f, indent=2)
-
-# --- Billing Logic ---
+    pricing_rules = RuleSet([], catalog)
+pricing_rules.attach(tray)
+catalog.subscribe(lambda old, new: pricing_rules.invalidate())
+
+# every tray change goes to a write-ahead journal: after a crash the open
+# tray is back on restart instead of being re-scanned
+tray_journal = TrayJournal("../journal")
+tray_journal.attach(tray)
+if len(tray):
+    print(f"✅ Restored open tray: {len(tray)} lines")
+
+# reader settings can be overridden without editing the code; for several
+# readers per host use python -m smart_tray.readers (one lane per port)
+SERIAL_PORT = os.environ.get("SMART_TRAY_PORT", "/dev/ttyUSB0")   # or "COM3" on Windows
+BAUD_RATE   = int(os.environ.get("SMART_TRAY_BAUD", 115200))
+READER_PROTOCOL = os.environ.get("SMART_TRAY_PROTOCOL", "line")   # or "inventory" for binary UHF readers
+# every raw read, for bill disputes: python -m smart_tray.readlog ../reads.ring slice --since ...
+read_log = ReadLog("../reads.ring")
+
+# reads of neighbouring racks and trays are dropped before any tray or UI work:
+# unknown / foreign EPCs are remembered for a while instead of looked up again
+READ_MIN_RSSI = None           # e.g. 40 (binary readers report RSSI; line readers don't)
+READ_ANTENNAS = None           # e.g. [1]: only the tray antenna
+READ_MIN_READS = 1             # e.g. 2: a tag must be read twice within a second
+read_filter = ReadFilter(catalog, min_rssi=READ_MIN_RSSI, antennas=READ_ANTENNAS, min_reads=READ_MIN_READS)
+
+# tags of completed bills: not billed twice, and what an exit gate checks
+# (python -m smart_tray.sold ../sold.log gate --port ...). Only for catalogs with
+# one tag per item (e.g. commissioned SGTINs): with one EPC per product, as in
+# product_db.json, quantity is counted by re-reading the same EPC and the first
+# sale would block every later one. Off unless SMART_TRAY_SOLD names the log.
+SOLD_TAGS_FILE = os.environ.get("SMART_TRAY_SOLD")   # e.g. "../sold.log"
+sold_tags = SoldRegistry(SOLD_TAGS_FILE) if SOLD_TAGS_FILE else None
+if sold_tags is not None:
+    sold_tags.attach(tray)
+
+# every completed bill, searchable by EPC / product / lane / date for returns
+bill_history = BillHistory("../bills.db")
+
+# --- Thermal receipts (ESC/POS) printed on Complete Bill ---
+RECEIPT_PRINTER = None         # e.g. "/dev/usb/lp0", "LPT1" or "tcp://192.168.1.50:9100"
+receipt_printer = ReceiptPrinter(open_sink(RECEIPT_PRINTER)) if RECEIPT_PRINTER else None
+
+
+# --- Billing UI adapters (state lives in `tray`) ---
 def get_bill_df():
-    return pd.DataFrame(
-        [
-            {
-                "EPC": epc,
-                "Name": item["name"],
-                "Price": item["price"],
-                "Qty": item["qty"],
-                "Total": item["price"] * item["qty"],
-            }
-            for epc, item in scanned_items.items()
-        ],
-        columns=["EPC", "Name", "Price", "Qty", "Total"])
+    return pd.DataFrame(tray.rows(), columns=COLUMNS)
 
 
 def summary_text():
-    df = get_bill_df()
-    subtotal = df["Total"].sum() if not df.empty else 0
-    return f"Subtotal: {subtotal:.0f} BDT\nDiscount: 0 BDT\nTotal: {subtotal:.0f} BDT"
+    return format_summary(tray.summary())
 
 
 def scan_epc(epc):
-    epc = epc.strip().upper()
-    if epc not in product_db:
+    # typed / keyboard-wedge entry is deliberate: only reader traffic goes through read_filter
+    if sold_tags is not None and sold_tags.is_sold(epc):
+        return (
+            f"⛔ Already sold: {epc.strip().upper()}",
+            get_bill_df(), summary_text(),
+            gr.update(choices=list(tray), value=None),
+            gr.update(value=""),
+            *([gr.update(visible=len(tray) > 0)]*7)
+        )
+    line = tray.scan(epc)
+    if line is None:
         # tray-empty? keep buttons hidden
         hidden = True
         return (
-            f"❌ EPC not found: {epc}",
+            f"❌ EPC not found: {epc.strip().upper()}",
             get_bill_df(), summary_text(),
-            gr.update(choices=list(scanned_items), value=None),
+            gr.update(choices=list(tray), value=None),
             gr.update(value=""),
             *([gr.update(visible=not hidden)]*7)
         )
-    # add/increment
-    scanned_items.setdefault(epc, {**product_db[epc], "qty":0})["qty"] += 1
 
     hidden = False
     return (
-        f"✅ Scanned: {product_db[epc]['name']}",
+        f"✅ Scanned: {line['name']}",
         get_bill_df(), summary_text(),
-        gr.update(choices=list(scanned_items), value=None),
+        gr.update(choices=list(tray), value=None),
         gr.update(value=""),
         *([gr.update(visible=not hidden)]*7)
     )
 
 def modify_qty(epc, action):
-    if epc in scanned_items:
-        if action=="inc":
-            scanned_items[epc]["qty"] += 1
-        elif action=="dec":
-            scanned_items[epc]["qty"] = max(1, scanned_items[epc]["qty"]-1)
-        elif action=="rem":
-            del scanned_items[epc]
-    hidden = (len(scanned_items)==0)
-    new_val = epc if epc in scanned_items else None
+    tray.modify(epc, action)
+    hidden = (len(tray)==0)
+    new_val = epc if epc in tray else None
     return (
         get_bill_df(), summary_text(),
-        gr.update(choices=list(scanned_items), value=new_val),
+        gr.update(choices=list(tray), value=new_val),
         *([gr.update(visible=not hidden)]*7)
     )
 
 
 def reset_tray():
-    scanned_items.clear()
+    tray.reset()
     hidden = True
     return (
         "🧹 Tray cleared",
@@ -102,10 +141,8 @@ def reset_tray():
     )
 
 def export_csv():
-    df = get_bill_df()
     fname = f"bill_{datetime.now():%Y%m%d_%H%M%S}.csv"
-    df.to_csv(fname, index=False)
-    return fname
+    return tray.write_csv(fname)
 
 
 def export_pdf():
@@ -137,8 +174,14 @@ def export_pdf():
 
 
 def complete_bill():
-    msg = summary_text()+"\n✅ Bill completed."
-    scanned_items.clear()
+    bill = tray.complete()
+    bill_id = bill_history.record(bill)
+    msg = format_summary(bill)+f"\n✅ Bill #{bill_id} completed."
+    if receipt_printer is not None:
+        try:
+            receipt_printer.print_bill(bill)
+        except OSError as e:
+            msg += f"\n⚠️ Receipt not printed: {e}"
     hidden = True
     return (
         msg,
@@ -148,32 +191,120 @@ def complete_bill():
     )
 
 # --- Admin Logic ---
+def lookup_product(epc):
+    product = catalog.get(epc.strip().upper())
+    if product is None:
+        return "", "", f"❌ EPC not found"
+    return product["name"], product["price"], f"🔎 {product['name']} ({epc})"
+
 def save_product(epc, name, price):
-    product_db[epc] = {"name": name, "price": float(price)}
-    save_product_db()
+    catalog.apply({epc: {"name": name, "price": float(price)}})
     return f"✅ Saved {name} ({epc})"
 
 def delete_product(epc):
-    if epc in product_db:
-        del product_db[epc]
-        save_product_db()
+    if epc in catalog:
+        catalog.apply(deletes=[epc])
         return f"🗑 Deleted {epc}"
     return f"❌ EPC not found"
 
 
-def serial_reader():
+# --- Commissioning: SGTIN-96 EPCs for new stock, one catalog version per shipment ---
+SERIAL_LEDGER_FILE = "../serials.json"
+COMPANY_PREFIX_LENGTH = 7      # digits of the GS1 company prefix inside our GTINs
+serial_ledger = SerialLedger(SERIAL_LEDGER_FILE)
+
+
+def commission_stock(gtin, qty, name, price, sku):
+    # empty gr.Number fields arrive as None
+    if not gtin or not name or qty is None or price is None:
+        return "❌ Enter GTIN, name, quantity and price", None
+    try:
+        tags = commission(catalog, [{"gtin": gtin, "qty": int(qty), "name": name, "price": float(price),
+                                     "sku": (sku or "").strip()}], serial_ledger, COMPANY_PREFIX_LENGTH)
+    except ValueError as e:
+        return f"❌ {e}", None
+    job = write_job(tags, f"tags_{datetime.now():%Y%m%d_%H%M%S}.zpl")
+    return f"✅ {len(tags)} EPCs for {name}: serials {tags[0][2]}–{tags[-1][2]}", job
+
+
+# --- Returns: find the original bill ---
+BILL_COLUMNS = ["Bill #", "Time", "Lane", "Items", "Total"]
+
+
+def search_bills(epc, product, since, until):
+    try:
+        bills = bill_history.find(epc=epc.strip(), product=product.strip(),
+                                  since=parse_time(since.strip() or None), until=parse_time(until.strip() or None))
+    except ValueError:
+        return "❌ Dates as YYYY-MM-DD or YYYY-MM-DD HH:MM", None
+    rows = [[b["id"], datetime.fromtimestamp(b["ts"]).strftime("%Y-%m-%d %H:%M"), b["lane"] or "",
+             sum(r[3] for r in b["rows"]), b["total"]] for b in bills]
+    return f"🔎 {len(bills)} bills", pd.DataFrame(rows, columns=BILL_COLUMNS)
+
+
+def show_bill(bill_id):
     try:
-        ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1)
-        print(f"✅ Listening on {SERIAL_PORT} @ {BAUD_RATE} baud")
-        while True:
-            line = ser.readline().decode("utf-8").strip()
-            if line:
-                print(f"🔍 Tag read: {line}")
-                # feed into your billing logic exactly as if you’d clicked “Scan”
-                scan_epc(line)
-            time.sleep(0.05)
-    except Exception as e:
-        print(f"⚠️ Serial error: {e}")
+        bill = bill_history.get(int(bill_id))
+    except (TypeError, ValueError):
+        bill = None
+    if bill is None:
+        return f"❌ No bill #{bill_id}", None
+    stamp = datetime.fromtimestamp(bill["ts"]).strftime("%Y-%m-%d %H:%M:%S")
+    return f"🧾 Bill #{bill['id']} — {stamp}\n{format_summary(bill)}", pd.DataFrame(bill["rows"], columns=COLUMNS)
+
+
+def return_item(epc):
+    epc = epc.strip().upper()
+    if sold_tags is None:
+        return "❌ No sold-tag registry (set SMART_TRAY_SOLD)"
+    if sold_tags.remove_many([epc]):
+        return f"↩️ {epc} returned: it can be sold again"
+    return f"❌ {epc} is not marked sold"
+
+
+# --- Stock-take mode: while a count runs, reader input goes to it instead of the tray ---
+stock_count = None
+
+
+def start_stock_take():
+    global stock_count
+    stock_count = StockTake(catalog)
+    read_filter.enabled = False  # count every tag in range, unknown ones included
+    return "📦 Stock-take running: reads are counted, not billed", None
+
+
+def stock_take_report():
+    if stock_count is None:
+        return "❌ No stock-take running", None
+    report = stock_count.reconcile()
+    rows = [[group, v["expected"], v["counted"], v["variance"]] for group, v in sorted(report["variances"].items())]
+    msg = (f"Reads: {report['reads']}  Tags: {report['counted']}/{report['expected']}\n"
+           f"Missing: {len(report['missing'])}  Unexpected: {len(report['unexpected'])}  "
+           f"Unknown: {len(report['unknown'])}")
+    return msg, pd.DataFrame(rows, columns=["SKU", "Expected", "Counted", "Variance"])
+
+
+def stop_stock_take():
+    global stock_count
+    msg, variances = stock_take_report()
+    stock_count = None
+    read_filter.enabled = True
+    return msg + "\n🛑 Stock-take stopped, back to billing", variances
+
+
+def on_reads(epcs):
+    if stock_count is not None:
+        stock_count.add_many(epcs)
+    elif sold_tags is None:
+        tray.scan_many(epcs)
+    else:
+        tray.scan_many([epc for epc in epcs if not sold_tags.is_sold(epc)])
+
+
+# the supervisor reopens the port after a cable bump / USB reset (also when it
+# comes back under another name) and keeps reads flowing to on_reads meanwhile
+serial_supervisor = SerialSupervisor(SERIAL_PORT, BAUD_RATE, on_reads, READER_PROTOCOL, log=read_log,
+                                     read_filter=read_filter)
 
 # --- UI ---
 with gr.Blocks(theme=gr.themes.Soft()) as demo:
@@ -198,6 +329,7 @@ with gr.Blocks(theme=gr.themes.Soft()) as demo:
             btn_csv = gr.Button("Export CSV", visible=False)
             btn_pdf = gr.Button("Export PDF", visible=False)
 
+        # api_name: stable endpoints for gradio_client (benchmarks/load_gradio.py)
         scan_btn.click(
             scan_epc,
             inputs=[epc_in],
@@ -207,7 +339,8 @@ with gr.Blocks(theme=gr.themes.Soft()) as demo:
                 btn_inc, btn_dec, btn_rem,
                 btn_reset, btn_complete,
                 btn_csv, btn_pdf
-            ]
+            ],
+            api_name="scan"
         )
         btn_inc.click(
             lambda e: modify_qty(e, "inc"),
@@ -217,7 +350,8 @@ with gr.Blocks(theme=gr.themes.Soft()) as demo:
                 btn_inc, btn_dec, btn_rem,
                 btn_reset, btn_complete,
                 btn_csv, btn_pdf
-            ]
+            ],
+            api_name="inc"
         )
         btn_dec.click(
             lambda e: modify_qty(e, "dec"),
@@ -227,7 +361,8 @@ with gr.Blocks(theme=gr.themes.Soft()) as demo:
                 btn_inc, btn_dec, btn_rem,
                 btn_reset, btn_complete,
                 btn_csv, btn_pdf
-            ]
+            ],
+            api_name="dec"
         )
         btn_rem.click(
             lambda e: modify_qty(e, "rem"),
@@ -237,7 +372,8 @@ with gr.Blocks(theme=gr.themes.Soft()) as demo:
                 btn_inc, btn_dec, btn_rem,
                 btn_reset, btn_complete,
                 btn_csv, btn_pdf
-            ]
+            ],
+            api_name="remove"
         )
         btn_reset.click(
             reset_tray,
@@ -247,7 +383,8 @@ with gr.Blocks(theme=gr.themes.Soft()) as demo:
                 btn_inc, btn_dec, btn_rem,
                 btn_reset, btn_complete,
                 btn_csv, btn_pdf
-            ]
+            ],
+            api_name="reset"
         )
         btn_complete.click(
             complete_bill,
@@ -257,19 +394,58 @@ with gr.Blocks(theme=gr.themes.Soft()) as demo:
                 btn_inc, btn_dec, btn_rem,
                 btn_reset, btn_complete,
                 btn_csv, btn_pdf
-            ]
+            ],
+            api_name="complete"
         )
-        btn_csv.click(lambda: export_csv(), outputs=gr.File())
-        btn_pdf.click(lambda: export_pdf(), outputs=gr.File())
+        btn_csv.click(lambda: export_csv(), outputs=gr.File(), api_name="export_csv")
+        btn_pdf.click(lambda: export_pdf(), outputs=gr.File(), api_name="export_pdf")
+
+    with gr.Tab("📦 Stock Take"):
+        stock_msg = gr.Textbox(label="Status", lines=3, interactive=False)
+        with gr.Row():
+            btn_count_start = gr.Button("Start Count")
+            btn_count_report = gr.Button("Reconcile")
+            btn_count_stop = gr.Button("Stop Count")
+        stock_df = gr.Dataframe(headers=["SKU", "Expected", "Counted", "Variance"], interactive=False)
+
+        btn_count_start.click(start_stock_take, outputs=[stock_msg, stock_df])
+        btn_count_report.click(stock_take_report, outputs=[stock_msg, stock_df])
+        btn_count_stop.click(stop_stock_take, outputs=[stock_msg, stock_df])
+
+    with gr.Tab("↩️ Returns"):
+        with gr.Row():
+            ret_epc = gr.Textbox(label="Garment EPC")
+            ret_product = gr.Textbox(label="Product name starts with")
+            ret_since = gr.Textbox(label="From (YYYY-MM-DD)")
+            ret_until = gr.Textbox(label="To (YYYY-MM-DD)")
+        with gr.Row():
+            btn_search = gr.Button("Search Bills")
+            btn_return = gr.Button("Return Item (EPC)")
+        ret_msg = gr.Textbox(label="Status", lines=4, interactive=False)
+        bills_df = gr.Dataframe(headers=BILL_COLUMNS, interactive=False)
+        with gr.Row():
+            ret_bill = gr.Textbox(label="Bill #")
+            btn_show = gr.Button("Show Bill")
+        bill_lines_df = gr.Dataframe(headers=COLUMNS, interactive=False)
+
+        btn_search.click(search_bills, inputs=[ret_epc, ret_product, ret_since, ret_until],
+                         outputs=[ret_msg, bills_df], api_name="search_bills")
+        btn_show.click(show_bill, inputs=[ret_bill], outputs=[ret_msg, bill_lines_df], api_name="show_bill")
+        btn_return.click(return_item, inputs=[ret_epc], outputs=[ret_msg], api_name="return_item")
 
     with gr.Tab("🛠️ Admin"):
         epc_admin  = gr.Textbox(label="EPC")
         name_admin = gr.Textbox(label="Product Name")
         price_admin= gr.Textbox(label="Price")
         admin_msg  = gr.Textbox(label="Admin Status", interactive=False)
+        btn_lookup = gr.Button("Lookup")
         btn_save   = gr.Button("Save/Update")
         btn_del    = gr.Button("Delete")
 
+        btn_lookup.click(lookup_product,
+                         inputs=[epc_admin],
+                         outputs=[name_admin, price_admin, admin_msg])
+
         btn_save.click(save_product,
                        inputs=[epc_admin, name_admin, price_admin],
                        outputs=[admin_msg])
@@ -277,5 +453,16 @@ with gr.Blocks(theme=gr.themes.Soft()) as demo:
                       inputs=[epc_admin],
                       outputs=[admin_msg])
 
-threading.Thread(target=serial_reader, daemon=True).start()
+        gr.Markdown("### Commission new stock")
+        with gr.Row():
+            gtin_admin = gr.Textbox(label="GTIN")
+            qty_admin  = gr.Number(label="Quantity", value=1, precision=0)
+            sku_admin  = gr.Textbox(label="SKU (optional)")
+        btn_commission = gr.Button("Generate EPCs")
+        tag_job = gr.File(label="Tag printer job")
+        btn_commission.click(commission_stock,
+                             inputs=[gtin_admin, qty_admin, name_admin, price_admin, sku_admin],
+                             outputs=[admin_msg, tag_job])
+
+serial_supervisor.start()
 demo.launch()
@@ -4,6 +4,8 @@ import threading
 import serial
 import time
 
+from smart_tray import COLUMNS, RuleSet, Tray
+
 # -----------------------------
 # Config
 # -----------------------------
@@ -16,38 +18,31 @@ product_db = {
     "EPC003": {"name": "Kurti", "price": 1150},
     "EPC004": {"name": "Formal Shirt", "price": 1490},
 }
-scanned_items = {}
-discount = 0
-refresh_flag = False
+tray = Tray(product_db)
+pricing = RuleSet([], product_db).attach(tray)
+rendered_version = -1
 
 # -----------------------------
 # Billing Functions
 # -----------------------------
 def get_bill_df():
-    rows = []
-    for epc, item in scanned_items.items():
-        total = item["price"] * item["qty"]
-        rows.append([epc, item["name"], item["price"], item["qty"], total])
-    return pd.DataFrame(rows, columns=["EPC", "Name", "Price", "Qty", "Total"])
+    return pd.DataFrame(tray.rows(), columns=COLUMNS)
 
 def update_summary():
-    df = get_bill_df()
-    if df.empty:
+    if not len(tray):
         return "Subtotal: 0 BDT\nDiscount: 0 BDT\nTotal: 0 BDT"
-    subtotal = df["Total"].sum()
-    discount_amt = subtotal * (discount / 100)
-    total = subtotal - discount_amt
-    return f"Subtotal: {subtotal} BDT\nDiscount: {discount_amt:.0f} BDT\nTotal: {total:.0f} BDT"
+    summary = tray.summary()
+    return f"Subtotal: {summary['subtotal']} BDT\nDiscount: {summary['discount']:.0f} BDT\nTotal: {summary['total']:.0f} BDT"
 
 def get_ui_elements():
     elements = []
-    for epc, item in scanned_items.items():
+    for epc, name, price, qty, _ in tray.rows():
         with gr.Row() as row:
             elements.extend([
                 gr.Textbox(value=epc, interactive=False, show_label=False),
-                gr.Textbox(value=item["name"], interactive=False, show_label=False),
-                gr.Textbox(value=item["price"], interactive=False, show_label=False),
-                gr.Textbox(value=item["qty"], interactive=False, show_label=False),
+                gr.Textbox(value=name, interactive=False, show_label=False),
+                gr.Textbox(value=price, interactive=False, show_label=False),
+                gr.Textbox(value=qty, interactive=False, show_label=False),
                 gr.Button("+", elem_id=f"inc-{epc}", scale=0.5),
                 gr.Button("-", elem_id=f"dec-{epc}", scale=0.5),
                 gr.Button("x", elem_id=f"rem-{epc}", scale=0.5),
@@ -58,44 +53,38 @@ def get_ui_elements():
 # Action Functions
 # -----------------------------
 def scan_epc(epc):
-    global refresh_flag
     epc = epc.strip().upper()
     if not epc or epc not in product_db:
         return "⚠️ Invalid EPC tag"
-    if epc in scanned_items:
+    if epc in tray:
         return f"⚠️ Already in tray: {product_db[epc]['name']}"
-    scanned_items[epc] = {"name": product_db[epc]["name"], "price": product_db[epc]["price"], "qty": 1}
-    refresh_flag = True
-    return f"✅ Scanned: {product_db[epc]['name']}"
+    line = tray.scan(epc)
+    return f"✅ Scanned: {line['name']}"
 
 def reset_tray():
-    scanned_items.clear()
+    tray.reset()
     return "🧹 Tray cleared!"
 
 def set_discount(p):
-    global discount
-    discount = p
+    pricing.manual_percent = p
     return update_summary()
 
 def action_handler(action_epc):
     action, epc = action_epc.split(":")
-    if epc not in scanned_items:
+    line = tray.get(epc)
+    if line is None:
         return
     if action == "inc":
-        scanned_items[epc]["qty"] += 1
+        tray.set_qty(epc, line["qty"] + 1)
     elif action == "dec":
-        if scanned_items[epc]["qty"] > 1:
-            scanned_items[epc]["qty"] -= 1
-        else:
-            del scanned_items[epc]
+        tray.set_qty(epc, line["qty"] - 1)
     elif action == "rem":
-        del scanned_items[epc]
+        tray.set_qty(epc, 0)
 
 # -----------------------------
 # Serial Reader
 # -----------------------------
 def serial_reader():
-    global refresh_flag
     try:
         ser = serial.Serial(SERIAL_PORT, BAUD_RATE)
         print(f"✅ Connected to {SERIAL_PORT}")
@@ -104,7 +93,6 @@ def serial_reader():
                 epc = ser.readline().decode("utf-8").strip()
                 print(f"🔍 Tag detected: {epc}")
                 scan_epc(epc)
-                refresh_flag = True
             time.sleep(0.5)
     except Exception as e:
         print(f"⚠️ Serial error: {e}")
@@ -132,9 +120,9 @@ with gr.Blocks() as demo:
     discount_slider.change(fn=set_discount, inputs=discount_slider, outputs=summary)
 
     def refresh_ui():
-        global refresh_flag
-        if refresh_flag:
-            refresh_flag = False
+        global rendered_version
+        if tray.version != rendered_version:
+            rendered_version = tray.version
             return get_ui_elements(), update_summary()
         return gr.update(), gr.update()
 
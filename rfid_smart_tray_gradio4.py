@@ -5,6 +5,8 @@ import threading
 import serial
 import time
 
+from smart_tray import COLUMNS, Tray
+
 # -----------------------------
 # Config
 # -----------------------------
@@ -18,24 +20,19 @@ product_db = {
     "EPC004": {"name": "Formal Shirt", "price": 1490}
 }
 
-scanned_items = {}
+tray = Tray(product_db)
 discount = 0
 
 # -----------------------------
 # Billing Functions
 # -----------------------------
 def get_bill_df():
-    rows = []
-    for epc, item in scanned_items.items():
-        total = item["price"] * item["qty"]
-        rows.append([epc, item["name"], item["price"], item["qty"], total])
-    return pd.DataFrame(rows, columns=["EPC", "Name", "Price", "Qty", "Total"])
+    return pd.DataFrame(tray.rows(), columns=COLUMNS)
 
 def update_summary():
-    df = get_bill_df()
-    if df.empty:
+    if not len(tray):
         return "Subtotal: 0 BDT\nDiscount: 0 BDT\nTotal: 0 BDT"
-    subtotal = df["Total"].sum()
+    subtotal = tray.summary()["subtotal"]
     discount_amt = subtotal * (discount / 100)
     total = subtotal - discount_amt
     return f"Subtotal: {subtotal} BDT\nDiscount: {discount_amt:.0f} BDT\nTotal: {total:.0f} BDT"
@@ -45,10 +42,10 @@ def refresh_ui():
 
 def render_items():
     rows = []
-    for epc, item in scanned_items.items():
+    for epc, name, _, qty, _ in tray.rows():
         with gr.Row() as row:
-            gr.Textbox(value=item['name'], label="Item", interactive=False)
-            gr.Textbox(value=str(item['qty']), label="Qty", interactive=False)
+            gr.Textbox(value=name, label="Item", interactive=False)
+            gr.Textbox(value=str(qty), label="Qty", interactive=False)
             with gr.Row():
                 gr.Button(value="➕", elem_id=f"inc-{epc}")
                 gr.Button(value="➖", elem_id=f"dec-{epc}")
@@ -63,17 +60,13 @@ def scan_epc(epc):
     epc = epc.strip().upper()
     if not epc or epc not in product_db:
         return "⚠️ Invalid EPC tag", refresh_ui()
-    if epc in scanned_items:
+    if epc in tray:
         return f"⚠️ Already in tray: {product_db[epc]['name']}", refresh_ui()
-    scanned_items[epc] = {
-        "name": product_db[epc]["name"],
-        "price": product_db[epc]["price"],
-        "qty": 1
-    }
+    tray.scan(epc)
     return f"✅ Scanned: {product_db[epc]['name']}", refresh_ui()
 
 def reset_tray():
-    scanned_items.clear()
+    tray.reset()
     return "🧹 Tray cleared!", refresh_ui()
 
 def set_discount(p):
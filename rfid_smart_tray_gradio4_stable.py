@@ -5,6 +5,8 @@ import threading
 import serial
 import time
 
+from smart_tray import COLUMNS, Tray
+
 # -----------------------------
 # Config
 # -----------------------------
@@ -18,7 +20,7 @@ product_db = {
     "EPC004": {"name": "Formal Shirt", "price": 1490},
 }
 
-scanned_items = {}
+tray = Tray(product_db)
 discount = 0
 
 # -----------------------------
@@ -26,21 +28,16 @@ discount = 0
 # -----------------------------
 
 def get_bill_df():
-    rows = []
-    for epc, item in scanned_items.items():
-        total = item["price"] * item["qty"]
-        rows.append([epc, item["name"], item["price"], item["qty"], total])
-    return pd.DataFrame(rows, columns=["EPC", "Name", "Price", "Qty", "Total"])
+    return pd.DataFrame(tray.rows(), columns=COLUMNS)
 
 def render_table():
     df = get_bill_df()
     return df.to_markdown(index=False) if not df.empty else "No items in tray."
 
 def update_summary():
-    df = get_bill_df()
-    if df.empty:
+    if not len(tray):
         return "Subtotal: 0 BDT\nDiscount: 0 BDT\nTotal: 0 BDT"
-    subtotal = df["Total"].sum()
+    subtotal = tray.summary()["subtotal"]
     discount_amt = subtotal * (discount / 100)
     total = subtotal - discount_amt
     return f"Subtotal: {subtotal} BDT\nDiscount: {discount_amt:.0f} BDT\nTotal: {total:.0f} BDT"
@@ -49,31 +46,25 @@ def scan_epc(epc):
     epc = epc.strip().upper()
     if not epc or epc not in product_db:
         return "⚠️ Invalid EPC tag", render_table(), update_summary()
-    if epc in scanned_items:
+    if epc in tray:
         return f"⚠️ Already scanned: {product_db[epc]['name']}", render_table(), update_summary()
-    scanned_items[epc] = {
-        "name": product_db[epc]["name"],
-        "price": product_db[epc]["price"],
-        "qty": 1
-    }
+    tray.scan(epc)
     return f"✅ Scanned: {product_db[epc]['name']}", render_table(), update_summary()
 
 def adjust_qty(epc, action):
-    if epc not in scanned_items:
+    line = tray.get(epc)
+    if line is None:
         return render_table(), update_summary()
     if action == "inc":
-        scanned_items[epc]["qty"] += 1
+        tray.set_qty(epc, line["qty"] + 1)
     elif action == "dec":
-        if scanned_items[epc]["qty"] > 1:
-            scanned_items[epc]["qty"] -= 1
-        else:
-            del scanned_items[epc]
+        tray.set_qty(epc, line["qty"] - 1)
     elif action == "rem":
-        del scanned_items[epc]
+        tray.set_qty(epc, 0)
     return render_table(), update_summary()
 
 def reset_tray():
-    scanned_items.clear()
+    tray.reset()
     return "🧹 Tray cleared!", render_table(), update_summary()
 
 def set_discount(p):
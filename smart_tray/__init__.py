@@ -0,0 +1,60 @@
+from .catalog import CatalogIndex, load_product_db, save_product_db
+from .compact import CompactTray
+from .feedback import AudioSink, Feedback, bell_sink, null_sink
+from .history import BillHistory
+from .journal import TrayJournal
+from .lanes import Lanes
+from .live import CatalogVersion, LiveCatalog, check_products, snapshot_builder
+from .pricing import RuleSet, TrayPricing
+from .readers import MultiReader
+from .readlog import ReadLog
+from .receipt import Receipt, ReceiptPrinter, open_sink
+from .shared import SqliteStore, SqliteTray
+from .sold import SoldRegistry
+from .snapshot import MmapCatalog, compile_catalog, open_snapshot
+from .stocktake import StockTake
+from .strays import ReadFilter
+from .supervisor import SerialSupervisor
+from .sync import CatalogMaster, CatalogNode
+from .tray import COLUMNS, CURRENCY, Tray, normalize_epc, summary_text
+
+__all__ = [
+    "AudioSink",
+    "BillHistory",
+    "COLUMNS",
+    "CURRENCY",
+    "CatalogIndex",
+    "CatalogMaster",
+    "CatalogNode",
+    "CatalogVersion",
+    "CompactTray",
+    "Feedback",
+    "Lanes",
+    "LiveCatalog",
+    "MmapCatalog",
+    "MultiReader",
+    "ReadFilter",
+    "ReadLog",
+    "Receipt",
+    "ReceiptPrinter",
+    "RuleSet",
+    "SerialSupervisor",
+    "SoldRegistry",
+    "SqliteStore",
+    "SqliteTray",
+    "StockTake",
+    "Tray",
+    "TrayJournal",
+    "TrayPricing",
+    "bell_sink",
+    "check_products",
+    "compile_catalog",
+    "load_product_db",
+    "normalize_epc",
+    "null_sink",
+    "open_sink",
+    "open_snapshot",
+    "save_product_db",
+    "snapshot_builder",
+    "summary_text",
+]
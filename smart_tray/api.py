@@ -0,0 +1,340 @@
+"""JSON + WebSocket API for POS terminals and handhelds.
+
+    python -m smart_tray.api --catalog product_db.json --port 8000
+    python -m smart_tray.api --store trays-{lane}.db --workers 4
+
+Handlers are ``async``: with in-memory trays (microseconds per call) they
+run on the event loop and never hop to the threadpool; batch endpoints take
+whole inventory rounds in one request instead of one call per EPC. With
+``--store`` trays live in SQLite (one short WAL transaction per call, which
+may wait on another process's write), so tray calls run in the threadpool,
+and any number of worker processes serve the same lanes. Bill history
+lookups always run in the threadpool, and so does completing a bill when
+``--history``, ``--sold`` or ``--journal`` record it (SQLite write, flock,
+fsync).
+"""
+import argparse
+import asyncio
+import os
+import shlex
+import sys
+
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import BaseModel, Field
+
+from .catalog import CatalogIndex, load_product_db
+from .history import DEFAULT_LIMIT, BillHistory
+from .journal import TrayJournal
+from .compact import CompactTray
+from .lanes import Lanes
+from .live import LiveCatalog, snapshot_builder
+from .readers import MultiReader, load_config as load_readers
+from .shared import SqliteStore
+from .snapshot import open_snapshot
+from .sold import SoldRegistry
+from .tray import Tray, normalize_epc
+
+MAX_BATCH = 1000
+STREAM_QUEUE = 1024
+STREAM_POLL = 0.2  # seconds between version checks on shared trays
+
+
+class ScanBatch(BaseModel):
+    epcs: list[str] = Field(min_length=1, max_length=MAX_BATCH)
+
+
+class QtyUpdate(BaseModel):
+    qty: int = Field(ge=0)
+
+
+def tray_delta(tray, event, epc, line):
+    delta = {"lane": tray.lane, "event": event, "version": tray.version, "subtotal": tray.subtotal}
+    if event in ("scan", "qty", "unknown"):
+        delta["epc"] = epc
+        delta["qty"] = line["qty"] if line else 0
+    elif event == "complete":
+        delta["total"] = line["total"]
+    return delta
+
+
+def create_app(lanes, sold=None, history=None, blocking=False, journal=None):
+    """``blocking``: trays do I/O (``--store``), so tray calls run in the threadpool."""
+    app = FastAPI(title="RFID Smart Tray API")
+    app.state.lanes = lanes
+    app.state.sold = sold
+    app.state.history = history
+    app.state.journal = journal
+    # complete listeners write to disk even with in-memory trays
+    completes_blocking = blocking or sold is not None or history is not None or journal is not None
+
+    async def call(fn, *args):
+        return await asyncio.to_thread(fn, *args) if blocking else fn(*args)
+
+    def summary(tray):
+        return {"lane": tray.lane, **tray.summary(), "lines": len(tray), "version": tray.version}
+
+    def lane_summary(lane):
+        return summary(lanes.get(lane))
+
+    # ── CATALOG ────────────────────────────────────────────────────────────────
+    @app.get("/products/{epc}")
+    async def read_product(epc: str):
+        epc = normalize_epc(epc)
+        product = lanes.catalog.get(epc)
+        if product is None:
+            raise HTTPException(404, f"EPC not found: {epc}")
+        return {"epc": epc, **product}
+
+    @app.get("/sold/{epc}")
+    async def read_sold(epc: str):
+        if sold is None:
+            raise HTTPException(404, "no sold-tag registry (start with --sold)")
+        epc = normalize_epc(epc)
+        return {"epc": epc, "sold": sold.is_sold(epc)}
+
+    # ── TRAYS ──────────────────────────────────────────────────────────────────
+    def scan_batch(lane, epcs):
+        tray = lanes.get(lane)
+        already_sold = []
+        if sold is not None:
+            already_sold = [epc for epc in epcs if sold.is_sold(epc)]
+            if already_sold:
+                epcs = [epc for epc in epcs if epc not in already_sold]
+        unknown = tray.scan_many(epcs)
+        return {**summary(tray), "accepted": len(epcs) - len(unknown), "unknown": unknown, "sold": already_sold}
+
+    def set_line_qty(lane, epc, qty):
+        tray = lanes.get(lane)
+        epc = normalize_epc(epc)
+        if epc not in tray:
+            raise HTTPException(404, f"EPC not in tray: {epc}")
+        tray.set_qty(epc, qty)
+        return summary(tray)
+
+    def reset_lane(lane):
+        tray = lanes.get(lane)
+        tray.reset()
+        return summary(tray)
+
+    @app.get("/lanes")
+    async def list_lanes():
+        return await call(lambda: [lane_summary(lane) for lane in lanes])
+
+    @app.get("/lanes/{lane}/tray")
+    async def read_tray(lane: str):
+        return await call(lambda: lanes.get(lane).snapshot())
+
+    @app.get("/lanes/{lane}/summary")
+    async def read_summary(lane: str):
+        return await call(lane_summary, lane)
+
+    @app.post("/lanes/{lane}/scan")
+    async def scan(lane: str, batch: ScanBatch):
+        return await call(scan_batch, lane, batch.epcs)
+
+    @app.put("/lanes/{lane}/items/{epc}")
+    async def set_qty(lane: str, epc: str, update: QtyUpdate):
+        return await call(set_line_qty, lane, epc, update.qty)
+
+    @app.delete("/lanes/{lane}/items/{epc}")
+    async def remove_item(lane: str, epc: str):
+        return await call(set_line_qty, lane, epc, 0)
+
+    @app.post("/lanes/{lane}/reset")
+    async def reset(lane: str):
+        return await call(reset_lane, lane)
+
+    @app.post("/lanes/{lane}/complete")
+    async def complete(lane: str):
+        if completes_blocking:
+            return await asyncio.to_thread(lambda: lanes.get(lane).complete())
+        return lanes.get(lane).complete()
+
+    # ── BILL HISTORY ───────────────────────────────────────────────────────────
+    def need_history():
+        if history is None:
+            raise HTTPException(404, "no bill history (start with --history)")
+        return history
+
+    # SQLite lookups may wait on a writer: always in the threadpool
+    @app.get("/bills")
+    async def find_bills(epc: str = None, product: str = None, lane: str = None, since: float = None,
+                         until: float = None, limit: int = DEFAULT_LIMIT):
+        return await asyncio.to_thread(need_history().find, epc, product, lane, since, until, min(limit, MAX_BATCH))
+
+    @app.get("/bills/{bill_id}")
+    async def read_bill(bill_id: int):
+        bill = await asyncio.to_thread(need_history().get, bill_id)
+        if bill is None:
+            raise HTTPException(404, f"no bill #{bill_id}")
+        return bill
+
+    # ── STREAM ─────────────────────────────────────────────────────────────────
+    @app.websocket("/lanes/{lane}/stream")
+    async def stream(ws: WebSocket, lane: str):
+        await ws.accept()
+        tray = await call(lanes.get, lane)
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=STREAM_QUEUE)
+
+        def offer(delta):
+            seen[0] = max(seen[0], delta["version"])
+            if queue.full():
+                # slow consumer: drop the backlog and let it resync from a snapshot
+                while not queue.empty():
+                    queue.get_nowait()
+                delta = {"event": "resync", **tray.snapshot()}
+            queue.put_nowait(delta)
+
+        def push(tray, event, epc, line):
+            # may run on the serial thread: hand over to the event loop
+            loop.call_soon_threadsafe(offer, tray_delta(tray, event, epc, line))
+
+        async def send_deltas():
+            while True:
+                await ws.send_json(await queue.get())
+
+        def changed_snapshot():
+            return tray.snapshot() if tray.version > seen[0] else None
+
+        async def poll_shared():
+            # writes from other worker processes raise no local events
+            while True:
+                await asyncio.sleep(STREAM_POLL)
+                snapshot = await call(changed_snapshot)
+                if snapshot is not None:
+                    offer({"event": "resync", **snapshot})
+
+        def subscribe():
+            with tray.lock:
+                tray.subscribe(push)
+                return tray.snapshot()
+
+        seen = [0]
+        snapshot = await call(subscribe)
+        seen[0] = max(seen[0], snapshot["version"])
+        # deltas queued meanwhile carry a version; clients skip those <= the snapshot's
+        await ws.send_json({"event": "snapshot", **snapshot})
+        sender = asyncio.create_task(send_deltas())
+        poller = asyncio.create_task(poll_shared()) if getattr(tray, "shared", False) else None
+        try:
+            while True:
+                await ws.receive_text()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            tray.unsubscribe(push)
+            sender.cancel()
+            if poller is not None:
+                poller.cancel()
+
+    return app
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="RFID smart tray JSON/WebSocket API")
+    parser.add_argument("--catalog", default="product_db.json")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--compact", action="store_true", help="array-backed trays for wholesale-size bills")
+    parser.add_argument("--snapshot", help="serve lookups from this mmap snapshot of --catalog")
+    parser.add_argument("--watch", action="store_true", help="hot-swap edits of --catalog without a restart")
+    parser.add_argument("--store", help="keep trays in this SQLite file (may contain {lane}) shared across processes")
+    parser.add_argument("--journal", help="write-ahead journal directory: open trays survive an API restart")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes (needs --store)")
+    parser.add_argument("--readers", help="serve the serial readers in this readers.json on the API's event loop")
+    parser.add_argument("--history", help="keep completed bills in this SQLite file, searchable under /bills")
+    parser.add_argument("--sold", help="sold-tag registry log: completed bills mark tags sold, sold tags are not billed again")
+    args = parser.parse_args(argv)
+    if args.workers > 1 and not args.store:
+        parser.error("--workers needs --store: in-process trays are not shared between workers")
+    if args.store and args.compact:
+        parser.error("--compact and --store are alternative tray backends")
+    if args.journal and args.store:
+        parser.error("--journal is for in-process trays: --store trays already survive a restart")
+    if args.readers and args.workers > 1:
+        parser.error("--readers would open every port once per worker: run python -m smart_tray.readers --store")
+    return args
+
+
+def build_lanes(args):
+    if args.watch:
+        build = snapshot_builder(args.snapshot) if args.snapshot and not args.compact else None
+        catalog = LiveCatalog(load_product_db(args.catalog), path=args.catalog, build=build)
+        catalog.watch()
+    elif args.snapshot:
+        catalog = open_snapshot(args.catalog, args.snapshot)
+    else:
+        catalog = load_product_db(args.catalog)
+        if args.compact:
+            catalog = CatalogIndex(catalog)
+    if args.store:
+        factory = SqliteStore(args.store).tray_factory
+    else:
+        factory = CompactTray if args.compact else Tray
+    return Lanes(catalog, tray_factory=factory)
+
+
+def build_sold(args, lanes):
+    if not args.sold:
+        return None
+    sold = SoldRegistry(args.sold)
+    lanes.on_new_tray.append(sold.attach)
+    return sold
+
+
+def build_history(args, lanes):
+    if not args.history:
+        return None
+    history = BillHistory(args.history)
+    lanes.on_new_tray.append(history.attach)
+    return history
+
+
+def build_journal(args, lanes):
+    """Last of the builders: restored trays must get every other ``on_new_tray`` hook."""
+    if not args.journal:
+        return None
+    journal = TrayJournal(args.journal)
+    lanes.on_new_tray.append(journal.attach)
+    restored = journal.restore_all(lanes)
+    if restored:
+        print(f"✅ Restored {len(restored)} open trays from {args.journal}")
+    return journal
+
+
+def build_app(args):
+    lanes = build_lanes(args)
+    sold, history = build_sold(args, lanes), build_history(args, lanes)
+    journal = build_journal(args, lanes)
+    return create_app(lanes, sold, history, blocking=bool(args.store), journal=journal)
+
+
+def app_from_env():
+    """App factory for uvicorn workers: each process rebuilds lanes from the CLI args."""
+    args = parse_args(shlex.split(os.environ.get("SMART_TRAY_ARGS", "")))
+    return build_app(args)
+
+
+def main():
+    import uvicorn
+
+    args = parse_args()
+    if args.workers > 1:
+        os.environ["SMART_TRAY_ARGS"] = shlex.join(sys.argv[1:])
+        uvicorn.run("smart_tray.api:app_from_env", factory=True, workers=args.workers,
+                    host=args.host, port=args.port, access_log=False, log_level="warning")
+        return
+    app = build_app(args)
+    if args.readers:
+        readers = MultiReader(app.state.lanes, load_readers(args.readers))
+
+        @app.on_event("startup")
+        async def start_readers():
+            app.state.readers = asyncio.create_task(readers.run())
+    # access logs off for throughput
+    uvicorn.run(app, host=args.host, port=args.port, access_log=False, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Product catalog persistence (``product_db.json``)."""
+import json
+import os
+
+DEFAULT_PRODUCTS = {
+    "EPC001": {"name": "Men's Tee",     "price": 1290},
+    "EPC002": {"name": "Jeans",          "price": 1890},
+    "EPC003": {"name": "Kurti",          "price": 1150},
+    "EPC004": {"name": "Formal Shirt",   "price": 1490},
+}
+
+
+def load_product_db(path, default=None):
+    """Load the catalog, seeding the file with ``default`` if it is missing."""
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return json.load(f)
+    product_db = dict(DEFAULT_PRODUCTS if default is None else default)
+    save_product_db(path, product_db)
+    return product_db
+
+
+def save_product_db(path, product_db):
+    with open(path, "w") as f:
+        json.dump(product_db, f, indent=2)
+
+
+class CatalogIndex:
+    """Row-numbered view of a catalog dict: ``row(epc)``, ``epc(row)``, ``product(row)``.
+
+    Built once and shared by every tray, so trays can store small row numbers
+    instead of per-line copies of EPCs and product fields. Call ``refresh()``
+    after editing the underlying dict.
+    """
+
+    def __init__(self, product_db):
+        self.product_db = product_db
+        self.epcs = []
+        self.products = []
+        self.rows = {}
+        self.refresh()
+
+    def refresh(self):
+        """Pick up edits; existing rows keep their numbers so open trays stay valid."""
+        for epc, product in self.product_db.items():
+            row = self.rows.get(epc)
+            if row is None:
+                self.rows[epc] = len(self.epcs)
+                self.epcs.append(epc)
+                self.products.append(product)
+            else:
+                self.products[row] = product
+        # deleted products stop resolving by EPC but their rows stay readable
+        for epc in [epc for epc in self.rows if epc not in self.product_db]:
+            del self.rows[epc]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, epc):
+        return epc in self.rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def row(self, epc):
+        return self.rows.get(epc)
+
+    def epc(self, row):
+        return self.epcs[row]
+
+    def product(self, row):
+        return self.products[row]
+
+    def get(self, epc, default=None):
+        row = self.rows.get(epc)
+        return default if row is None else self.products[row]
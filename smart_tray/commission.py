@@ -0,0 +1,254 @@
+"""Bulk EPC commissioning: SGTIN-96 tags for new stock, written in one batch.
+
+    python -m smart_tray.commission --catalog product_db.json \\
+        --gtin 08901234567893 --qty 20000 --name "Denim Jacket" --price 2200 --job shipment.zpl
+    python -m smart_tray.commission --catalog product_db.json --manifest shipment.csv --job shipment.csv
+
+Serials come from a ledger next to the catalog (``serials.json``,
+{GTIN: next serial}) that is updated under a file lock and synced to disk
+before any EPC is handed out: a crash afterwards can leave a gap in the
+serials, never a duplicate. The first allocation for a GTIN also starts
+above every serial of that GTIN already in the catalog.
+
+All EPCs of a run go into the catalog as one version (``LiveCatalog.apply``)
+and into a printer job: ZPL with an RFID write command per label for
+``.zpl`` paths, CSV (EPC, GTIN, serial, name, price, SKU) otherwise.
+"""
+import argparse
+import csv
+import json
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: one commissioning run at a time
+    fcntl = None
+
+SGTIN96_HEADER = 0x30
+SERIAL_BITS = 38
+MAX_SERIAL = (1 << SERIAL_BITS) - 1
+# company prefix digits -> (partition, company prefix bits); the item reference gets 44 - those bits
+PARTITIONS = {12: (0, 40), 11: (1, 37), 10: (2, 34), 9: (3, 30), 8: (4, 27), 7: (5, 24), 6: (6, 20)}
+_BY_PARTITION = {partition: (digits, bits) for digits, (partition, bits) in PARTITIONS.items()}
+DEFAULT_PREFIX_LENGTH = 7
+DEFAULT_FILTER = 1  # point-of-sale trade item
+
+
+# ── GTIN / SGTIN-96 ────────────────────────────────────────────────────────────
+def gtin_check_digit(digits):
+    """GS1 check digit for the GTIN digits without it."""
+    total = sum(int(d) * (3 if i % 2 == 0 else 1) for i, d in enumerate(reversed(digits)))
+    return str(-total % 10)
+
+
+def normalize_gtin(gtin):
+    """GTIN-8/12/13/14 as 14 digits; ValueError if malformed or the check digit is wrong."""
+    gtin = str(gtin).strip()
+    if not gtin.isdigit() or len(gtin) not in (8, 12, 13, 14):
+        raise ValueError(f"not a GTIN: {gtin!r}")
+    gtin = gtin.zfill(14)
+    if gtin_check_digit(gtin[:13]) != gtin[13]:
+        raise ValueError(f"bad GTIN check digit: {gtin}")
+    return gtin
+
+
+def sgtin96_base(gtin, prefix_length=DEFAULT_PREFIX_LENGTH, filter_value=DEFAULT_FILTER):
+    """The 96-bit EPC of ``gtin`` with serial 0; add the serial to get a tag's EPC."""
+    gtin = normalize_gtin(gtin)
+    if prefix_length not in PARTITIONS:
+        raise ValueError(f"company prefix length must be 6-12 digits, not {prefix_length}")
+    partition, company_bits = PARTITIONS[prefix_length]
+    company = int(gtin[1:1 + prefix_length])
+    item = int(gtin[0] + gtin[1 + prefix_length:13])  # indicator digit leads the item reference
+    return ((SGTIN96_HEADER << 88) | (filter_value << 85) | (partition << 82)
+            | (company << (82 - company_bits)) | (item << SERIAL_BITS))
+
+
+def encode_sgtin96(gtin, serial, prefix_length=DEFAULT_PREFIX_LENGTH, filter_value=DEFAULT_FILTER):
+    if not 0 <= serial <= MAX_SERIAL:
+        raise ValueError(f"SGTIN-96 serial out of range: {serial}")
+    return f"{sgtin96_base(gtin, prefix_length, filter_value) | serial:024X}"
+
+
+def decode_sgtin96(epc):
+    """(GTIN-14, serial) of an SGTIN-96 EPC, or None for any other EPC."""
+    if len(epc) != 24:
+        return None
+    try:
+        value = int(epc, 16)
+    except ValueError:
+        return None
+    if value >> 88 != SGTIN96_HEADER:
+        return None
+    partition = (value >> 82) & 0x7
+    if partition not in _BY_PARTITION:
+        return None
+    digits, company_bits = _BY_PARTITION[partition]
+    company = (value >> (82 - company_bits)) & ((1 << company_bits) - 1)
+    item = (value >> SERIAL_BITS) & ((1 << (44 - company_bits)) - 1)
+    company, item = str(company).zfill(digits), str(item).zfill(13 - digits)
+    if len(company) != digits or len(item) != 13 - digits:
+        return None
+    gtin = item[0] + company + item[1:]
+    return gtin + gtin_check_digit(gtin), value & MAX_SERIAL
+
+
+# ── SERIAL LEDGER ──────────────────────────────────────────────────────────────
+class SerialLedger:
+    def __init__(self, path):
+        self.path = path
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def next_serials(self):
+        return self._read()
+
+    def reserve(self, counts, floors=None):
+        """Reserve ``counts`` {gtin: n} serials; returns {gtin: first serial}.
+
+        ``floors`` {gtin: lowest allowed serial} keeps a new ledger above
+        serials that were issued before it existed.
+        """
+        floors = floors or {}
+        with open(f"{self.path}.lock", "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            ledger = self._read()
+            starts = {}
+            for gtin, n in counts.items():
+                start = max(ledger.get(gtin, 0), floors.get(gtin, 0))
+                if start + n - 1 > MAX_SERIAL:
+                    raise ValueError(f"serials of {gtin} exhausted")
+                starts[gtin] = start
+                ledger[gtin] = start + n
+            tmp = f"{self.path}.tmp{os.getpid()}"
+            with open(tmp, "w") as f:
+                json.dump(ledger, f, indent=2, sort_keys=True)
+                f.flush()
+                os.fsync(f.fileno())  # durable before any of these serials is used
+            os.replace(tmp, self.path)
+        return starts
+
+
+# ── COMMISSIONING ──────────────────────────────────────────────────────────────
+def _floors(catalog, gtins):
+    """Next serial above those already in the catalog, for the given GTINs."""
+    floors = {}
+    for epc in catalog:
+        if epc[:2] != "30":
+            continue
+        decoded = decode_sgtin96(epc)
+        if decoded is not None and decoded[0] in gtins:
+            floors[decoded[0]] = max(floors.get(decoded[0], 0), decoded[1] + 1)
+    return floors
+
+
+def commission(catalog, orders, ledger, prefix_length=DEFAULT_PREFIX_LENGTH, filter_value=DEFAULT_FILTER):
+    """Create the EPCs for ``orders`` and add them to ``catalog`` in one batch.
+
+    ``orders``: dicts with ``gtin``, ``qty``, ``name``, ``price`` and
+    optionally ``sku``. ``catalog``: a LiveCatalog (one new version) or a
+    plain dict. Returns ``(epc, gtin, serial, product)`` per tag.
+    """
+    orders = [{**order, "gtin": normalize_gtin(order["gtin"]), "qty": int(order["qty"])} for order in orders]
+    counts = {}
+    for order in orders:
+        if order["qty"] <= 0:
+            raise ValueError(f"quantity must be positive: {order['qty']}")
+        counts[order["gtin"]] = counts.get(order["gtin"], 0) + order["qty"]
+    bases = {order["gtin"]: sgtin96_base(order["gtin"], prefix_length, filter_value) for order in orders}
+    starts = ledger.reserve(counts, _floors(catalog, counts.keys()))
+
+    tags, upserts = [], {}
+    for order in orders:
+        gtin = order["gtin"]
+        product = {"name": order["name"], "price": order["price"], "gtin": gtin}
+        if order.get("sku"):
+            product["sku"] = order["sku"]
+        base, start = bases[gtin], starts[gtin]
+        for serial in range(start, start + order["qty"]):
+            epc = f"{base | serial:024X}"
+            upserts[epc] = product
+            tags.append((epc, gtin, serial, product))
+        starts[gtin] = start + order["qty"]
+    clash = next((epc for epc in upserts if epc in catalog), None)
+    if clash is not None:  # only possible if the catalog was edited behind the ledger
+        raise ValueError(f"EPC already in the catalog: {clash}")
+    if hasattr(catalog, "apply"):
+        catalog.apply(upserts)
+    else:
+        catalog.update(upserts)
+    return tags
+
+
+def write_job(tags, path):
+    """Printer job for the tags: ZPL (encode + print) for ``.zpl``, CSV otherwise."""
+    if path.lower().endswith(".zpl"):
+        with open(path, "w") as f:
+            f.write("".join(
+                f"^XA^RFW,H^FD{epc}^FS"
+                f"^FO30,30^A0N,32,32^FD{product['name']}^FS"
+                f"^FO30,75^A0N,28,28^FD{product['price']}^FS"
+                f"^FO30,115^A0N,22,22^FD{gtin} / {serial}^FS^XZ\n"
+                for epc, gtin, serial, product in tags))
+    else:
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["EPC", "GTIN", "Serial", "Name", "Price", "SKU"])
+            writer.writerows([epc, gtin, serial, product["name"], product["price"], product.get("sku", "")]
+                             for epc, gtin, serial, product in tags)
+    return path
+
+
+def load_manifest(path):
+    """Orders from a CSV with columns gtin, qty, name, price and optionally sku."""
+    with open(path, "r", newline="") as f:
+        return [{**row, "price": float(row["price"]) if "." in row["price"] else int(row["price"])}
+                for row in csv.DictReader(f)]
+
+
+def main(argv=None):
+    from .catalog import load_product_db, save_product_db
+
+    parser = argparse.ArgumentParser(description="Commission SGTIN-96 EPCs for new stock")
+    parser.add_argument("--catalog", default="product_db.json")
+    parser.add_argument("--ledger", help="serial ledger (default: serials.json next to the catalog)")
+    parser.add_argument("--gtin")
+    parser.add_argument("--qty", type=int)
+    parser.add_argument("--name")
+    parser.add_argument("--price", type=float)
+    parser.add_argument("--sku")
+    parser.add_argument("--manifest", help="CSV of orders instead of --gtin/--qty/--name/--price")
+    parser.add_argument("--prefix-length", type=int, default=DEFAULT_PREFIX_LENGTH,
+                        help="digits of the GS1 company prefix inside the GTIN")
+    parser.add_argument("--job", required=True, help="printer job file (.zpl or .csv)")
+    args = parser.parse_args(argv)
+
+    if args.manifest:
+        orders = load_manifest(args.manifest)
+    elif args.gtin and args.qty and args.name and args.price is not None:
+        price = int(args.price) if args.price.is_integer() else args.price
+        orders = [{"gtin": args.gtin, "qty": args.qty, "name": args.name, "price": price, "sku": args.sku}]
+    else:
+        parser.error("pass --manifest or all of --gtin, --qty, --name and --price")
+    ledger = SerialLedger(args.ledger or os.path.join(os.path.dirname(os.path.abspath(args.catalog)), "serials.json"))
+
+    start = time.perf_counter()
+    catalog = load_product_db(args.catalog)
+    tags = commission(catalog, orders, ledger, args.prefix_length)
+    save_product_db(args.catalog, catalog)
+    write_job(tags, args.job)
+    print(f"✅ {len(tags)} EPCs commissioned in {time.perf_counter() - start:.2f} s, job: {args.job}")
+    for gtin in dict.fromkeys(t[1] for t in tags):
+        serials = [t[2] for t in tags if t[1] == gtin]
+        print(f"  {gtin}: serials {serials[0]}–{serials[-1]}")
+
+
+if __name__ == "__main__":
+    main()
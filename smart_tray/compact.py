@@ -0,0 +1,227 @@
+"""Array-backed tray for wholesale-size bills.
+
+Same API as ``Tray``, but a line is three typed-array cells (catalog row,
+qty, unit price) plus one open-addressing hash slot keyed by catalog row:
+no per-line dicts, EPC strings or int objects. EPCs and names are read from
+the shared ``CatalogIndex`` when rendering; the price is snapshotted at scan.
+
+Prices live in an integer array while every scanned price is an int (so
+subtotals match ``Tray``); the first fractional price widens it to floats.
+
+Removed lines stay as qty-0 tombstones (a rescan revives them in place) and
+are compacted away once they outnumber the live lines.
+"""
+import csv
+import operator
+import threading
+from array import array
+
+from .catalog import CatalogIndex
+from .tray import COLUMNS, TrayBase, normalize_epc
+
+_EMPTY = 0  # hash slots hold line index + 1
+_MIN_TABLE = 16
+_HASH = 0x9E3779B1
+
+
+def _number(value):
+    """Whole prices read back from a widened ("d") column as ints, like ``Tray`` shows them."""
+    return int(value) if type(value) is float and value.is_integer() else value
+
+
+def _zeros(n):
+    return array("i", bytes(4 * n))
+
+
+class CompactTray(TrayBase):
+    def __init__(self, catalog, lane=None):
+        # catalog: CatalogIndex-like (row/epc/product); a plain dict gets indexed here
+        self.catalog = catalog if hasattr(catalog, "row") else CatalogIndex(catalog)
+        self.lane = lane
+        self.subtotal = 0
+        self.version = 0
+        self.lock = threading.RLock()
+        self.pricing = None
+        self.listeners = []
+        self._clear()
+
+    def _clear(self):
+        self.row_of = array("i")  # line -> catalog row
+        self.qty = array("i")     # line -> qty (0 = removed)
+        self.price = array("q")   # line -> unit price at scan time ("d" once a price is fractional)
+        self.count = 0
+        self.table = _zeros(_MIN_TABLE)
+
+    # ── HASH INDEX (catalog row -> line) ───────────────────────────────────────
+    def _find(self, row):
+        table, rows = self.table, self.row_of
+        mask = len(table) - 1
+        i = (row * _HASH) & mask
+        while True:
+            slot = table[i]
+            if slot == _EMPTY:
+                return -1, i
+            if rows[slot - 1] == row:
+                return slot - 1, i
+            i = (i + 1) & mask
+
+    def _rebuild(self, size):
+        table = _zeros(size)
+        mask = size - 1
+        for line, row in enumerate(self.row_of):
+            i = (row * _HASH) & mask
+            while table[i]:
+                i = (i + 1) & mask
+            table[i] = line + 1
+        self.table = table
+
+    def _set_price(self, line, price):
+        if self.price.typecode == "q" and type(price) is not int:
+            self.price = array("d", self.price)  # first fractional price: widen the column
+        if line == len(self.price):
+            self.price.append(price)
+        else:
+            self.price[line] = price
+
+    def _line_of(self, epc):
+        row = self.catalog.row(normalize_epc(epc))
+        if row is None:
+            return -1
+        line, _ = self._find(row)
+        return line
+
+    def _compact(self):
+        keep = [i for i, q in enumerate(self.qty) if q]
+        self.row_of = array("i", [self.row_of[i] for i in keep])
+        self.qty = array("i", [self.qty[i] for i in keep])
+        self.price = array(self.price.typecode, [self.price[i] for i in keep])
+        size = _MIN_TABLE
+        while size < 2 * len(keep):
+            size *= 2
+        self._rebuild(size)
+
+    def _line(self, line):
+        if line < 0 or not self.qty[line]:
+            return None
+        row = self.row_of[line]
+        return {"name": self.catalog.product(row)["name"], "price": _number(self.price[line]), "qty": self.qty[line]}
+
+    # ── CONTAINER ──────────────────────────────────────────────────────────────
+    def __len__(self):
+        with self.lock:
+            return self.count
+
+    def __contains__(self, epc):
+        with self.lock:
+            line = self._line_of(epc)
+            return line >= 0 and self.qty[line] > 0
+
+    def __iter__(self):
+        epc_of = self.catalog.epc
+        with self.lock:
+            return iter([epc_of(row) for row, q in zip(self.row_of, self.qty) if q])
+
+    def get(self, epc):
+        with self.lock:
+            return self._line(self._line_of(epc))
+
+    def lines(self):
+        epc_of = self.catalog.epc
+        with self.lock:
+            return [(epc_of(self.row_of[i]), self._line(i)) for i, q in enumerate(self.qty) if q]
+
+    # ── MUTATIONS ──────────────────────────────────────────────────────────────
+    def scan(self, epc):
+        """Add one read of ``epc``. Returns the tray line, or None if unknown."""
+        return self._scan(epc, self.catalog)
+
+    def _scan(self, epc, catalog):
+        epc = normalize_epc(epc)
+        row = catalog.row(epc)
+        if row is None:
+            if self.listeners:
+                self._emit("unknown", epc)
+            return None
+        with self.lock:
+            line, pos = self._find(row)
+            if line < 0:
+                line = len(self.row_of)
+                self.row_of.append(row)
+                self.qty.append(0)
+                self._set_price(line, catalog.product(row)["price"])
+                self.table[pos] = line + 1
+                if 2 * len(self.row_of) > len(self.table):
+                    self._rebuild(2 * len(self.table))
+            elif not self.qty[line]:
+                self._set_price(line, catalog.product(row)["price"])  # revived: fresh price
+            if not self.qty[line]:
+                self.count += 1
+            self.qty[line] += 1
+            self.subtotal += self.price[line]
+            self.version += 1
+            result = self._line(line)
+            if self.listeners:
+                self._emit("scan", epc, result)
+        return result
+
+    def scan_many(self, epcs):
+        """Batch ``scan`` under one lock acquisition. Returns the unknown EPCs."""
+        unknown = []
+        # a live catalog is pinned to one version for the whole batch
+        catalog = getattr(self.catalog, "current", self.catalog)
+        with self.lock:
+            for epc in epcs:
+                if self._scan(epc, catalog) is None:
+                    unknown.append(epc)
+        return unknown
+
+    def set_qty(self, epc, qty):
+        """Set the quantity of a tray line; ``qty <= 0`` removes it."""
+        with self.lock:
+            line = self._line_of(epc)
+            if line < 0 or not self.qty[line]:
+                return None
+            qty = max(0, int(qty))
+            self.subtotal += self.price[line] * (qty - self.qty[line])
+            self.qty[line] = qty
+            if not qty:
+                self.count -= 1
+                if len(self.row_of) > 1024 and len(self.row_of) > 2 * self.count:
+                    self._compact()
+                    line = -1
+            self.version += 1
+            result = self._line(line)
+            if self.listeners:
+                self._emit("qty", normalize_epc(epc), result)
+        return result
+
+    def reset(self):
+        with self.lock:
+            self._clear()
+            self.subtotal = 0
+            self.version += 1
+            if self.listeners:
+                self._emit("reset")
+
+    # ── READS ──────────────────────────────────────────────────────────────────
+    def totals(self):
+        """(lines, units, subtotal) recomputed over the arrays in C loops."""
+        with self.lock:
+            return self.count, sum(self.qty), _number(sum(map(operator.mul, self.price, self.qty)))
+
+    def iter_rows(self):
+        epc_of, product = self.catalog.epc, self.catalog.product
+        for row, qty, price in zip(self.row_of, self.qty, self.price):
+            if qty:
+                yield [epc_of(row), product(row)["name"], _number(price), qty, _number(price * qty)]
+
+    def rows(self):
+        with self.lock:
+            return list(self.iter_rows())
+
+    def write_csv(self, path):
+        with self.lock, open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            writer.writerows(self.iter_rows())
+        return path
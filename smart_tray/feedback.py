@@ -0,0 +1,117 @@
+"""Scan feedback (beeps, bells, callbacks) off the ingest thread.
+
+``notify`` only drops an event name on a queue. A daemon worker collects
+everything that arrives within ``window`` seconds and calls each sink once per
+event kind with the number of occurrences, so a burst of reads is one chirp.
+A sink is any callable ``sink(event, count)``.
+"""
+import queue
+import sys
+import threading
+import time
+
+SCAN = "scan"
+UNKNOWN = "unknown"
+COMPLETE = "complete"
+
+# tray listener event -> feedback event
+TRAY_EVENTS = {"scan": SCAN, "unknown": UNKNOWN, "complete": COMPLETE}
+
+
+def null_sink(event, count):
+    pass
+
+
+def bell_sink(event, count):
+    sys.stdout.write("\a")
+    sys.stdout.flush()
+
+
+class AudioSink:
+    """Tones through ``winsound`` on Windows, terminal bell elsewhere."""
+
+    TONES = {
+        SCAN: [(1000, 200)],
+        UNKNOWN: [(400, 300)],
+        COMPLETE: [(1200, 100), (1600, 150)],
+    }
+
+    def __init__(self, tones=None):
+        self.tones = {**self.TONES, **(tones or {})}
+        try:
+            import winsound
+            self.beep = winsound.Beep
+        except ImportError:
+            self.beep = None
+
+    def __call__(self, event, count):
+        tones = self.tones.get(event)
+        if not tones:
+            return
+        if self.beep is None:
+            bell_sink(event, count)
+            return
+        for freq, duration in tones:
+            self.beep(freq, duration)
+
+
+class Feedback:
+    def __init__(self, sinks=None, window=0.05, maxsize=4096):
+        self.sinks = list(sinks) if sinks is not None else [AudioSink()]
+        self.window = window
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._run, name="feedback", daemon=True)
+        self.thread.start()
+
+    def notify(self, event):
+        """Queue ``event``; never blocks (drops it if the worker is far behind)."""
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def attach(self, tray):
+        """Give feedback for a tray's scans, unknown tags and completed bills."""
+        def listener(tray, event, epc, line):
+            event = TRAY_EVENTS.get(event)
+            if event is not None:
+                self.notify(event)
+        return tray.subscribe(listener)
+
+    def close(self, timeout=1.0):
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self.thread.join(timeout)
+
+    def _collect(self, event):
+        counts = {event: 1}
+        deadline = time.monotonic() + self.window
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return counts, False
+            try:
+                event = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                return counts, False
+            if event is None:
+                return counts, True
+            counts[event] = counts.get(event, 0) + 1
+
+    def _run(self):
+        while True:
+            event = self.queue.get()
+            if event is None:
+                return
+            counts, stop = self._collect(event)
+            for event, count in counts.items():
+                for sink in self.sinks:
+                    try:
+                        sink(event, count)
+                    except Exception as e:
+                        print(f"⚠️ Feedback sink error: {e}")
+            if stop:
+                return
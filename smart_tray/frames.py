@@ -0,0 +1,219 @@
+"""Reader wire protocols: frame parsing over a reusable receive buffer.
+
+``FrameReader`` reads from a serial port (anything with ``readinto``) into one
+preallocated ``bytearray`` and hands ``memoryview`` windows of it to a parser.
+Parsers validate framing/checksums in place and emit one ``TagBatch`` per
+frame; EPC strings are only built when the consumer iterates the batch.
+
+A batch is a view into the receive buffer: consume it inside the callback,
+it is overwritten by the next read.
+"""
+
+# ── CHECKSUMS ──────────────────────────────────────────────────────────────────
+def _crc16_table(poly):
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ poly if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+
+_CRC16_MCRF4XX = _crc16_table(0x8408)
+
+
+def crc16_mcrf4xx(data, crc=0xFFFF):
+    """CRC-16/MCRF4XX (reflected 0x1021, init 0xFFFF, no final xor)."""
+    table = _CRC16_MCRF4XX
+    for byte in data:
+        crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+    return crc
+
+
+# ── TAG BATCHES ────────────────────────────────────────────────────────────────
+class TagBatch:
+    """Tags of one frame; iterating yields ``(epc, rssi, antenna)``."""
+
+    __slots__ = ("view", "count", "antenna")
+
+    def __init__(self, view, count, antenna=None):
+        self.view = view
+        self.count = count
+        self.antenna = antenna
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        view, antenna, pos = self.view, self.antenna, 0
+        for _ in range(self.count):
+            n = view[pos]
+            yield view[pos + 1:pos + 1 + n].hex().upper(), view[pos + 1 + n], antenna
+            pos += n + 2
+
+    def epcs(self):
+        view, pos = self.view, 0
+        for _ in range(self.count):
+            n = view[pos]
+            yield view[pos + 1:pos + 1 + n].hex().upper()
+            pos += n + 2
+
+
+class LineBatch:
+    """One ASCII EPC line (the classic one-tag-per-line readers)."""
+
+    __slots__ = ("view",)
+
+    def __init__(self, view):
+        self.view = view
+
+    def __len__(self):
+        return 1
+
+    def __iter__(self):
+        yield bytes(self.view).decode("utf-8", "replace").strip(), None, None
+
+    def epcs(self):
+        yield bytes(self.view).decode("utf-8", "replace").strip()
+
+
+# ── PARSERS ────────────────────────────────────────────────────────────────────
+class LineParser:
+    """``EPC\\r\\n`` per tag, as printed by the hobby readers and the ESP32 bridge."""
+
+    max_frame = 256
+
+    def parse(self, buf, view, start, end, emit):
+        while True:
+            nl = buf.find(b"\n", start, end)
+            if nl < 0:
+                if end - start > self.max_frame:
+                    return end  # garbage without a newline: drop it
+                return start
+            if nl > start:
+                line = view[start:nl]
+                if line.tobytes().strip():
+                    emit(LineBatch(line))
+            start = nl + 1
+
+
+class InventoryFrameParser:
+    """Binary inventory responses of CF-RU / UHFReader18-style fixed readers.
+
+    ``Len Adr Cmd Status Data... CRC-LSB CRC-MSB`` where ``Len`` counts the
+    bytes after itself and the CRC-16/MCRF4XX covers ``Len`` through ``Data``.
+    Inventory data (``Cmd`` 0x01) is ``Ant Num`` followed by ``Num`` times
+    ``EPCLen EPC RSSI``. Other commands are validated and skipped.
+    """
+
+    CMD_INVENTORY = 0x01
+    MIN_LEN = 5
+
+    def __init__(self, address=None):
+        self.address = address
+        self.crc_errors = 0
+        self.skipped = 0
+
+    def parse(self, buf, view, start, end, emit):
+        while end - start >= self.MIN_LEN + 1:
+            length = view[start]
+            if length < self.MIN_LEN or (self.address is not None and view[start + 1] != self.address):
+                start += 1  # not a frame start: resync
+                self.skipped += 1
+                continue
+            frame_end = start + length + 1
+            if frame_end > end:
+                return start  # wait for the rest of the frame
+            crc = view[frame_end - 2] | (view[frame_end - 1] << 8)
+            if crc16_mcrf4xx(view[start:frame_end - 2]) != crc:
+                self.crc_errors += 1
+                start += 1
+                continue
+            if view[start + 2] == self.CMD_INVENTORY:
+                self._emit_inventory(view, start + 4, frame_end - 2, emit)
+            start = frame_end
+        return start
+
+    def _emit_inventory(self, view, pos, data_end, emit):
+        if data_end - pos < 2:
+            return
+        antenna, count = view[pos], view[pos + 1]
+        tags = pos + 2
+        # check the tag records fit the frame before handing out a view
+        cursor = tags
+        for _ in range(count):
+            if cursor >= data_end:
+                return
+            cursor += view[cursor] + 2
+        if cursor > data_end or not count:
+            return
+        emit(TagBatch(view[tags:cursor], count, antenna))
+
+
+PARSERS = {"line": LineParser, "inventory": InventoryFrameParser}
+
+
+# ── BUFFERED READER ────────────────────────────────────────────────────────────
+class FrameReader:
+    def __init__(self, stream, parser, on_batch, bufsize=8192):
+        self.stream = stream
+        self.parser = parser
+        self.on_batch = on_batch
+        self.buf = bytearray(bufsize)
+        self.view = memoryview(self.buf)
+        self.start = 0
+        self.end = 0
+
+    def poll(self):
+        """Read whatever the port has (blocking for at least one byte) and parse it."""
+        if self.end == len(self.buf):
+            self._compact()
+            if self.end == len(self.buf):
+                self.start = self.end = 0  # one frame larger than the buffer: drop it
+        waiting = getattr(self.stream, "in_waiting", 0) or 1
+        n = self.stream.readinto(self.view[self.end:min(len(self.buf), self.end + waiting)])
+        if not n:
+            return 0
+        return self.feed_received(n)
+
+    def feed(self, data):
+        """Push bytes received elsewhere (tests, sockets, replays)."""
+        data = memoryview(data)
+        while len(data):
+            if self.end == len(self.buf):
+                self._compact()
+                if self.end == len(self.buf):
+                    self.start = self.end = 0
+            n = min(len(data), len(self.buf) - self.end)
+            self.buf[self.end:self.end + n] = data[:n]
+            data = data[n:]
+            self.feed_received(n)
+
+    def feed_received(self, n):
+        self.end += n
+        self.start = self.parser.parse(self.buf, self.view, self.start, self.end, self.on_batch)
+        if self.start == self.end:
+            self.start = self.end = 0
+        return n
+
+    def reset(self):
+        """Forget buffered bytes (a partial frame of a connection that went away)."""
+        self.start = self.end = 0
+
+    def _compact(self):
+        if self.start:
+            pending = self.end - self.start
+            self.buf[:pending] = bytes(self.view[self.start:self.end])
+            self.start, self.end = 0, pending
+
+
+def batch_epcs(batch, log=None, read_filter=None, port=None, lane=None):
+    """EPCs to scan from a parsed batch: the shared ``on_batch`` step of every reader loop.
+
+    ``log``: optional ``readlog.ReadLog`` that records every raw read first.
+    ``read_filter``: optional ``strays.ReadFilter`` that drops stray reads.
+    """
+    if log is not None:
+        log.append_batch(port, batch, lane)
+    return list(batch.epcs()) if read_filter is None else read_filter.filter(batch)
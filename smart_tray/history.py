@@ -0,0 +1,204 @@
+"""Completed-bill history, indexed for returns and exchanges.
+
+    history = BillHistory("bills.db")
+    lanes.on_new_tray.append(history.attach)     # every completed bill is kept
+    history.find(epc="E200...")                   # which bill sold this garment?
+    history.find(product="Denim", lane="3", since=t0, until=t1)
+
+    python -m smart_tray.history bills.db find --epc E2001234 --since "2025-06-01"
+
+Bills live in SQLite (WAL) with one row per bill and one per bill line.
+Secondary indexes on line EPC, line product name + time, bill lane + time
+and bill time keep every lookup an index range scan, so a year of bills
+answers in about a millisecond.
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+
+from .tray import normalize_epc
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bills (
+    id       INTEGER PRIMARY KEY,
+    ts       REAL    NOT NULL,
+    lane     TEXT,
+    subtotal NUMERIC NOT NULL,
+    discount NUMERIC NOT NULL,
+    total    NUMERIC NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bill_lines (
+    bill_id INTEGER NOT NULL REFERENCES bills (id),
+    ts      REAL    NOT NULL,
+    epc     TEXT    NOT NULL,
+    name    TEXT    NOT NULL,
+    price   NUMERIC NOT NULL,
+    qty     INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS bills_ts ON bills (ts);
+CREATE INDEX IF NOT EXISTS bills_lane_ts ON bills (lane, ts);
+CREATE INDEX IF NOT EXISTS bill_lines_bill ON bill_lines (bill_id);
+CREATE INDEX IF NOT EXISTS bill_lines_epc ON bill_lines (epc);
+CREATE INDEX IF NOT EXISTS bill_lines_name ON bill_lines (name, ts, bill_id);
+"""
+DEFAULT_LIMIT = 50
+
+
+class BillHistory:
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def close(self):
+        self.conn.close()
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT count(*) FROM bills").fetchone()[0]
+
+    # ── WRITE ──────────────────────────────────────────────────────────────────
+    def record(self, bill, ts=None):
+        """Store a completed bill (``Tray.complete()`` result); returns its bill number."""
+        return self.record_many([bill], ts)[0]
+
+    def record_many(self, bills, ts=None):
+        ids = []
+        with self.lock:
+            conn = self.conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for bill in bills:
+                    lane = bill.get("lane")
+                    when = bill.get("ts", time.time() if ts is None else ts)
+                    cursor = conn.execute(
+                        "INSERT INTO bills (ts, lane, subtotal, discount, total) VALUES (?, ?, ?, ?, ?)",
+                        (when, None if lane is None else str(lane), bill["subtotal"], bill["discount"], bill["total"]))
+                    bill_id = cursor.lastrowid
+                    conn.executemany(
+                        "INSERT INTO bill_lines (bill_id, ts, epc, name, price, qty) VALUES (?, ?, ?, ?, ?, ?)",
+                        [(bill_id, when, epc, name, price, qty) for epc, name, price, qty, _ in bill["rows"]])
+                    ids.append(bill_id)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return ids
+
+    def attach(self, tray):
+        """Keep every bill ``tray`` completes."""
+        def listener(tray, event, epc, line):
+            if event == "complete":
+                self.record(line)
+        return tray.subscribe(listener)
+
+    # ── LOOKUP ─────────────────────────────────────────────────────────────────
+    def find(self, epc=None, product=None, lane=None, since=None, until=None, limit=DEFAULT_LIMIT):
+        """Bills matching every given filter, newest first.
+
+        ``product`` matches line names by prefix (case-sensitive, so the
+        name index serves it); ``since`` / ``until`` are epoch seconds.
+        """
+        where, args = [], []
+        if epc:
+            where.append("id IN (SELECT bill_id FROM bill_lines WHERE epc = ?)")
+            args.append(normalize_epc(epc))
+        if product:
+            # (name, ts, bill_id) index: the time window is checked without leaving the index
+            sub = "SELECT bill_id FROM bill_lines WHERE name >= ? AND name < ?"
+            args += [product, product + "\U0010ffff"]
+            if since is not None:
+                sub += " AND ts >= ?"
+                args.append(since)
+            if until is not None:
+                sub += " AND ts <= ?"
+                args.append(until)
+            where.append(f"id IN ({sub})")
+        if lane is not None and lane != "":
+            where.append("lane = ?")
+            args.append(str(lane))
+        if since is not None:
+            where.append("ts >= ?")
+            args.append(since)
+        if until is not None:
+            where.append("ts <= ?")
+            args.append(until)
+        sql = "SELECT id, ts, lane, subtotal, discount, total FROM bills"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY ts DESC LIMIT ?"
+        with self.lock:
+            bills = self.conn.execute(sql, args + [limit]).fetchall()
+            return self._with_rows(bills)
+
+    def get(self, bill_id):
+        with self.lock:
+            bills = self.conn.execute("SELECT id, ts, lane, subtotal, discount, total FROM bills WHERE id = ?",
+                                      (bill_id,)).fetchall()
+            found = self._with_rows(bills)
+        return found[0] if found else None
+
+    def _with_rows(self, bills):
+        if not bills:
+            return []
+        ids = [b[0] for b in bills]
+        rows = {bill_id: [] for bill_id in ids}
+        query = (f"SELECT bill_id, epc, name, price, qty FROM bill_lines "
+                 f"WHERE bill_id IN ({','.join('?' * len(ids))}) ORDER BY rowid")
+        for bill_id, epc, name, price, qty in self.conn.execute(query, ids):
+            rows[bill_id].append([epc, name, price, qty, price * qty])
+        return [{"id": bill_id, "ts": ts, "lane": lane, "rows": rows[bill_id],
+                 "subtotal": subtotal, "discount": discount, "total": total}
+                for bill_id, ts, lane, subtotal, discount, total in bills]
+
+
+def main(argv=None):
+    from .readlog import parse_time
+    from .tray import summary_text
+
+    parser = argparse.ArgumentParser(description="Search completed bills")
+    parser.add_argument("history", help="bill history database")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("info")
+    find = sub.add_parser("find")
+    find.add_argument("--epc")
+    find.add_argument("--product", help="product name prefix")
+    find.add_argument("--lane")
+    find.add_argument("--since", help="epoch seconds or 'YYYY-MM-DD[ HH:MM[:SS]]' (local time)")
+    find.add_argument("--until")
+    find.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    show = sub.add_parser("show")
+    show.add_argument("bill", type=int)
+    args = parser.parse_args(argv)
+
+    history = BillHistory(args.history)
+    if args.command == "info":
+        print(f"{args.history}: {len(history)} bills")
+        return
+    if args.command == "show":
+        bills = [history.get(args.bill)]
+        if bills[0] is None:
+            raise SystemExit(f"no bill #{args.bill}")
+    else:
+        start = time.perf_counter()
+        bills = history.find(args.epc, args.product, args.lane, parse_time(args.since), parse_time(args.until),
+                             args.limit)
+        print(f"{len(bills)} bills ({(time.perf_counter() - start) * 1000:.1f} ms)")
+    for bill in bills:
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(bill["ts"]))
+        print(f"\n── bill #{bill['id']}  {stamp}  lane {bill['lane'] or '-'}")
+        for epc, name, price, qty, total in bill["rows"]:
+            print(f"{epc}  {name} x{qty} = {total}")
+        print(summary_text(bill))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Crash recovery for open trays: a per-lane write-ahead log plus snapshots.
+
+    journal = TrayJournal("journal/")
+    lanes.on_new_tray.append(journal.attach)   # restores, then logs every change
+    journal.restore_all(lanes)                 # at boot: bring back every open tray
+
+Every tray event appends one line to ``lane-<lane>.wal`` with a single
+``os.write``: ``EPC QTY`` (the line's quantity after the change, 0 for a
+removed line) or ``-`` when the tray is reset or its bill completed.
+Records are states, not increments, so replaying one twice is harmless.
+Writes reach the OS page cache at once, which survives the app process
+dying; they are not fsynced (a power cut can lose the last reads).
+
+Every ``snapshot_every`` records the tray is written to ``lane-<lane>.snap``
+together with the log size at that point, so a restore reads the snapshot
+and replays only the log tail. When a tray empties (reset / complete) the
+``-`` record is appended and fsynced, then the snapshot is removed and the
+log truncated: a crash in between still replays to an empty tray.
+
+Trays are restored through ``scan`` + ``set_qty``, so pricing listeners see
+the lines come back; prices are taken from the current catalog.
+"""
+import json
+import os
+import re
+import time
+
+SNAPSHOT_EVERY = 4096  # log records between snapshots
+
+
+class LaneJournal:
+    def __init__(self, path, snapshot_every=SNAPSHOT_EVERY):
+        self.path = path  # without extension
+        self.snapshot_every = snapshot_every
+        self.fd = os.open(f"{path}.wal", os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self.size = os.fstat(self.fd).st_size
+        self.records = 0
+
+    def close(self):
+        os.close(self.fd)
+
+    # ── RESTORE ────────────────────────────────────────────────────────────────
+    def load(self):
+        """{epc: qty} of the tray as logged."""
+        items, offset = {}, 0
+        try:
+            with open(f"{self.path}.snap", "r") as f:
+                snapshot = json.load(f)
+            items, offset = dict(snapshot["items"]), snapshot["offset"]
+        except (FileNotFoundError, ValueError, KeyError):
+            pass  # no snapshot (or a torn one): replay the whole log
+        with open(f"{self.path}.wal", "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        for record in data[:data.rfind(b"\n") + 1].decode("utf-8", "replace").splitlines():
+            if record == "-":
+                items.clear()
+                continue
+            epc, _, qty = record.rpartition(" ")
+            if not epc or not qty.isdigit():
+                continue  # torn write
+            if qty == "0":
+                items.pop(epc, None)
+            else:
+                items[epc] = int(qty)
+        return items
+
+    def restore(self, tray):
+        """Put the logged lines back into ``tray``; returns how many were restored."""
+        items = self.load()
+        restored = 0
+        with tray.lock:
+            for epc, qty in items.items():
+                if tray.scan(epc) is not None:  # None: the product was deleted meanwhile
+                    tray.set_qty(epc, qty)
+                    restored += 1
+        return restored
+
+    # ── LOG ────────────────────────────────────────────────────────────────────
+    def on_tray_event(self, tray, event, epc, line):
+        if event == "scan" or event == "qty":
+            record = f"{epc} {line['qty'] if line else 0}\n"
+        elif event == "reset":
+            self.truncate()
+            return
+        else:
+            return
+        data = record.encode("utf-8")
+        os.write(self.fd, data)
+        self.size += len(data)
+        self.records += 1
+        if self.records >= self.snapshot_every:
+            self.snapshot(tray)
+
+    def snapshot(self, tray):
+        """Write the tray state and the log position it covers (atomic replace)."""
+        items = [[epc, line["qty"]] for epc, line in tray.lines()]
+        tmp = f"{self.path}.snap.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"offset": self.size, "items": items, "ts": time.time()}, f, separators=(",", ":"))
+        os.replace(tmp, f"{self.path}.snap")
+        self.records = 0
+
+    def truncate(self):
+        # "-" is on disk before the snapshot goes and the log is cut: a crash
+        # anywhere in between replays to an empty tray, never to the closed bill
+        if self.size:
+            os.write(self.fd, b"-\n")
+            os.fsync(self.fd)
+        try:
+            os.remove(f"{self.path}.snap")
+        except FileNotFoundError:
+            pass
+        if self.size:
+            os.ftruncate(self.fd, 0)
+            self.size = 0
+        self.records = 0
+
+
+class TrayJournal:
+    def __init__(self, directory, snapshot_every=SNAPSHOT_EVERY):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.journals = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, lane):
+        name = "default" if lane is None else re.sub(r"[^\w.-]", "_", str(lane))
+        return os.path.join(self.directory, f"lane-{name}")
+
+    def attach(self, tray):
+        """Restore ``tray`` from its lane's journal, then log its changes."""
+        journal = self.journals.get(tray.lane)
+        if journal is None:
+            journal = self.journals[tray.lane] = LaneJournal(self._path(tray.lane), self.snapshot_every)
+        with tray.lock:
+            journal.restore(tray)
+            tray.subscribe(journal.on_tray_event)
+        return journal
+
+    def lanes(self):
+        """Lanes with a non-empty journal (as file-name strings; None for the default lane)."""
+        found = []
+        for name in sorted(os.listdir(self.directory)):
+            if name.startswith("lane-") and name.endswith(".wal"):
+                if os.path.getsize(os.path.join(self.directory, name)):
+                    lane = name[5:-4]
+                    found.append(None if lane == "default" else lane)
+        return found
+
+    def restore_all(self, lanes):
+        """Create (and so restore) the tray of every lane that was open; returns them."""
+        return [lanes.get(lane) for lane in self.lanes()]
+
+    def close(self):
+        for journal in self.journals.values():
+            journal.close()
+        self.journals.clear()
@@ -0,0 +1,37 @@
+"""One tray per checkout lane, created on first use."""
+import threading
+
+from .tray import Tray
+
+
+class Lanes:
+    def __init__(self, catalog, tray_factory=Tray):
+        self.catalog = catalog
+        self.tray_factory = tray_factory
+        self.trays = {}
+        self.lock = threading.Lock()
+        # callables run on every newly created tray (e.g. to subscribe listeners)
+        self.on_new_tray = []
+
+    def get(self, lane):
+        tray = self.trays.get(lane)
+        if tray is None:
+            with self.lock:
+                tray = self.trays.get(lane)
+                if tray is None:
+                    tray = self.tray_factory(self.catalog, lane=lane)
+                    for hook in self.on_new_tray:
+                        hook(tray)
+                    self.trays[lane] = tray
+        return tray
+
+    __getitem__ = get
+
+    def __contains__(self, lane):
+        return lane in self.trays
+
+    def __iter__(self):
+        return iter(list(self.trays))
+
+    def __len__(self):
+        return len(self.trays)
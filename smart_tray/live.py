@@ -0,0 +1,265 @@
+"""Versioned, copy-on-write catalog with atomic hot-swap and file watching.
+
+Readers never lock: every lookup goes through ``LiveCatalog.current``, an
+immutable catalog version, and publishing a change is a single reference
+assignment. Writers (Admin batches, the file watcher) build the next version
+off to the side under a writer lock, so a 10k-SKU price campaign becomes
+visible all at once or not at all. ``Tray.scan_many`` pins one version for
+a whole batch of reads.
+"""
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+from .snapshot import MmapCatalog, compile_catalog
+
+
+class RowRegistry:
+    """Append-only EPC <-> row numbering shared by all versions (for CompactTray)."""
+
+    def __init__(self):
+        self.rows = {}
+        self.epcs = []
+        self.last = []  # last known product per row, so deleted rows still render
+
+    def update(self, products):
+        for epc, product in products.items():
+            row = self.rows.get(epc)
+            if row is None:
+                self.rows[epc] = len(self.epcs)
+                self.epcs.append(epc)
+                self.last.append(product)
+            else:
+                self.last[row] = product
+
+
+class CatalogVersion:
+    """One immutable catalog generation (never mutate ``products``)."""
+
+    __slots__ = ("version", "products", "registry")
+
+    def __init__(self, products, version, registry):
+        self.version = version
+        self.products = products
+        self.registry = registry
+
+    def __len__(self):
+        return len(self.products)
+
+    def __contains__(self, epc):
+        return epc in self.products
+
+    def __iter__(self):
+        return iter(self.products)
+
+    def __getitem__(self, epc):
+        return self.products[epc]
+
+    def get(self, epc, default=None):
+        return self.products.get(epc, default)
+
+    def items(self):
+        return self.products.items()
+
+    def row(self, epc):
+        return self.registry.rows[epc] if epc in self.products else None
+
+    def epc(self, row):
+        return self.registry.epcs[row]
+
+    def product(self, row):
+        product = self.products.get(self.registry.epcs[row])
+        return product if product is not None else self.registry.last[row]
+
+
+def check_products(products):
+    """Raise ValueError unless every entry is a product with a name and a numeric price."""
+    if not isinstance(products, dict):
+        raise ValueError("catalog must be a JSON object of EPC -> product")
+    for epc, product in products.items():
+        if not isinstance(product, dict):
+            raise ValueError(f"{epc}: product must be an object")
+        if not isinstance(product.get("name"), str):
+            raise ValueError(f"{epc}: missing or invalid name")
+        price = product.get("price")
+        if isinstance(price, bool) or not isinstance(price, (int, float)):
+            raise ValueError(f"{epc}: missing or invalid price")
+
+
+def snapshot_builder(snap_path):
+    """Publish versions as mmap snapshots (shared page cache across processes).
+
+    Snapshot rows are renumbered per version, so use the default builder for
+    ``CompactTray``.
+    """
+    def build(products, version):
+        catalog = MmapCatalog(compile_catalog(products, snap_path))
+        catalog.version = version
+        return catalog
+    return build
+
+
+class LiveCatalog:
+    def __init__(self, products, path=None, build=None):
+        # path: JSON file persisted on publish and optionally watched
+        self.path = path
+        self.registry = RowRegistry()
+        self.build = build or self._build_version
+        self.write_lock = threading.Lock()
+        self.listeners = []
+        self.source = dict(products)
+        self.current = self.build(self.source, 1)
+        self._seen = self._stat()
+        self._watcher = None
+
+    def _build_version(self, products, version):
+        self.registry.update(products)
+        return CatalogVersion(products, version, self.registry)
+
+    # ── READS (lock-free, delegated to the current version) ────────────────────
+    @property
+    def version(self):
+        return self.current.version
+
+    def __len__(self):
+        return len(self.current)
+
+    def __contains__(self, epc):
+        return epc in self.current
+
+    def __iter__(self):
+        return iter(self.current)
+
+    def __getitem__(self, epc):
+        return self.current[epc]
+
+    def get(self, epc, default=None):
+        return self.current.get(epc, default)
+
+    def items(self):
+        return self.current.items()
+
+    def row(self, epc):
+        return self.current.row(epc)
+
+    def epc(self, row):
+        return self.current.epc(row)
+
+    def product(self, row):
+        return self.current.product(row)
+
+    # ── WRITES ─────────────────────────────────────────────────────────────────
+    def subscribe(self, listener):
+        """``listener(old_version, new_version)`` runs after every swap."""
+        self.listeners.append(listener)
+        return listener
+
+    def apply(self, upserts=None, deletes=()):
+        """Publish one new version with ``upserts`` and ``deletes`` applied."""
+        check_products(upserts or {})  # a bad edit never becomes a version
+        with self.write_lock:
+            products = dict(self.source)
+            products.update(upserts or {})
+            for epc in deletes:
+                products.pop(epc, None)
+            return self._publish(products, persist=True)
+
+    def replace(self, products, persist=True):
+        check_products(products)
+        with self.write_lock:
+            return self._publish(dict(products), persist)
+
+    @contextmanager
+    def batch(self):
+        """Collect ``put``/``delete`` calls and publish them as one version."""
+        batch = _Batch()
+        yield batch
+        if batch.upserts or batch.deletes:
+            self.apply(batch.upserts, batch.deletes)
+
+    def _publish(self, products, persist):
+        old = self.current
+        new = self.build(products, old.version + 1)
+        self.source = products
+        self.current = new  # the swap: readers see old or new, never a mix
+        if persist and self.path:
+            self._save(products)
+        for listener in self.listeners:
+            try:
+                listener(old, new)
+            except Exception as e:
+                print(f"⚠️ Catalog listener error: {e}")
+        return new
+
+    def _save(self, products):
+        tmp = f"{self.path}.tmp{os.getpid()}"
+        with open(tmp, "w") as f:
+            json.dump(products, f, indent=2)
+        os.replace(tmp, self.path)
+        self._seen = self._stat()
+
+    # ── FILE WATCHING ──────────────────────────────────────────────────────────
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except (OSError, TypeError):
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def check_file(self):
+        """Reload ``path`` if it changed on disk since we last read or wrote it."""
+        seen = self._stat()
+        if seen is None or seen == self._seen:
+            return None
+        try:
+            with open(self.path, "r") as f:
+                products = json.load(f)
+        except (OSError, ValueError) as e:
+            # probably caught mid-write by an editor: retry on the next poll
+            print(f"⚠️ Catalog reload skipped: {e}")
+            return None
+        try:
+            check_products(products)
+        except ValueError as e:
+            self._seen = seen  # complete but wrong: wait for the next edit
+            print(f"⚠️ Catalog reload skipped: {e}")
+            return None
+        with self.write_lock:
+            self._seen = seen
+            return self._publish(products, persist=False)
+
+    def watch(self, interval=1.0):
+        """Poll ``path`` from a daemon thread and hot-swap external edits."""
+        if self._watcher is None:
+            stop = threading.Event()
+
+            def run():
+                while not stop.wait(interval):
+                    try:
+                        self.check_file()
+                    except Exception as e:  # e.g. the snapshot builder: keep watching
+                        print(f"⚠️ Catalog reload failed: {e!r}")
+
+            self._watcher = stop
+            threading.Thread(target=run, name="catalog-watch", daemon=True).start()
+        return self._watcher
+
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._watcher.set()
+            self._watcher = None
+
+
+class _Batch:
+    def __init__(self):
+        self.upserts = {}
+        self.deletes = set()
+
+    def put(self, epc, product):
+        self.deletes.discard(epc)
+        self.upserts[epc] = product
+
+    def delete(self, epc):
+        self.upserts.pop(epc, None)
+        self.deletes.add(epc)
@@ -0,0 +1,308 @@
+"""Discount rules: category/product percent-off, buy-X-get-Y, bundles, order percent.
+
+Rules are plain dicts (e.g. loaded from ``pricing_rules.json``)::
+
+    {"id": "tops-10",  "type": "percent", "match": {"category": "Tops"}, "percent": 10}
+    {"id": "bogo-jns", "type": "bogo",    "match": {"name": "Jeans"}, "buy": 1, "get": 1}
+    {"id": "eid-set",  "type": "bundle",  "components": [{"name": "Kurti"}, {"category": "Bottoms"}],
+                                          "price": 1800}
+    {"id": "staff",    "type": "order_percent", "percent": 5}
+
+``match`` compares product fields (``epc``, ``name``, ``category``, ``sku`` or
+any other catalog field) to a value or a list of values.
+
+``RuleSet`` compiles the rules once into per-field indexes. ``TrayPricing``
+holds the per-tray state and listens to tray mutations: a change to one EPC
+only re-evaluates the rules that EPC matches, each over its own aggregated
+state (unit price -> qty per component), never over the whole tray.
+
+Item rules claim the units they discount, in the order they are listed:
+a unit taken by a percent rule, a BOGO group or a bundle is not available
+to later rules, so one unit is never given away twice. Only EPCs matching
+several rules need per-EPC bookkeeping; when a rule's claims on them change,
+the later rules sharing them are re-evaluated too. Order percents apply to
+the total after item discounts.
+"""
+import heapq
+import json
+import weakref
+
+from .tray import normalize_epc
+
+
+# ── RULE TYPES ─────────────────────────────────────────────────────────────────
+# Each evaluator gets the units still available to the rule ({price: qty} per
+# component) and returns (discount, units it claims per component).
+def _units(prices):
+    """Unit prices cheapest first from a {price: qty} counter."""
+    for price in sorted(prices):
+        yield price, prices[price]
+
+
+def _cheapest(prices, n):
+    """{price: qty} of the ``n`` cheapest units."""
+    taken = {}
+    for price, qty in _units(prices):
+        if n <= 0:
+            break
+        take = taken[price] = min(n, qty)
+        n -= take
+    return taken
+
+
+def _percent(rule, components):
+    value = sum(price * qty for price, qty in components[0].items())
+    return value * rule["percent"] / 100, components
+
+
+def _bogo(rule, components):
+    # the cheapest matching units go free: buy 2 get 1 on mixed prices gives the cheapest away
+    prices = components[0]
+    group = rule["buy"] + rule["get"]
+    sets = sum(prices.values()) // group
+    if not sets:
+        return 0, [{}]
+    discount = sum(price * qty for price, qty in _cheapest(prices, sets * rule["get"]).items())
+    return discount, [_cheapest(prices, sets * group)]  # the free units and the ones bought for them
+
+
+def _bundle(rule, components):
+    bundles = min(sum(prices.values()) for prices in components)
+    if not bundles:
+        return 0, [{} for _ in components]
+    # bundle the cheapest units of each component
+    used = [_cheapest(prices, bundles) for prices in components]
+    regular = sum(price * qty for taken in used for price, qty in taken.items())
+    if regular <= bundles * rule["price"]:
+        return 0, [{} for _ in components]
+    return regular - bundles * rule["price"], used
+
+
+RULE_TYPES = {"percent": _percent, "bogo": _bogo, "bundle": _bundle}
+
+
+# ── COMPILED RULE SET ──────────────────────────────────────────────────────────
+class RuleSet:
+    def __init__(self, rules, catalog):
+        self.catalog = catalog
+        self.rules = []
+        self.evaluators = []
+        self.order_percent = 0
+        # field -> value -> [(rule index, component index)]
+        self.index = {}
+        self._by_epc = {}
+        self._pricings = weakref.WeakSet()  # attached trays, re-matched on invalidate
+        for rule in rules:
+            self._compile(rule)
+
+    @classmethod
+    def load(cls, path, catalog):
+        with open(path, "r") as f:
+            return cls(json.load(f), catalog)
+
+    def _compile(self, rule):
+        kind = rule["type"]
+        if kind == "order_percent":
+            self.order_percent += rule["percent"]
+            return
+        if kind not in RULE_TYPES:
+            raise ValueError(f"unknown rule type: {kind}")
+        components = rule["components"] if kind == "bundle" else [rule["match"]]
+        rule_idx = len(self.rules)
+        self.rules.append(rule)
+        self.evaluators.append(RULE_TYPES[kind])
+        for comp_idx, match in enumerate(components):
+            if len(match) != 1:
+                raise ValueError(f"rule {rule.get('id')}: match on exactly one field")
+            (field, values), = match.items()
+            if not isinstance(values, list):
+                values = [values]
+            by_value = self.index.setdefault(field, {})
+            for value in values:
+                if field == "epc":
+                    value = normalize_epc(value)
+                by_value.setdefault(value, []).append((rule_idx, comp_idx))
+
+    def matches(self, epc):
+        """(rule index, component index) pairs for an EPC, cached per EPC."""
+        hits = self._by_epc.get(epc)
+        if hits is None:
+            product = self.catalog.get(epc) or {}
+            hits = []
+            for field, by_value in self.index.items():
+                value = epc if field == "epc" else product.get(field)
+                if value is not None:
+                    hits.extend(by_value.get(value, ()))
+            hits = self._by_epc[epc] = tuple(hits)
+        return hits
+
+    def invalidate(self, epc=None):
+        """Forget cached matches after catalog changes and re-price the open trays."""
+        if epc is None:
+            self._by_epc.clear()
+        else:
+            self._by_epc.pop(epc, None)
+        for pricing in list(self._pricings):
+            pricing.rematch(epc)
+
+    def attach(self, tray):
+        pricing = TrayPricing(self).attach(tray)
+        self._pricings.add(pricing)
+        return pricing
+
+
+# ── PER-TRAY STATE ─────────────────────────────────────────────────────────────
+class TrayPricing:
+    def __init__(self, ruleset):
+        self.ruleset = ruleset
+        self.lines = {}  # epc -> (qty, price, rule hits it was counted under) as last seen
+        self.state = {}  # rule index -> [ {price: qty} per component ]
+        self.rule_discount = {}  # rule index -> current discount
+        self.shared = {}  # rule index -> {epc other rules match too: sorted rules it matches}
+        self.claims = {}  # rule index -> {shared epc: units claimed}
+        self.item_discount = 0
+        self.manual_percent = 0
+        self.tray = None
+
+    def attach(self, tray):
+        with tray.lock:
+            self.tray = tray
+            tray.pricing = self
+            for epc, line in tray.lines():
+                self.update(epc, line["qty"], line["price"])
+            tray.subscribe(self.on_tray_event)
+        return self
+
+    def on_tray_event(self, tray, event, epc, line):
+        if event in ("scan", "qty"):
+            if line is None:
+                self.update(epc, 0, self.lines.get(epc, (0, 0))[1])
+            else:
+                self.update(epc, line["qty"], line["price"])
+        elif event == "reset":
+            self.clear()
+
+    def update(self, epc, qty, price):
+        old_qty, old_price, old_hits = self.lines.pop(epc, (0, price, ()))
+        hits = self.ruleset.matches(epc) if qty else ()
+        if qty:
+            self.lines[epc] = (qty, price, hits)
+        if not hits and not old_hits:
+            return
+        rules = self.ruleset.rules
+        if len(old_hits) > 1:
+            for rule_idx, _ in old_hits:
+                if rule_idx in self.shared:
+                    self.shared[rule_idx].pop(epc, None)
+                    self.claims.get(rule_idx, {}).pop(epc, None)
+        if len(hits) > 1:
+            matched = tuple(sorted({rule_idx for rule_idx, _ in hits}))
+            if len(matched) > 1:
+                for rule_idx in matched:
+                    self.shared.setdefault(rule_idx, {})[epc] = matched
+        # take the old quantity back from the rules it was counted under: after a
+        # catalog edit the EPC may match other rules now
+        for rule_idx, comp_idx in old_hits:
+            prices = self.state[rule_idx][comp_idx]
+            left = prices[old_price] - old_qty
+            if left:
+                prices[old_price] = left
+            else:
+                del prices[old_price]
+        for rule_idx, comp_idx in hits:
+            components = self.state.get(rule_idx)
+            if components is None:
+                components = self.state[rule_idx] = [{} for _ in rules[rule_idx].get("components", (0,))]
+            prices = components[comp_idx]
+            prices[price] = prices.get(price, 0) + qty
+        # re-evaluate in rule order: a rule's claims decide what later rules get
+        queue = list({rule_idx for rule_idx, _ in old_hits + hits})
+        heapq.heapify(queue)
+        queued = set(queue)
+        while queue:
+            rule_idx = heapq.heappop(queue)
+            queued.discard(rule_idx)
+            for matched in self._evaluate(rule_idx):
+                for later in matched:
+                    if later > rule_idx and later not in queued:
+                        heapq.heappush(queue, later)
+                        queued.add(later)
+
+    def _evaluate(self, rule_idx):
+        """Re-price one rule over the units earlier rules left; returns the rules of EPCs whose claim changed."""
+        rule = self.ruleset.rules[rule_idx]
+        components = self.state[rule_idx]
+        shared = self.shared.get(rule_idx)
+        groups = {}  # (component, price) -> [(epc a later rule matches too, units still available)]
+        if shared:
+            claims, copied = self.claims, False
+            for epc, matched in shared.items():
+                qty, price, hits = self.lines[epc]
+                taken = 0
+                if matched[0] < rule_idx:
+                    for r in matched:
+                        if r >= rule_idx:
+                            break
+                        if r in claims:
+                            taken += claims[r].get(epc, 0)
+                    taken = min(qty, taken)
+                contested = matched[-1] > rule_idx and qty > taken
+                if not taken and not contested:
+                    continue
+                for r, comp_idx in hits:
+                    if r != rule_idx:
+                        continue
+                    if taken:
+                        if not copied:
+                            components, copied = [dict(prices) for prices in components], True
+                        prices = components[comp_idx]
+                        prices[price] -= taken
+                        if not prices[price]:
+                            del prices[price]
+                    if contested:
+                        groups.setdefault((comp_idx, price), []).append((epc, qty - taken))
+        discount, claimed = self.ruleset.evaluators[rule_idx](rule, components)
+        self.item_discount += discount - self.rule_discount.get(rule_idx, 0)
+        self.rule_discount[rule_idx] = discount
+        if not groups and rule_idx not in self.claims:
+            return ()
+        # claims fall on units no later rule wants first, then on contested EPCs in order
+        claims = {}
+        for (comp_idx, price), epcs in groups.items():
+            need = claimed[comp_idx].get(price, 0) - (components[comp_idx][price] - sum(n for _, n in epcs))
+            for epc, available in sorted(epcs):
+                if need <= 0:
+                    break
+                take = min(need, available)
+                claims[epc] = claims.get(epc, 0) + take
+                need -= take
+        old = self.claims.pop(rule_idx, {})
+        if claims:
+            self.claims[rule_idx] = claims
+        return [shared[epc] for epc in old.keys() | claims.keys()
+                if old.get(epc) != claims.get(epc) and epc in shared]
+
+    def rematch(self, epc=None):
+        """Move lines whose rule matches changed (all, or just ``epc``) to their new rules."""
+        with self.tray.lock:
+            for line_epc, (qty, price, hits) in list(self.lines.items()):
+                if (epc is None or line_epc == epc) and self.ruleset.matches(line_epc) != hits:
+                    self.update(line_epc, qty, price)
+
+    def clear(self):
+        self.lines.clear()
+        self.state.clear()
+        self.rule_discount.clear()
+        self.shared.clear()
+        self.claims.clear()
+        self.item_discount = 0
+
+    def discount(self, subtotal):
+        after_items = subtotal - self.item_discount
+        percent = self.ruleset.order_percent + self.manual_percent
+        return self.item_discount + after_items * percent / 100
+
+    def applied(self):
+        """[(rule id, discount)] for the rules currently giving something."""
+        rules = self.ruleset.rules
+        return [(rules[i].get("id", i), d) for i, d in self.rule_discount.items() if d]
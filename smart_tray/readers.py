@@ -0,0 +1,442 @@
+"""Many serial readers on one asyncio loop, one lane per reader.
+
+    python -m smart_tray.readers --list                        # what is plugged in
+    python -m smart_tray.readers --config readers.json --catalog product_db.json
+
+Ports are found with ``serial.tools.list_ports`` and matched against the
+config by device name, USB serial number or physical location (the latter
+two survive ``/dev/ttyUSB*`` / ``COM*`` renumbering)::
+
+    {
+      "defaults": {"baud": 115200, "protocol": "line"},
+      "readers": [
+        {"match": "A10K3Z9Q", "lane": "1"},
+        {"match": "/dev/ttyUSB3", "lane": "fitting-2", "protocol": "inventory",
+         "filter": {"min_rssi": 40, "antennas": [1], "min_reads": 2}}
+      ],
+      "auto_lanes": true
+    }
+
+With ``auto_lanes`` every other USB serial port gets the next free numeric
+lane. A port that fails (cable bump, USB reset) is closed and reopened with
+backoff, found again by serial number or location if it comes back under
+another device name, and ports plugged in later are picked up by a periodic
+rescan; ``"idle_reconnect": seconds`` also reopens a reader that went
+silent. Read and parser errors reopen the port; an error in the tray (or
+its listeners) is logged and costs that batch, not the connection.
+
+A reader's ``filter`` settings build a ``strays.ReadFilter``, so reads of
+neighbouring racks and lanes are dropped before they reach the tray. On
+POSIX each port's file descriptor is watched with ``loop.add_reader``; on
+Windows (no selectable handles) one task polls all ports. Either way there
+is no thread per port: reads are parsed by a ``FrameReader`` per port and
+handed to ``lanes.get(lane).scan_many``. Shared (``--store``) trays write
+to SQLite and may wait on another process's lock, so their batches go to
+a small thread pool instead, in order per reader and coalesced while one
+is in flight: a busy database delays that lane's scans, never reading.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from .frames import batch_epcs
+
+DEFAULTS = {"baud": 115200, "protocol": "line"}
+POLL_INTERVAL = 0.005  # seconds, only for ports without a selectable fd
+RECONNECT_MIN = 0.05  # first retry after a port fails; doubles up to RECONNECT_MAX
+RECONNECT_MAX = 2.0
+HOTPLUG_INTERVAL = 0.5  # seconds between port rescans
+SCAN_WORKERS = 4  # threads writing batches into shared trays
+PENDING_MAX = 1024  # batches held per reader while its tray is busy
+
+
+def list_ports():
+    from serial.tools import list_ports as _list_ports
+    return sorted(_list_ports.comports(), key=lambda p: p.device)
+
+
+def _matches(port, pattern):
+    return pattern in (port.device, os.path.basename(port.device), port.serial_number, port.location)
+
+
+def find_device(pattern, ports):
+    """Current device name for a config ``match``, or None if it is not plugged in."""
+    port = next((p for p in ports if _matches(p, pattern)), None)
+    if port is not None:
+        return port.device
+    if pattern.startswith("COM") or (pattern.startswith("/dev/") and os.path.exists(pattern)):
+        return pattern  # configured by device name but not enumerated (e.g. a socat pty): open it anyway
+    return None
+
+
+def plan(config, ports=None, quiet=False, known=None):
+    """[(device, settings)] for the ports to open, settings including ``lane``.
+
+    ``known``: {match: lane} of readers already running (or down), so a
+    re-plugged auto-lane port keeps its lane and new ports don't take it.
+    """
+    ports = list_ports() if ports is None else ports
+    known = known or {}
+    defaults = {**DEFAULTS, **config.get("defaults", {})}
+    chosen, used = [], set()
+    for entry in config.get("readers", []):
+        pattern = entry["match"]
+        device = find_device(pattern, ports)
+        if device is None:
+            if not quiet:
+                print(f"⚠️ Reader not found: {pattern}")
+            continue
+        chosen.append((device, {**defaults, **entry}))
+        used.add(device)
+    if config.get("auto_lanes"):
+        lanes = {str(settings["lane"]) for _, settings in chosen} | set(known.values())
+        n = 1
+        for port in ports:
+            if port.device in used or port.vid is None:  # vid None: not a USB adapter
+                continue
+            # serial number / location survive re-enumeration under another device name
+            match = port.serial_number or port.location or port.device
+            lane = known.get(match)
+            if lane is None:
+                while str(n) in lanes:
+                    n += 1
+                lane = str(n)
+                lanes.add(lane)
+            chosen.append((port.device, {**defaults, "match": match, "lane": lane}))
+    return chosen
+
+
+class Backoff:
+    """Retry delays doubling from ``first`` up to ``limit``."""
+
+    def __init__(self, first=RECONNECT_MIN, limit=RECONNECT_MAX):
+        self.first = first
+        self.limit = limit
+        self.delay = first
+
+    def next(self):
+        delay = self.delay
+        self.delay = min(delay * 2, self.limit)
+        return delay
+
+    def reset(self):
+        self.delay = self.first
+
+
+class PortReader:
+    def __init__(self, device, settings, lanes, log=None, executor=None):
+        from .frames import PARSERS, FrameReader
+        from .strays import ReadFilter
+        self.device = device
+        self.key = settings.get("match", device)  # what finds the port again after a replug
+        self.lane = str(settings["lane"])
+        self.settings = settings
+        self.tray = lanes.get(self.lane)
+        self.log = log
+        self.filter = ReadFilter.from_settings(self.tray.catalog, settings.get("filter"))
+        self.executor = executor  # scans off the loop (shared trays)
+        self.pending = []  # batches waiting for the scan in flight
+        self.scanning = None  # future of that scan
+        self.dropped = 0
+        self.serial = None
+        self.fd = None  # registered with the loop
+        self.reads = 0
+        self.reconnects = 0
+        self.last_data = 0.0
+        self.backoff = Backoff()
+        self.retry = None  # pending reconnect (asyncio TimerHandle)
+        self.frames = FrameReader(self, PARSERS[settings["protocol"]](**settings.get("parser", {})),
+                                  self._on_batch)
+
+    # FrameReader reads through us so a port can be swapped without a new reader
+    def readinto(self, buf):
+        return self.serial.readinto(buf)
+
+    @property
+    def in_waiting(self):
+        return self.serial.in_waiting
+
+    def open(self):
+        import serial
+        # timeout=0: never block the loop, read only what has arrived
+        self.serial = serial.Serial(self.device, self.settings["baud"], timeout=0)
+        self.last_data = time.monotonic()
+        return self.serial
+
+    def close(self):
+        if self.serial is not None:
+            try:
+                self.serial.close()
+            except OSError:
+                pass  # already gone with the device
+            self.serial = None
+        self.frames.reset()  # a frame cut by the failure must not be glued to the next connection
+
+    def fileno(self):
+        try:
+            return self.serial.fileno()
+        except (AttributeError, OSError):
+            return None
+
+    def _on_batch(self, batch):
+        try:
+            self.reads += len(batch)
+            epcs = batch_epcs(batch, self.log, self.filter, self.device, self.lane)
+            if not epcs:
+                return
+            if self.executor is None:
+                self.tray.scan_many(epcs)
+            elif len(self.pending) < PENDING_MAX:
+                self.pending.append(epcs)
+                if self.scanning is None:
+                    self._submit()
+            else:
+                self.dropped += len(epcs)
+        except Exception as e:
+            # the port is fine: lose this batch, keep the connection and its buffer
+            print(f"⚠️ Lane {self.lane}: batch from {self.device} dropped: {e!r}")
+
+    def _take_pending(self):
+        # everything that queued up meanwhile goes in one transaction
+        epcs = [epc for batch in self.pending for epc in batch]
+        self.pending.clear()
+        return epcs
+
+    def _submit(self):
+        loop = asyncio.get_running_loop()
+        self.scanning = loop.run_in_executor(self.executor, self.tray.scan_many, self._take_pending())
+        self.scanning.add_done_callback(self._scanned)
+
+    def _scanned(self, future):
+        self.scanning = None
+        if not future.cancelled() and future.exception() is not None:
+            print(f"⚠️ Lane {self.lane}: batch from {self.device} dropped: {future.exception()!r}")
+        if self.pending and self.executor is not None:
+            self._submit()
+
+    def stop_scans(self):
+        """Hand what is still queued to the pool and stop offloading (the pool finishes it)."""
+        if self.executor is not None and self.pending:
+            self.executor.submit(self.tray.scan_many, self._take_pending())
+        self.executor = None
+
+    def poll(self, readable=False):
+        """Drain what the port has buffered; returns bytes read.
+
+        ``readable``: the fd was reported ready, so read even if nothing is
+        waiting (that is how an unplugged device shows up: pyserial raises).
+        """
+        total = 0
+        if readable and not self.serial.in_waiting:
+            total = self.frames.poll()
+        else:
+            while self.serial.in_waiting:
+                n = self.frames.poll()
+                if not n:
+                    break
+                total += n
+        if total:
+            self.last_data = time.monotonic()
+        return total
+
+
+class MultiReader:
+    def __init__(self, lanes, config, log=None):
+        self.lanes = lanes
+        self.config = config
+        self.log = log
+        self.readers = {}  # config match -> PortReader, kept while its port is down
+        self.list_ports = list_ports
+        self.rescan_interval = HOTPLUG_INTERVAL  # None: no hot-plug / idle checks
+        self.executor = None  # created for the first shared tray
+        self._polled = set()
+
+    def start(self, loop=None, ports=None):
+        """Open every planned port and register it with ``loop``; returns the readers."""
+        loop = loop or asyncio.get_event_loop()
+        for device, settings in plan(self.config, ports):
+            self._add(loop, device, settings)
+        return list(self.readers.values())
+
+    def _scan_executor(self, lane):
+        if not getattr(self.lanes.get(lane), "shared", False):
+            return None
+        if self.executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self.executor = ThreadPoolExecutor(SCAN_WORKERS, thread_name_prefix="scan")
+        return self.executor
+
+    def _add(self, loop, device, settings):
+        reader = PortReader(device, settings, self.lanes, self.log, self._scan_executor(str(settings["lane"])))
+        self.readers[reader.key] = reader
+        self._connect(loop, reader)
+        return reader
+
+    def _connect(self, loop, reader):
+        try:
+            reader.open()
+        except Exception as e:
+            print(f"⚠️ Serial error on {reader.device}: {e}")
+            self._retry_later(loop, reader)
+            return False
+        reader.backoff.reset()
+        reader.fd = reader.fileno()
+        if reader.fd is None:
+            self._polled.add(reader)
+        else:
+            loop.add_reader(reader.fd, self._on_readable, loop, reader)
+        settings = reader.settings
+        print(f"✅ {reader.device} → lane {reader.lane} ({settings['protocol']} @ {settings['baud']} baud)"
+              + (f", reconnect #{reader.reconnects}" if reader.reconnects else ""))
+        return True
+
+    def _retry_later(self, loop, reader):
+        reader.retry = loop.call_later(reader.backoff.next(), self._reconnect, loop, reader)
+
+    def _reconnect(self, loop, reader, device=None):
+        if reader.retry is not None:
+            reader.retry.cancel()
+            reader.retry = None
+        if device is None:
+            try:
+                device = find_device(reader.key, self.list_ports())
+            except Exception:
+                device = reader.device  # no enumeration here: try the old name
+        if device is None:
+            self._retry_later(loop, reader)  # still unplugged
+            return
+        reader.device = device
+        reader.reconnects += 1
+        self._connect(loop, reader)
+
+    def _on_readable(self, loop, reader):
+        try:
+            reader.poll(readable=True)
+        except Exception as e:  # pyserial's SerialException is an OSError; anything else is a parser bug
+            self._drop(loop, reader, e)
+
+    def _unregister(self, loop, reader):
+        if reader.fd is not None:
+            loop.remove_reader(reader.fd)
+            reader.fd = None
+        self._polled.discard(reader)
+
+    def _drop(self, loop, reader, error):
+        """Close a failed port and reconnect it with backoff (lane, filter and counters stay)."""
+        print(f"⚠️ Serial error on {reader.device}: {error}")
+        self._unregister(loop, reader)
+        reader.close()
+        self._retry_later(loop, reader)
+
+    def _rescan(self, loop):
+        """Hot-plug: open new ports, reconnect returning ones at once, reopen silent ones."""
+        try:
+            ports = self.list_ports()
+        except Exception:
+            return
+        known = {key: reader.lane for key, reader in self.readers.items()}
+        for device, settings in plan(self.config, ports, quiet=True, known=known):
+            reader = self.readers.get(settings["match"])
+            if reader is None:
+                self._add(loop, device, settings)
+            elif reader.serial is None:
+                self._reconnect(loop, reader, device)  # don't wait out the backoff
+        now = time.monotonic()
+        for reader in list(self.readers.values()):
+            idle = reader.settings.get("idle_reconnect")
+            if idle and reader.serial is not None and now - reader.last_data > idle:
+                self._drop(loop, reader, f"no data for {idle} s")
+
+    async def run(self, ports=None):
+        """Start all readers and serve them until cancelled."""
+        loop = asyncio.get_running_loop()
+        if ports is not None:
+            self.list_ports = lambda: ports
+        self.start(loop, ports)
+        interval = self.rescan_interval
+        next_rescan = loop.time() + interval if interval else None
+        try:
+            while True:
+                for reader in list(self._polled):
+                    try:
+                        reader.poll()
+                    except Exception as e:  # one reader's failure must not end the task serving all
+                        self._drop(loop, reader, e)
+                if next_rescan is not None and loop.time() >= next_rescan:
+                    self._rescan(loop)
+                    next_rescan = loop.time() + interval
+                await asyncio.sleep(POLL_INTERVAL if self._polled else min(interval or 1.0, 1.0))
+        finally:
+            self.stop(loop)
+
+    def stop(self, loop=None):
+        for reader in list(self.readers.values()):
+            if reader.retry is not None:
+                reader.retry.cancel()
+                reader.retry = None
+            if loop is not None:
+                self._unregister(loop, reader)
+            reader.close()
+            reader.stop_scans()
+        self.readers.clear()
+        self._polled.clear()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+
+def load_config(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    from .catalog import load_product_db
+    from .lanes import Lanes
+    from .tray import Tray
+
+    parser = argparse.ArgumentParser(description="Ingest many RFID readers, one lane each")
+    parser.add_argument("--config", help="readers.json (see module docs)")
+    parser.add_argument("--port", action="append", default=[], metavar="DEVICE=LANE",
+                        help="add a reader without a config file (repeatable)")
+    parser.add_argument("--auto", action="store_true", help="give every other USB serial port a lane")
+    parser.add_argument("--catalog", default="product_db.json")
+    parser.add_argument("--store", help="write into shared SQLite trays (see smart_tray.shared) for API/UI workers")
+    parser.add_argument("--log", help="record raw reads to this read log (see smart_tray.readlog)")
+    parser.add_argument("--list", action="store_true", help="list serial ports and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for p in list_ports():
+            print(f"{p.device:<16} serial={p.serial_number or '-':<14} location={p.location or '-':<10} {p.description}")
+        return
+
+    config = load_config(args.config) if args.config else {}
+    config.setdefault("readers", [])
+    for spec in args.port:
+        device, _, lane = spec.partition("=")
+        config["readers"].append({"match": device, "lane": lane or device})
+    config["auto_lanes"] = config.get("auto_lanes") or args.auto
+    if not config["readers"] and not config["auto_lanes"]:
+        sys.exit("no readers: pass --config, --port DEVICE=LANE or --auto")
+
+    log = None
+    if args.log:
+        from .readlog import ReadLog
+        log = ReadLog(args.log)
+    factory = Tray
+    if args.store:
+        from .shared import SqliteStore
+        factory = SqliteStore(args.store).tray_factory
+    lanes = Lanes(load_product_db(args.catalog), tray_factory=factory)
+    try:
+        asyncio.run(MultiReader(lanes, config, log).run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+"""Memory-mapped ring buffer of raw tag reads, for disputes, debugging and replay.
+
+    python -m smart_tray.readlog reads.ring info
+    python -m smart_tray.readlog reads.ring slice --since "2025-06-01 14:00" --lane 3 --out dispute.jsonl
+    python -m smart_tray.readlog dispute.jsonl replay --catalog product_db.json
+
+The ingest side appends every read (time, port, lane, RSSI, antenna, EPC as
+received) with one ``struct.pack_into`` into a fixed-size file mapping: no
+allocation, one ``flock`` per batch, and the oldest reads are overwritten
+once the ring is full. Several processes may write the same ring (the UI
+and ``python -m smart_tray.readers --log``): the lock covers the head
+update, the record writes and the name table. Other processes open the same file read-only and slice it by time
+(binary search: timestamps are kept non-decreasing, a wall-clock step back
+is clamped to the previous record's time), lane and port.
+
+Layout (little-endian)::
+
+    header   4096 bytes: magic, format, record size, capacity, head (u64),
+             then a table of up to 63 names (ports and lanes), 64 bytes each
+    records  capacity x 64 bytes: time f64, port u16, lane u16, rssi i16,
+             antenna u8 (255: none), payload length u8, payload 48 bytes
+
+Format 1 logs (antenna 0 meant "none") are still read and appended to.
+Without ``fcntl`` (Windows) only one process may write a ring.
+
+``head`` counts every record ever written; record ``i`` lives in slot
+``i % capacity`` and is valid while ``i >= head - capacity``.
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: one writing process per ring
+    fcntl = None
+
+MAGIC = b"STREADLG"
+FORMAT = 2
+HEADER_SIZE = 4096
+DEFAULT_CAPACITY = 1 << 20  # ~1M reads, 64 MiB
+PAYLOAD = 48
+NO_RSSI = -0x8000
+NO_ANTENNA = 0xFF
+
+_HEADER = struct.Struct("<8sIII")  # magic, format, record size, capacity
+_HEAD = struct.Struct("<Q")
+_HEAD_OFF = 24
+_NAME = 64
+_NAMES_OFF = 64
+MAX_NAMES = (HEADER_SIZE - _NAMES_OFF) // _NAME
+_RECORD = struct.Struct(f"<dHHhBB{PAYLOAD}s")
+_TIME = struct.Struct("<d")
+
+Read = namedtuple("Read", "ts port lane rssi antenna epc")
+
+
+class ReadLog:
+    def __init__(self, path, capacity=DEFAULT_CAPACITY, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        if not readonly and not os.path.exists(path):
+            self._create(path, capacity)
+        with open(path, "rb" if readonly else "r+b") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ if readonly else mmap.ACCESS_WRITE)
+        magic, fmt, record_size, self.capacity = _HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or fmt not in (1, FORMAT) or record_size != _RECORD.size:
+            raise ValueError(f"not a read log: {path}")
+        self.no_antenna = 0 if fmt == 1 else NO_ANTENNA
+        self.lock = threading.Lock()
+        # flock-ed around every write: other processes may append to the same ring
+        self.fd = None if readonly or fcntl is None else os.open(path, os.O_RDWR)
+        self.names = []
+        self.ids = {}
+        self._load_names()
+
+    @staticmethod
+    def _create(path, capacity):
+        tmp = f"{path}.tmp{os.getpid()}"
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, FORMAT, _RECORD.size, capacity).ljust(HEADER_SIZE, b"\0"))
+            f.truncate(HEADER_SIZE + capacity * _RECORD.size)
+        os.replace(tmp, path)
+
+    def close(self):
+        self.mm.close()
+        if self.fd is not None:
+            os.close(self.fd)
+
+    @contextmanager
+    def _writing(self):
+        """Exclusive against other threads and, with fcntl, other processes."""
+        with self.lock:
+            if self.fd is None:
+                yield
+                return
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    # ── NAMES (ports and lanes) ────────────────────────────────────────────────
+    def _load_names(self):
+        names = []
+        for i in range(MAX_NAMES):
+            off = _NAMES_OFF + i * _NAME
+            raw = self.mm[off:off + _NAME]
+            if not raw[0]:
+                break
+            names.append(raw[1:raw[0]].decode("utf-8"))  # raw[0] = length + 1, 0 = unused
+        self.names = names
+        self.ids = {name: i for i, name in enumerate(names)}
+
+    def name_id(self, key):
+        i = self.ids.get(key)
+        if i is not None:
+            return i
+        name = "" if key is None else str(key)
+        i = self.ids.get(name)
+        if i is None:
+            with self._writing():
+                self._load_names()  # another writer may have added it
+                i = self.ids.get(name)
+                if i is None:
+                    data = name.encode("utf-8")[:_NAME - 2]
+                    i = len(self.names)
+                    if i >= MAX_NAMES:
+                        raise ValueError(f"read log name table is full ({MAX_NAMES} ports + lanes)")
+                    off = _NAMES_OFF + i * _NAME
+                    self.mm[off + 1:off + 1 + len(data)] = data
+                    self.mm[off] = len(data) + 1
+                    self.names.append(name)
+                    self.ids[name] = i
+        self.ids[key] = i  # also cache None / int lanes as given
+        return i
+
+    def name(self, i):
+        if i >= len(self.names):
+            self._load_names()
+        return self.names[i] if i < len(self.names) else f"#{i}"
+
+    # ── WRITE ──────────────────────────────────────────────────────────────────
+    @property
+    def head(self):
+        return _HEAD.unpack_from(self.mm, _HEAD_OFF)[0]
+
+    def _ids(self, port, lane):
+        ids = self.ids
+        port_id = ids.get(port)
+        if port_id is None:
+            port_id = self.name_id(port)
+        lane_id = ids.get(lane)
+        if lane_id is None:
+            lane_id = self.name_id(lane)
+        return port_id, lane_id
+
+    def _append(self, port_id, lane_id, reads, ts):
+        """Write ``(epc, rssi, antenna)`` reads; the caller holds ``_writing()``."""
+        mm, capacity, no_antenna = self.mm, self.capacity, self.no_antenna
+        head = _HEAD.unpack_from(mm, _HEAD_OFF)[0]
+        if head:
+            ts = max(ts, self._ts(head - 1))  # clock stepped back: keep the bisect valid
+        for epc, rssi, antenna in reads:
+            payload = epc.encode("utf-8", "replace") if isinstance(epc, str) else bytes(epc)
+            _RECORD.pack_into(mm, HEADER_SIZE + (head % capacity) * _RECORD.size,
+                              ts, port_id, lane_id, NO_RSSI if rssi is None else rssi,
+                              no_antenna if antenna is None else antenna,
+                              min(len(payload), PAYLOAD), payload)
+            head += 1
+            # publish after the record is complete: readers never see a half-written head record
+            _HEAD.pack_into(mm, _HEAD_OFF, head)
+
+    def append(self, port, epc, rssi=None, antenna=None, lane=None, ts=None):
+        port_id, lane_id = self._ids(port, lane)
+        with self._writing():
+            self._append(port_id, lane_id, ((epc, rssi, antenna),), time.time() if ts is None else ts)
+
+    def append_batch(self, port, batch, lane=None):
+        """Log a ``frames`` batch (iterates as ``(epc, rssi, antenna)``) under one lock."""
+        port_id, lane_id = self._ids(port, lane)
+        with self._writing():
+            self._append(port_id, lane_id, batch, time.time())
+
+    # ── READ ───────────────────────────────────────────────────────────────────
+    def __len__(self):
+        return min(self.head, self.capacity)
+
+    def _ts(self, i):
+        return _TIME.unpack_from(self.mm, HEADER_SIZE + (i % self.capacity) * _RECORD.size)[0]
+
+    def _read(self, i):
+        return _RECORD.unpack_from(self.mm, HEADER_SIZE + (i % self.capacity) * _RECORD.size)
+
+    def records(self, since=None, until=None, lane=None, port=None):
+        """Reads in ``[since, until]`` (epoch seconds), optionally for one lane/port, oldest first."""
+        head = self.head
+        first = max(0, head - self.capacity)
+        index = _LogicalIndex(self, first, head)
+        lo = first if since is None else first + bisect_left(index, since)
+        hi = head if until is None else first + bisect_right(index, until)
+        self._load_names()
+        lane_id = None if lane is None else self.ids.get(str(lane), -1)
+        port_id = None if port is None else self.ids.get(str(port), -1)
+        name = self.name
+        for i in range(lo, hi):
+            ts, p, l, rssi, antenna, n, payload = self._read(i)
+            if self.head - self.capacity > i:
+                continue  # overwritten while we were reading
+            if (lane_id is None or l == lane_id) and (port_id is None or p == port_id):
+                yield Read(ts, name(p), name(l), None if rssi == NO_RSSI else rssi,
+                           None if antenna == self.no_antenna else antenna,
+                           payload[:n].decode("utf-8", "replace"))
+
+
+class _LogicalIndex:
+    """Sequence view of record timestamps for ``bisect``."""
+
+    def __init__(self, log, first, head):
+        self.log, self.first, self.n = log, first, head - first
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i):
+        return self.log._ts(self.first + i)
+
+
+# ── TRACES ─────────────────────────────────────────────────────────────────────
+def export_trace(reads, path):
+    """Write reads as JSON lines (one read per line); returns the count."""
+    count = 0
+    with open(path, "w") as f:
+        for read in reads:
+            f.write(json.dumps(read._asdict()) + "\n")
+            count += 1
+    return count
+
+
+def load_trace(path):
+    with open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                yield Read(**json.loads(line))
+
+
+def replay(reads, target, speed=None):
+    """Feed reads back into ``Lanes`` (by lane) or a single tray.
+
+    ``speed``: None replays as fast as possible, 1.0 in real time, 10 ten
+    times faster. Returns the number of reads replayed.
+    """
+    lanes = target if hasattr(target, "trays") else None
+    count, start, t0 = 0, time.perf_counter(), None
+    for read in reads:
+        if speed:
+            if t0 is None:
+                t0 = read.ts
+            delay = (read.ts - t0) / speed - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+        tray = lanes.get(read.lane) if lanes is not None else target
+        tray.scan(read.epc)
+        count += 1
+    return count
+
+
+def parse_time(value):
+    """Epoch seconds from a number or a local 'YYYY-MM-DD[ HH:MM[:SS]]' string."""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        formats = ("%Y-%m-%d", "%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S")
+        colons = value.count(":")
+        if colons >= len(formats):
+            raise ValueError(f"not a time: {value!r}") from None
+        return time.mktime(time.strptime(value, formats[colons]))
+
+
+def main(argv=None):
+    from .catalog import load_product_db
+    from .lanes import Lanes
+    from .tray import summary_text
+
+    parser = argparse.ArgumentParser(description="Inspect, slice and replay raw tag read logs")
+    parser.add_argument("source", help="read log (ring file) or exported .jsonl trace")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("info")
+    for name in ("slice", "replay"):
+        p = sub.add_parser(name)
+        p.add_argument("--since", help="epoch seconds or 'YYYY-MM-DD HH:MM[:SS]' (local time)")
+        p.add_argument("--until")
+        p.add_argument("--lane")
+        p.add_argument("--port")
+    sub.choices["slice"].add_argument("--out", help="write a .jsonl trace instead of printing")
+    sub.choices["replay"].add_argument("--catalog", default="product_db.json")
+    sub.choices["replay"].add_argument("--speed", type=float, help="1.0 = real time (default: as fast as possible)")
+    args = parser.parse_args(argv)
+
+    if args.source.endswith(".jsonl"):
+        log = None
+        reads = list(load_trace(args.source))
+    else:
+        log = ReadLog(args.source, readonly=True)
+        reads = None
+
+    if args.command == "info":
+        if log is None:
+            sys.exit("info needs a read log, not a trace")
+        reads = list(log.records())
+        print(f"{args.source}: {len(reads)} / {log.capacity} reads, {log.head} written")
+        if reads:
+            fmt = "%Y-%m-%d %H:%M:%S"
+            print(f"from {time.strftime(fmt, time.localtime(reads[0].ts))} "
+                  f"to {time.strftime(fmt, time.localtime(reads[-1].ts))}")
+        print(f"names: {', '.join(repr(n) for n in log.names)}")
+        return
+
+    since, until = parse_time(args.since), parse_time(args.until)
+    if log is not None:
+        reads = log.records(since, until, args.lane, args.port)
+    else:
+        reads = [r for r in reads if (since is None or r.ts >= since) and (until is None or r.ts <= until)
+                 and (args.lane is None or r.lane == args.lane) and (args.port is None or r.port == args.port)]
+
+    if args.command == "slice":
+        if args.out:
+            print(f"✅ {export_trace(reads, args.out)} reads written to {args.out}")
+        else:
+            for r in reads:
+                stamp = time.strftime("%H:%M:%S", time.localtime(r.ts)) + f".{int(r.ts % 1 * 1000):03d}"
+                print(f"{stamp}  {r.port:<14} lane {r.lane or '-':<4} {r.epc}  rssi {r.rssi}  ant {r.antenna}")
+    else:
+        lanes = Lanes(load_product_db(args.catalog))
+        print(f"✅ Replayed {replay(reads, lanes, args.speed)} reads")
+        for lane in lanes:
+            tray = lanes.get(lane)
+            print(f"\n── lane {lane or '-'}: {len(tray)} lines")
+            for row in tray.rows():
+                print(f"{row[0]}  {row[1]} x{row[3]}")
+            print(summary_text(tray.summary()))
+
+
+if __name__ == "__main__":
+    main()
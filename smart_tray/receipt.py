@@ -0,0 +1,142 @@
+"""ESC/POS receipts for 80 mm thermal printers, rendered straight from a bill.
+
+    printer = ReceiptPrinter(open_sink("/dev/usb/lp0"))   # or "tcp://10.0.0.40:9100"
+    printer.print_bill(tray.complete())
+
+``Receipt`` encodes the static header and footer blocks once; rendering a
+bill only formats its rows and totals into a byte string (well under a
+millisecond for a typical tray), with no PDF or imaging library involved.
+A bill is what ``Tray.snapshot()`` / ``Tray.complete()`` return.
+"""
+import socket
+import time
+
+from .tray import CURRENCY
+
+# ── ESC/POS COMMANDS ───────────────────────────────────────────────────────────
+ESC = b"\x1b"
+GS = b"\x1d"
+INIT = ESC + b"@"
+LEFT, CENTER, RIGHT = ESC + b"a\x00", ESC + b"a\x01", ESC + b"a\x02"
+BOLD_ON, BOLD_OFF = ESC + b"E\x01", ESC + b"E\x00"
+DOUBLE_ON, DOUBLE_OFF = GS + b"!\x11", GS + b"!\x00"  # double width + height
+CUT = GS + b"V\x42\x00"  # feed to the cutter, then partial cut
+LF = b"\n"
+
+
+def feed(lines):
+    return ESC + b"d" + bytes([lines])
+
+
+class Receipt:
+    """Renders bills as ESC/POS bytes. ``width`` is characters per line (Font A: 48 on 80 mm)."""
+
+    def __init__(self, header=("Smart Tray",), footer=("Thank you for shopping!",),
+                 width=48, encoding="cp437"):
+        self.width = width
+        self.encoding = encoding
+        name = width - 24
+        # name | qty | unit price | line total
+        self.row_format = f"{{:<{name}.{name}}}{{:>5}}{{:>9.0f}}{{:>10.0f}}\n"
+        self.total_format = f"{{:<{width - 14}}}{{:>14}}\n"
+        self.header = self._block(header, title=True)
+        self.columns = (self.encode(self.rule()) + BOLD_ON
+                        + self.encode(f"{'Item':<{name}}{'Qty':>5}{'Price':>9}{'Total':>10}\n") + BOLD_OFF)
+        self.footer = self._block(footer) + feed(3) + CUT
+
+    def encode(self, text):
+        return text.encode(self.encoding, "replace")
+
+    def rule(self):
+        return "-" * self.width + "\n"
+
+    def _block(self, lines, title=False):
+        out = [CENTER]
+        for i, line in enumerate(lines):
+            if title and i == 0:
+                out += [BOLD_ON, DOUBLE_ON, self.encode(line[:self.width // 2]), DOUBLE_OFF, BOLD_OFF, LF]
+            else:
+                out += [self.encode(line[:self.width]), LF]
+        out.append(LEFT)
+        return INIT + b"".join(out) if title else b"".join(out)
+
+    def render(self, bill, when=None):
+        """ESC/POS bytes for ``bill`` (header, rows, totals, footer, cut)."""
+        stamp = time.strftime("%Y-%m-%d %H:%M", time.localtime(when))
+        lane = bill.get("lane")
+        info = f"Lane {lane}  {stamp}" if lane is not None else stamp
+        row = self.row_format.format
+        text = [self.rule()]
+        text += [row(name, qty, price, total) for _, name, price, qty, total in bill["rows"]]
+        text.append(self.rule())
+        total = self.total_format.format
+        text.append(total("Subtotal", f"{bill['subtotal']:.0f} {CURRENCY}"))
+        if bill["discount"]:
+            text.append(total("Discount", f"-{bill['discount']:.0f} {CURRENCY}"))
+        body = self.encode("".join(text))
+        grand = self.encode(f"TOTAL {bill['total']:.0f} {CURRENCY}")
+        return b"".join((self.header, self.encode(info + "\n"), self.columns, body,
+                         CENTER + BOLD_ON + DOUBLE_ON, grand, DOUBLE_OFF + BOLD_OFF + LF + LEFT, self.footer))
+
+
+# ── SINKS ──────────────────────────────────────────────────────────────────────
+class FileSink:
+    """Printer device file (``/dev/usb/lp0``, ``LPT1``) or a plain file for tests."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "ab", buffering=0)
+
+    def write(self, data):
+        self.file.write(data)
+
+    def close(self):
+        self.file.close()
+
+
+class SocketSink:
+    """Network printer on raw TCP (port 9100); reconnects once if the link dropped."""
+
+    def __init__(self, host, port=9100, timeout=5.0):
+        self.address = (host, port)
+        self.timeout = timeout
+        self.sock = None
+
+    def write(self, data):
+        for attempt in (0, 1):
+            try:
+                if self.sock is None:
+                    self.sock = socket.create_connection(self.address, timeout=self.timeout)
+                self.sock.sendall(data)
+                return
+            except OSError:
+                self.close()
+                if attempt:
+                    raise
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+def open_sink(target):
+    """``tcp://host[:port]`` for a network printer, anything else is a device/file path."""
+    if target.startswith("tcp://"):
+        host, _, port = target[len("tcp://"):].partition(":")
+        return SocketSink(host, int(port or 9100))
+    return FileSink(target)
+
+
+class ReceiptPrinter:
+    def __init__(self, sink, receipt=None):
+        self.sink = sink
+        self.receipt = receipt or Receipt()
+
+    def print_bill(self, bill, when=None):
+        data = self.receipt.render(bill, when)
+        self.sink.write(data)
+        return data
+
+    def close(self):
+        self.sink.close()
@@ -0,0 +1,267 @@
+"""Tray state shared between processes through SQLite (WAL mode).
+
+``SqliteTray`` has the ``Tray`` API, so the serial ingest process, Gradio
+workers and uvicorn workers can each open the same store and see one tray
+per lane. Every mutation is one short write transaction; reads run
+concurrently with writes thanks to WAL. Put ``{lane}`` in the path to give
+each lane its own database file, so lanes write in parallel on multi-core
+hosts::
+
+    store = SqliteStore("/var/lib/smart-tray/lane-{lane}.db")
+    lanes = Lanes(catalog, tray_factory=store.tray_factory)
+
+Listeners only hear mutations made in their own process; other processes
+notice changes through ``version``.
+"""
+import os
+import re
+import sqlite3
+import threading
+
+from .tray import TrayBase, normalize_epc
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trays (
+    lane     TEXT PRIMARY KEY,
+    version  INTEGER NOT NULL DEFAULT 0,
+    subtotal NUMERIC NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS lines (
+    lane  TEXT    NOT NULL,
+    epc   TEXT    NOT NULL,
+    name  TEXT    NOT NULL,
+    price NUMERIC NOT NULL,
+    qty   INTEGER NOT NULL,
+    seq   INTEGER NOT NULL,
+    PRIMARY KEY (lane, epc)
+);
+"""
+
+
+class SqliteStore:
+    def __init__(self, path):
+        self.path = path
+        self.connections = {}  # path -> (connection, lock of every tray using it)
+        self.lock = threading.Lock()
+
+    def _file(self, lane):
+        if "{lane}" not in self.path:
+            return self.path
+        return self.path.format(lane=re.sub(r"[^\w.-]", "_", str(lane)))
+
+    def connect(self, lane):
+        """(connection, lock) for ``lane``; hold the lock for every use of the connection."""
+        path = self._file(lane)
+        with self.lock:
+            found = self.connections.get(path)
+            if found is None:
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.executescript(SCHEMA)
+                # lanes sharing a file share the connection: one lock serializes their transactions
+                found = self.connections[path] = (conn, threading.RLock())
+        return found
+
+    def tray_factory(self, catalog, lane=None):
+        return SqliteTray(catalog, lane, store=self)
+
+    def close(self):
+        with self.lock:
+            for conn, _ in self.connections.values():
+                conn.close()
+            self.connections.clear()
+
+
+class SqliteTray(TrayBase):
+    shared = True
+
+    def __init__(self, catalog, lane=None, store=None, path="trays.db"):
+        self.catalog = catalog
+        self.lane = "" if lane is None else str(lane)
+        self.store = store or SqliteStore(path)
+        # the lock is the connection's, shared with every lane in the same file
+        self.db, self.lock = self.store.connect(self.lane)
+        with self.lock:
+            self.db.execute("INSERT OR IGNORE INTO trays (lane) VALUES (?)", (self.lane,))
+        self.pricing = None
+        self._priced_version = None
+        self.listeners = []
+
+    # ── TRANSACTIONS ───────────────────────────────────────────────────────────
+    def _write(self, fn, *args):
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(*args)
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+            return result
+
+    def _bump(self, delta):
+        self.db.execute("UPDATE trays SET version = version + 1, subtotal = subtotal + ? WHERE lane = ?",
+                        (delta, self.lane))
+        if self.pricing is not None and self._priced_version is not None:
+            # the listener keeps pricing current only if it was current before this write
+            version = self._read_version()
+            self._priced_version = version if self._priced_version == version - 1 else None
+
+    def _read_version(self):
+        return self.db.execute("SELECT version FROM trays WHERE lane = ?", (self.lane,)).fetchone()[0]
+
+    # ── CONTAINER ──────────────────────────────────────────────────────────────
+    @property
+    def version(self):
+        with self.lock:
+            return self._read_version()
+
+    @property
+    def subtotal(self):
+        with self.lock:
+            return self.db.execute("SELECT subtotal FROM trays WHERE lane = ?", (self.lane,)).fetchone()[0]
+
+    def __len__(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM lines WHERE lane = ?", (self.lane,)).fetchone()[0]
+
+    def __contains__(self, epc):
+        return self.get(epc) is not None
+
+    def __iter__(self):
+        with self.lock:
+            return iter([r[0] for r in self.db.execute(
+                "SELECT epc FROM lines WHERE lane = ? ORDER BY seq", (self.lane,))])
+
+    def get(self, epc):
+        with self.lock:
+            row = self.db.execute("SELECT name, price, qty FROM lines WHERE lane = ? AND epc = ?",
+                                  (self.lane, epc)).fetchone()
+        return None if row is None else {"name": row[0], "price": row[1], "qty": row[2]}
+
+    def lines(self):
+        with self.lock:
+            return [(epc, {"name": name, "price": price, "qty": qty}) for epc, name, price, qty in self.db.execute(
+                "SELECT epc, name, price, qty FROM lines WHERE lane = ? ORDER BY seq", (self.lane,))]
+
+    # ── MUTATIONS ──────────────────────────────────────────────────────────────
+    def scan(self, epc):
+        """Add one read of ``epc``. Returns the tray line, or None if unknown."""
+        return self._scan_one(epc, self.catalog, True)
+
+    def _scan_one(self, epc, catalog, transaction):
+        epc = normalize_epc(epc)
+        product = catalog.get(epc)
+        if product is None:
+            if self.listeners:
+                self._emit("unknown", epc)
+            return None
+        if transaction:
+            return self._write(self._scan, epc, product)
+        return self._scan(epc, product)
+
+    def _scan(self, epc, product):
+        db = self.db
+        row = db.execute("SELECT name, price, qty FROM lines WHERE lane = ? AND epc = ?", (self.lane, epc)).fetchone()
+        if row is None:
+            name, price, qty = product["name"], product["price"], 1
+            db.execute("INSERT INTO lines (lane, epc, name, price, qty, seq) VALUES (?, ?, ?, ?, 1, "
+                       "(SELECT version FROM trays WHERE lane = ?))", (self.lane, epc, name, price, self.lane))
+        else:
+            name, price, qty = row[0], row[1], row[2] + 1
+            db.execute("UPDATE lines SET qty = ? WHERE lane = ? AND epc = ?", (qty, self.lane, epc))
+        self._bump(price)
+        line = {"name": name, "price": price, "qty": qty}
+        if self.listeners:
+            self._emit("scan", epc, line)
+        return line
+
+    def scan_many(self, epcs):
+        """Batch ``scan`` in one transaction. Returns the unknown EPCs."""
+        catalog = getattr(self.catalog, "current", self.catalog)
+
+        def scan_all():
+            return [epc for epc in epcs if self._scan_one(epc, catalog, False) is None]
+        return self._write(scan_all)
+
+    def set_qty(self, epc, qty):
+        """Set the quantity of a tray line; ``qty <= 0`` removes it."""
+        def update():
+            row = self.db.execute("SELECT name, price, qty FROM lines WHERE lane = ? AND epc = ?",
+                                  (self.lane, epc)).fetchone()
+            if row is None:
+                return None
+            name, price, old = row
+            new = max(0, int(qty))
+            if new:
+                self.db.execute("UPDATE lines SET qty = ? WHERE lane = ? AND epc = ?", (new, self.lane, epc))
+                line = {"name": name, "price": price, "qty": new}
+            else:
+                self.db.execute("DELETE FROM lines WHERE lane = ? AND epc = ?", (self.lane, epc))
+                line = None
+            self._bump(price * (new - old))
+            if self.listeners:
+                self._emit("qty", epc, line)
+            return line
+        return self._write(update)
+
+    def _reset(self):
+        self.db.execute("DELETE FROM lines WHERE lane = ?", (self.lane,))
+        self.db.execute("UPDATE trays SET version = version + 1, subtotal = 0 WHERE lane = ?", (self.lane,))
+        if self.listeners:
+            self._emit("reset")
+        if self.pricing is not None:
+            self._priced_version = self._read_version()  # the reset event cleared it
+
+    def reset(self):
+        self._write(self._reset)
+
+    def complete(self):
+        """Close the bill: returns its final snapshot and empties the tray."""
+        def close():
+            bill = self._snapshot()
+            if self.listeners:
+                self._emit("complete", line=bill)
+            self._reset()
+            return bill
+        return self._write(close)
+
+    # ── READS ──────────────────────────────────────────────────────────────────
+    def rows(self):
+        with self.lock:
+            return [list(r) for r in self.db.execute(
+                "SELECT epc, name, price, qty, price * qty FROM lines WHERE lane = ? ORDER BY seq", (self.lane,))]
+
+    def _sync_pricing(self, version):
+        if self._priced_version != version:
+            self.pricing.clear()
+            for epc, line in self.lines():
+                self.pricing.update(epc, line["qty"], line["price"])
+            self._priced_version = version
+
+    def summary(self):
+        # ``discount`` uses pricing state that is not in the database: the
+        # first summary after another process writes re-prices from the lines
+        with self.lock:
+            version, subtotal = self.db.execute(
+                "SELECT version, subtotal FROM trays WHERE lane = ?", (self.lane,)).fetchone()
+            discount = 0
+            if self.pricing is not None:
+                self._sync_pricing(version)
+                discount = self.pricing.discount(subtotal)
+        return {"subtotal": subtotal, "discount": discount, "total": subtotal - discount}
+
+    def _snapshot(self):
+        return {"lane": self.lane, "rows": self.rows(), **self.summary(), "version": self._read_version()}
+
+    def snapshot(self):
+        with self.lock:
+            self.db.execute("BEGIN")
+            try:
+                return self._snapshot()
+            finally:
+                self.db.execute("COMMIT")
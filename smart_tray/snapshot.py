@@ -0,0 +1,226 @@
+"""Binary catalog snapshot read through ``mmap``.
+
+    python -m smart_tray.snapshot product_db.json product_db.snap
+
+Layout (little-endian)::
+
+    header   magic, format, count, key width, hash slots, section offsets
+    keys     count x key width   EPCs, ASCII, NUL padded, sorted
+    records  count x 24 bytes    price f64, name / category / sku / extra string offsets
+    hash     slots x u32         row + 1 by crc32(key), linear probing (0 = empty)
+    strings  u16 length + UTF-8, each distinct string stored once
+
+``extra`` holds every other catalog field (``gtin``, ``color``, ...) as a
+compact JSON object, so pricing rules can match on any field.
+
+Nothing is deserialized at open: lookups hash the EPC, probe the table and
+unpack one record straight from the mapping, so every process on a host
+shares the same page-cache copy. ``MmapCatalog`` offers both the mapping
+API (``get``) used by ``Tray``/``RuleSet`` and the row API used by
+``CompactTray``.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+
+MAGIC = b"STCATSNP"
+FORMAT = 2
+NO_STRING = 0xFFFFFFFF
+
+_HEADER = struct.Struct("<8sIIIIIIII")  # magic, format, count, key_width, slots, keys, records, hash, strings
+_RECORD = struct.Struct("<dIIII")       # price, name, category, sku, extra (JSON)
+_STRLEN = struct.Struct("<H")
+MAX_STRING = 0xFFFF  # bytes of UTF-8 per string
+STRING_FIELDS = ("name", "category", "sku")
+_RECORD_FIELDS = ("price",) + STRING_FIELDS
+
+
+# ── COMPILER ───────────────────────────────────────────────────────────────────
+def compile_catalog(product_db, path):
+    """Write ``product_db`` as a snapshot at ``path`` (atomically replaced)."""
+    epcs = sorted(product_db)
+    keys = [epc.encode("ascii") for epc in epcs]
+    key_width = max((len(k) for k in keys), default=1)
+
+    strings = bytearray()
+    offsets = {}
+
+    def intern(value):
+        if value is None:
+            return NO_STRING
+        value = str(value)
+        off = offsets.get(value)
+        if off is None:
+            data = value.encode("utf-8")
+            if len(data) > MAX_STRING:
+                raise ValueError(f"catalog string longer than {MAX_STRING} bytes: {value[:40]!r}...")
+            off = offsets[value] = len(strings)
+            strings.extend(_STRLEN.pack(len(data)))
+            strings.extend(data)
+        return off
+
+    records = bytearray()
+    for epc in epcs:
+        product = product_db[epc]
+        extra = {k: v for k, v in product.items() if k not in _RECORD_FIELDS}
+        try:
+            extra = json.dumps(extra, sort_keys=True, separators=(",", ":")) if extra else None
+        except TypeError as e:
+            raise ValueError(f"{epc}: catalog field not representable in a snapshot: {e}") from None
+        records.extend(_RECORD.pack(float(product["price"]), *(intern(product.get(f)) for f in STRING_FIELDS),
+                                    intern(extra)))
+
+    slots = 1
+    while slots < 2 * len(keys):
+        slots *= 2
+    table = [0] * slots
+    for row, key in enumerate(keys):
+        i = zlib.crc32(key) & (slots - 1)
+        while table[i]:
+            i = (i + 1) & (slots - 1)
+        table[i] = row + 1
+
+    keys_off = _HEADER.size
+    records_off = keys_off + key_width * len(keys)
+    hash_off = records_off + len(records)
+    strings_off = hash_off + 4 * slots
+
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT, len(keys), key_width, slots,
+                             keys_off, records_off, hash_off, strings_off))
+        f.write(b"".join(k.ljust(key_width, b"\0") for k in keys))
+        f.write(records)
+        f.write(struct.pack(f"<{slots}I", *table))
+        f.write(strings)
+    os.replace(tmp, path)
+    return path
+
+
+# ── READER ─────────────────────────────────────────────────────────────────────
+class MmapCatalog:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, fmt, self.count, self.key_width, self.slots,
+         self.keys_off, self.records_off, self.hash_off, self.strings_off) = _HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or fmt != FORMAT:
+            raise ValueError(f"not a catalog snapshot: {path}")
+        self.mask = self.slots - 1
+        # zero-copy u32 view of the hash table
+        self.table = memoryview(self.mm)[self.hash_off:self.hash_off + 4 * self.slots].cast("I")
+        self._strings = {}
+        self._extras = {}  # parsed extra-field JSON by string offset
+
+    def close(self):
+        self.table.release()
+        self.mm.close()
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, epc):
+        return self.row(epc) is not None
+
+    def __iter__(self):
+        return (self.epc(row) for row in range(self.count))
+
+    def _extra(self, off):
+        fields = self._extras.get(off)
+        if fields is None:
+            fields = self._extras[off] = json.loads(self._string(off))
+        return fields
+
+    def _string(self, off):
+        if off == NO_STRING:
+            return None
+        value = self._strings.get(off)
+        if value is None:
+            start = self.strings_off + off
+            (n,) = _STRLEN.unpack_from(self.mm, start)
+            value = self._strings[off] = self.mm[start + 2:start + 2 + n].decode("utf-8")
+        return value
+
+    def row(self, epc):
+        try:
+            key = epc.encode("ascii")
+        except UnicodeEncodeError:
+            return None
+        width = self.key_width
+        if len(key) > width:
+            return None
+        mm, table, keys_off, mask = self.mm, self.table, self.keys_off, self.mask
+        padded = key.ljust(width, b"\0")
+        i = zlib.crc32(key) & mask
+        while True:
+            slot = table[i]
+            if not slot:
+                return None
+            start = keys_off + width * (slot - 1)
+            if mm[start:start + width] == padded:
+                return slot - 1
+            i = (i + 1) & mask
+
+    def find(self, epc):
+        """Binary search over the sorted keys (for tools that want ranges/order)."""
+        key = epc.encode("ascii").ljust(self.key_width, b"\0")
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = self.keys_off + self.key_width * mid
+            if self.mm[start:start + self.key_width] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def epc(self, row):
+        start = self.keys_off + self.key_width * row
+        return self.mm[start:start + self.key_width].rstrip(b"\0").decode("ascii")
+
+    def product(self, row):
+        price, *strings, extra = _RECORD.unpack_from(self.mm, self.records_off + _RECORD.size * row)
+        product = {"price": int(price) if price.is_integer() else price}
+        for field, off in zip(STRING_FIELDS, strings):
+            if off != NO_STRING:
+                product[field] = self._string(off)
+        if extra != NO_STRING:
+            product.update(self._extra(extra))
+        return product
+
+    def get(self, epc, default=None):
+        row = self.row(epc)
+        return default if row is None else self.product(row)
+
+    def __getitem__(self, epc):
+        row = self.row(epc)
+        if row is None:
+            raise KeyError(epc)
+        return self.product(row)
+
+    def items(self):
+        return ((self.epc(row), self.product(row)) for row in range(self.count))
+
+
+def open_snapshot(json_path, snap_path):
+    """Open ``snap_path``, recompiling it first if ``json_path`` is newer."""
+    if os.path.exists(snap_path) and os.path.getmtime(snap_path) >= os.path.getmtime(json_path):
+        try:
+            return MmapCatalog(snap_path)
+        except ValueError:
+            pass  # older snapshot format: recompile
+    with open(json_path, "r") as f:
+        compile_catalog(json.load(f), snap_path)
+    return MmapCatalog(snap_path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m smart_tray.snapshot product_db.json product_db.snap")
+    with open(sys.argv[1], "r") as f:
+        compile_catalog(json.load(f), sys.argv[2])
+    print(f"✅ Snapshot written: {sys.argv[2]}")
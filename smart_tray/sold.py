@@ -0,0 +1,391 @@
+"""Registry of sold EPCs, for exit gates and against billing a tag twice.
+
+    sold = SoldRegistry("sold.log")
+    lanes.on_new_tray.append(sold.attach)    # every completed bill marks its tags sold
+    sold.is_sold(epc)                        # gate reader: paid for?
+
+    python -m smart_tray.sold sold.log gate --port /dev/ttyUSB1 --catalog product_db.json
+
+Three files make up the registry:
+
+``sold.log``        append-only text, one EPC per line (``-EPC`` for a
+                   return): the exact record, read into a set at startup
+                   (~0.2 s per million tags) and tailed for writes of other
+                   processes
+``sold.log.bloom``  a memory-mapped Bloom filter over every EPC ever sold,
+                   shared live by all processes that open it
+``sold.log.lock``   empty; ``flock``-ed by writers (the other two are replaced
+                   on compaction, so they cannot carry the lock)
+
+Most reads at a gate or counter are answered by the filter alone: a clear
+bit means "never sold" without touching the set or the log. Only filter
+hits are confirmed against the exact set (a false positive or a returned
+item must not pass as paid). Bits are set before the log line is written,
+so after a crash the filter can hold extra bits but never miss a sale.
+
+``compact`` writes a fresh filter and a fresh log next to the old ones,
+fsyncs both and swaps them in with ``os.replace`` (a crash leaves either the
+old pair or the new one), then bumps the generation in the old filter's
+header. Other processes keep answering from the old filter (a superset)
+until they see the new generation, then reopen both files and re-read the
+log from the start.
+"""
+import argparse
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from hashlib import blake2b
+
+from .tray import normalize_epc
+
+try:
+    import fcntl
+except ImportError:  # Windows: one writing process per registry
+    fcntl = None
+
+MAGIC = b"STSOLDBF"
+HEADER_SIZE = 64
+DEFAULT_CAPACITY = 1_000_000
+DEFAULT_ERROR_RATE = 0.001
+
+_HEADER = struct.Struct("<8sQII")  # magic, bits, hashes, reserved
+_COUNT = struct.Struct("<Q")
+_COUNT_OFF = 32
+_GENERATION_OFF = 40  # bumped in the replaced filter when the log is compacted
+_PAIR = struct.Struct("<QQ")
+
+
+def bloom_size(capacity, error_rate):
+    """(bits, hashes) for ``capacity`` items at false-positive rate ``error_rate``."""
+    bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+    bits = (bits + 63) // 64 * 64
+    return bits, max(1, round(bits / capacity * math.log(2)))
+
+
+class BloomFilter:
+    """Bloom filter in a shared file mapping; ``add`` callers serialize writes."""
+
+    def __init__(self, path, capacity=DEFAULT_CAPACITY, error_rate=DEFAULT_ERROR_RATE):
+        self.path = path
+        if not os.path.exists(path):
+            self.create(path, *bloom_size(capacity, error_rate))
+        with open(path, "r+b") as f:
+            self.mm = mmap.mmap(f.fileno(), 0)
+        magic, self.bits, self.hashes, _ = _HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or len(self.mm) != HEADER_SIZE + self.bits // 8:
+            raise ValueError(f"not a sold-tag filter: {path}")
+
+    @staticmethod
+    def create(path, bits, hashes, generation=0, replace=True):
+        """Write an empty filter file; with ``replace`` False the caller moves it into place."""
+        tmp = f"{path}.tmp{os.getpid()}" if replace else path
+        header = bytearray(HEADER_SIZE)
+        _HEADER.pack_into(header, 0, MAGIC, bits, hashes, 0)
+        _COUNT.pack_into(header, _GENERATION_OFF, generation)
+        with open(tmp, "wb") as f:
+            f.write(header)
+            f.truncate(HEADER_SIZE + bits // 8)
+        if replace:
+            os.replace(tmp, path)
+
+    def close(self):
+        self.mm.close()
+
+    @property
+    def count(self):
+        return _COUNT.unpack_from(self.mm, _COUNT_OFF)[0]
+
+    @property
+    def generation(self):
+        return _COUNT.unpack_from(self.mm, _GENERATION_OFF)[0]
+
+    @generation.setter
+    def generation(self, value):
+        _COUNT.pack_into(self.mm, _GENERATION_OFF, value)
+
+    def _hashes(self, key):
+        # double hashing: probe i is h1 + i * h2
+        h1, h2 = _PAIR.unpack(blake2b(key.encode(), digest_size=16).digest())
+        return h1, h2 | 1
+
+    def __contains__(self, key):
+        mm, bits = self.mm, self.bits
+        h, step = self._hashes(key)
+        for _ in range(self.hashes):
+            p = h % bits
+            if not mm[HEADER_SIZE + (p >> 3)] & (1 << (p & 7)):
+                return False
+            h += step
+        return True
+
+    def add(self, key):
+        self.update((key,))
+
+    def update(self, keys):
+        mm, bits, hashes, digest = self.mm, self.bits, self.hashes, self._hashes
+        n = 0
+        for key in keys:
+            h, step = digest(key)
+            for _ in range(hashes):
+                p = h % bits
+                mm[HEADER_SIZE + (p >> 3)] |= 1 << (p & 7)
+                h += step
+            n += 1
+        _COUNT.pack_into(mm, _COUNT_OFF, _COUNT.unpack_from(mm, _COUNT_OFF)[0] + n)
+
+    def fill_ratio(self):
+        return bin(int.from_bytes(self.mm[HEADER_SIZE:], "little")).count("1") / self.bits
+
+
+class SoldRegistry:
+    def __init__(self, path, capacity=DEFAULT_CAPACITY, error_rate=DEFAULT_ERROR_RATE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.sold = set()
+        self._offset = 0
+        self.lock_fd = os.open(f"{path}.lock", os.O_RDWR | os.O_CREAT, 0o644) if fcntl is not None else None
+        with self._file_lock():  # not halfway through another process's compaction
+            rebuild = not os.path.exists(f"{path}.bloom")
+            self.bloom = BloomFilter(f"{path}.bloom", capacity, error_rate)
+            self.generation = self.bloom.generation
+            self.fd = self._open_log()
+            self._tail()
+            if rebuild and self.sold:  # filter lost or never built: derive it from the log
+                self.bloom.update(self.sold)
+
+    def close(self):
+        os.close(self.fd)
+        if self.lock_fd is not None:
+            os.close(self.lock_fd)
+        self.bloom.close()
+
+    def _open_log(self):
+        return os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+
+    def _file_lock(self):
+        return _FileLock(self.lock_fd)
+
+    def _stale(self):
+        """True once another process compacted the registry (our filter was replaced)."""
+        return self.bloom.generation != self.generation
+
+    def _reload(self):
+        """Reopen the filter and the log and re-read it; the caller holds both locks."""
+        # the old mapping is not closed: other threads may still be probing it
+        self.bloom = BloomFilter(self.bloom.path)
+        self.generation = self.bloom.generation
+        os.close(self.fd)  # the replaced log: nobody appends to it any more
+        self.fd = self._open_log()
+        self.sold = set()
+        self._offset = 0
+
+    def _tail(self):
+        """Apply log lines appended since the last look (by us or other processes)."""
+        size = os.fstat(self.fd).st_size
+        if size < self._offset:
+            # rewritten under us without a generation bump (e.g. by hand): start over
+            self.sold = set()
+            self._offset = 0
+        if size <= self._offset:
+            return
+        os.lseek(self.fd, self._offset, os.SEEK_SET)  # O_APPEND writes still go to the end
+        data = os.read(self.fd, size - self._offset)
+        end = data.rfind(b"\n") + 1  # a line still being written waits for the next look
+        if not end:
+            return
+        self._offset += end
+        lines = data[:end].decode("ascii", "replace").split()
+        if b"-" not in data[:end]:
+            self.sold.update(lines)
+            return
+        sold = self.sold
+        for epc in lines:
+            if epc[0] == "-":
+                sold.discard(epc[1:])
+            else:
+                sold.add(epc)
+
+    # ── QUERIES ────────────────────────────────────────────────────────────────
+    def is_sold(self, epc):
+        """True if ``epc`` was billed and not returned since."""
+        epc = normalize_epc(epc)
+        if self._stale():
+            with self.lock, self._file_lock():
+                if self._stale():
+                    self._reload()
+                    self._tail()
+        if epc not in self.bloom:
+            return False
+        with self.lock:
+            self._tail()
+            return epc in self.sold
+
+    __contains__ = is_sold
+
+    def __len__(self):
+        return len(self.sold)
+
+    # ── WRITES ─────────────────────────────────────────────────────────────────
+    def _write(self, epcs, prefix=""):
+        with self.lock, self._file_lock():
+            if self._stale():
+                self._reload()
+            self._tail()
+            epcs = list(dict.fromkeys(epcs))
+            if prefix:
+                epcs = [epc for epc in epcs if epc in self.sold]
+            else:
+                epcs = [epc for epc in epcs if epc not in self.sold]
+                self.bloom.update(epcs)  # before the log: a crash leaves extra bits, never missing ones
+            if epcs:
+                os.write(self.fd, "".join(f"{prefix}{epc}\n" for epc in epcs).encode("ascii"))
+                self._tail()
+        return epcs
+
+    def add_many(self, epcs):
+        """Mark EPCs sold. Returns the ones that were not sold already."""
+        return self._write([normalize_epc(epc) for epc in epcs])
+
+    def add_bill(self, bill):
+        return self.add_many(row[0] for row in bill["rows"])
+
+    def remove_many(self, epcs):
+        """Returns / voids: the tags count as unpaid again. Returns the ones that were sold."""
+        return self._write([normalize_epc(epc) for epc in epcs], "-")
+
+    def attach(self, tray):
+        """Record the tags of every bill ``tray`` completes."""
+        def listener(tray, event, epc, line):
+            if event == "complete":
+                self.add_bill(line)
+        return tray.subscribe(listener)
+
+    def compact(self):
+        """Rewrite the log and the filter from the current set (drops returns and their bits)."""
+        with self.lock, self._file_lock():
+            if self._stale():
+                self._reload()
+            self._tail()
+            old, generation = self.bloom, self.generation + 1
+            # both new files are complete and on disk before either is swapped in;
+            # readers of the old filter (a superset) keep working until they see
+            # the new generation
+            tmp = f"{old.path}.tmp{os.getpid()}"
+            BloomFilter.create(tmp, old.bits, old.hashes, generation, replace=False)
+            bloom = BloomFilter(tmp)
+            bloom.update(self.sold)
+            bloom.mm.flush()
+            log_tmp = f"{self.path}.tmp{os.getpid()}"
+            data = "".join(f"{epc}\n" for epc in self.sold).encode("ascii")
+            with open(log_tmp, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            if fcntl is None:
+                old.close()  # Windows cannot replace a mapped or open file
+                os.close(self.fd)
+            # a crash between the two replaces leaves the new filter with the old
+            # log, which still describes the same set
+            os.replace(tmp, old.path)
+            os.replace(log_tmp, self.path)
+            if fcntl is not None:
+                os.close(self.fd)
+                _fsync_dir(self.path)
+            self.fd = self._open_log()
+            self.bloom, self.generation, self._offset = bloom, generation, len(data)
+            if fcntl is not None:
+                old.generation = generation  # tells every other process to reload
+
+
+def _fsync_dir(path):
+    """Make the renames into ``path``'s directory durable."""
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class _FileLock:
+    """Exclusive ``flock`` on the lock file while writing (no-op without fcntl)."""
+
+    def __init__(self, fd):
+        self.fd = fd
+
+    def __enter__(self):
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+
+def gate(registry, stream, catalog=None, protocol="line", alarm=None):
+    """Check every tag a gate reader sees; calls ``alarm(epc)`` for unpaid store tags."""
+    from .frames import PARSERS, FrameReader
+
+    def on_batch(batch):
+        for epc in batch.epcs():
+            epc = normalize_epc(epc)
+            if (catalog is None or epc in catalog) and not registry.is_sold(epc):
+                alarm(epc)
+
+    reader = FrameReader(stream, PARSERS[protocol](), on_batch)
+    while True:
+        reader.poll()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sold-tag registry for exit gates")
+    parser.add_argument("registry", help="sold log (the .bloom file sits next to it)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("info")
+    check = sub.add_parser("check", help="print PAID/UNPAID per EPC")
+    check.add_argument("epcs", nargs="+")
+    sub.add_parser("compact", help="rewrite log and filter without returned tags")
+    gate_cmd = sub.add_parser("gate", help="alarm on unpaid tags read at an exit gate")
+    gate_cmd.add_argument("--port", required=True)
+    gate_cmd.add_argument("--baud", type=int, default=115200)
+    gate_cmd.add_argument("--protocol", default="line", choices=["line", "inventory"])
+    gate_cmd.add_argument("--catalog", help="only alarm for EPCs of this product_db.json")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    registry = SoldRegistry(args.registry)
+    loaded = time.perf_counter() - t0
+
+    if args.command == "info":
+        bloom = registry.bloom
+        print(f"{args.registry}: {len(registry)} sold tags (loaded in {loaded * 1000:.0f} ms)")
+        print(f"filter: {bloom.bits // 8 // 1024} KiB, {bloom.hashes} hashes, "
+              f"{bloom.count} added, {bloom.fill_ratio():.1%} bits set")
+    elif args.command == "check":
+        for epc in args.epcs:
+            print(f"{normalize_epc(epc)}  {'PAID' if registry.is_sold(epc) else 'UNPAID'}")
+    elif args.command == "compact":
+        registry.compact()
+        print(f"✅ {len(registry)} sold tags kept")
+    else:
+        import serial
+
+        from .catalog import load_product_db
+        catalog = load_product_db(args.catalog) if args.catalog else None
+
+        def alarm(epc):
+            product = catalog.get(epc) if catalog else None
+            print(f"🚨 UNPAID: {epc}" + (f" ({product['name']})" if product else ""))
+
+        ser = serial.Serial(args.port, args.baud, timeout=1)
+        print(f"✅ Gate on {args.port}, {len(registry)} sold tags")
+        try:
+            gate(registry, ser, catalog, args.protocol, alarm)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Stock-take: count a whole store's tags and diff them against expected stock.
+
+    count = StockTake(catalog)
+    count.add_many(batch)            # handheld inventory rounds, duplicates free
+    report = count.reconcile()       # or reconcile(expected_counts=locator_counts)
+
+Reads go into a bitmap over catalog rows (one bit per EPC) instead of a tray,
+so repeated reads of a tag cost one bit test. ``reconcile`` turns the bitmaps
+into Python ints and diffs them with whole-bitmap AND/NOT/popcount: only the
+EPCs that differ are decoded, and per-SKU counts come from one pass over the
+set bits through a row -> SKU array.
+
+The catalog is pinned when the count starts (``LiveCatalog.current``), so
+edits made mid-count don't shift row numbers under it.
+"""
+from array import array
+from collections import Counter
+
+from .catalog import CatalogIndex
+from .tray import normalize_epc
+
+try:
+    _popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def _popcount(x):
+        return bin(x).count("1")
+
+
+def _bits(rows, size):
+    bitmap = bytearray((size + 7) // 8)
+    for row in rows:
+        bitmap[row >> 3] |= 1 << (row & 7)
+    return int.from_bytes(bitmap, "little")
+
+
+def _rows_of(bits):
+    """Set bit positions of an int bitmap, skipping empty bytes."""
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    for i, byte in enumerate(data):
+        while byte:
+            low = byte & -byte
+            yield 8 * i + low.bit_length() - 1
+            byte ^= low
+
+
+class StockTake:
+    def __init__(self, catalog, group="sku"):
+        catalog = getattr(catalog, "current", catalog)
+        # catalog: row API (CatalogIndex, CatalogVersion, MmapCatalog); a plain dict gets indexed here
+        self.catalog = catalog if hasattr(catalog, "row") else CatalogIndex(catalog)
+        self.group = group  # product field variances are reported by (falls back to name)
+        self.seen = bytearray()
+        self.unknown = set()  # read EPCs the catalog does not know
+        self.reads = 0
+        self._groups = None
+
+    # ── INGEST ─────────────────────────────────────────────────────────────────
+    def add(self, epc):
+        """Record one read. Returns True the first time a tag is seen."""
+        self.reads += 1
+        epc = normalize_epc(epc)
+        row = self.catalog.row(epc)
+        if row is None:
+            if epc in self.unknown:
+                return False
+            self.unknown.add(epc)
+            return True
+        byte, bit = row >> 3, 1 << (row & 7)
+        seen = self.seen
+        if byte >= len(seen):
+            seen.extend(bytes(byte + 1 - len(seen)))
+        if seen[byte] & bit:
+            return False
+        seen[byte] |= bit
+        return True
+
+    def add_many(self, epcs):
+        """Record a batch of reads. Returns how many tags were new."""
+        add = self.add
+        return sum(map(add, epcs))
+
+    def __len__(self):
+        return _popcount(int.from_bytes(self.seen, "little")) + len(self.unknown)
+
+    def __contains__(self, epc):
+        epc = normalize_epc(epc)
+        row = self.catalog.row(epc)
+        if row is None:
+            return epc in self.unknown
+        return row >> 3 < len(self.seen) and bool(self.seen[row >> 3] & (1 << (row & 7)))
+
+    def reset(self):
+        self.seen = bytearray()
+        self.unknown.clear()
+        self.reads = 0
+
+    # ── RECONCILE ──────────────────────────────────────────────────────────────
+    def groups(self):
+        """(group names, row -> group index array), built once per count."""
+        if self._groups is None:
+            catalog = self.catalog
+            names, index = [], {}
+            rows = [catalog.row(epc) for epc in catalog]
+            of_row = array("i", bytes(4 * (max(rows, default=-1) + 1)))
+            for row in rows:
+                product = catalog.product(row)
+                name = product.get(self.group) or product["name"]
+                i = index.get(name)
+                if i is None:
+                    i = index[name] = len(names)
+                    names.append(name)
+                of_row[row] = i
+            self._groups = names, of_row
+        return self._groups
+
+    def _counts(self, bits):
+        names, of_row = self.groups()
+        return {names[i]: n for i, n in Counter(map(of_row.__getitem__, _rows_of(bits))).items()}
+
+    def reconcile(self, expected=None, expected_counts=None):
+        """Diff the count against expected stock.
+
+        ``expected``: EPCs that should be on the floor (default: every catalog
+        EPC). ``expected_counts``: {group: count} from the locator/ERP, used
+        for the per-group numbers instead of counting ``expected``.
+        Returns ``missing`` / ``unexpected`` catalog EPCs, ``unknown`` EPCs
+        and ``variances`` {group: {"expected", "counted", "variance"}} for
+        the groups that differ.
+        """
+        catalog = self.catalog
+        if expected is None:
+            rows = [catalog.row(epc) for epc in catalog]
+        else:
+            rows = [r for r in map(catalog.row, map(normalize_epc, expected)) if r is not None]
+        want = _bits(rows, max(rows, default=-1) + 1)
+        seen = int.from_bytes(self.seen, "little")
+
+        # whole-bitmap set algebra; only the differences are turned back into EPCs
+        missing = want & ~seen
+        unexpected = seen & ~want
+        counted = self._counts(seen)
+        wanted = dict(expected_counts) if expected_counts is not None else self._counts(want)
+        variances = {}
+        for group in wanted.keys() | counted.keys():
+            w, c = wanted.get(group, 0), counted.get(group, 0)
+            if w != c:
+                variances[group] = {"expected": w, "counted": c, "variance": c - w}
+
+        epc_of = catalog.epc
+        return {
+            "reads": self.reads,
+            "counted": _popcount(seen),
+            "expected": _popcount(want),
+            "missing": [epc_of(r) for r in _rows_of(missing)],
+            "unexpected": [epc_of(r) for r in _rows_of(unexpected)],
+            "unknown": sorted(self.unknown),
+            "variances": variances,
+        }
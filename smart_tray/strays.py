@@ -0,0 +1,134 @@
+"""Stray-tag suppression in front of the tray.
+
+A counter reader also sees the racks next to it and the trays of the lanes
+around it. ``ReadFilter`` drops those reads before any tray or UI work:
+
+- antennas: only reads from the listed antenna ports count
+- min_rssi: weaker reads (farther away) are ignored
+- prefixes: EPCs outside the store's own company prefixes are foreign
+- negative cache: an EPC the catalog did not know is rejected without a
+  lookup for ``negative_ttl`` seconds (cleared when a LiveCatalog changes)
+- min_reads: a tag has to be read that often within ``window`` seconds
+  before it counts; its held reads are then released together, so a
+  genuine tag keeps its quantity and a flicker from the next lane is lost
+
+Every check is a set/dict operation. Reads without RSSI or antenna (line
+readers) pass those two checks. One filter may be shared by the reader
+thread and the UI: its state is guarded by a lock, taken once per batch.
+"""
+import threading
+import time
+
+from .tray import normalize_epc
+
+NEGATIVE_TTL = 30.0
+MAX_ENTRIES = 65536  # negative cache / pending reads before expired entries are pruned
+
+
+class ReadFilter:
+    def __init__(self, catalog, min_rssi=None, antennas=None, prefixes=None, min_reads=1, window=1.0,
+                 negative_ttl=NEGATIVE_TTL, clock=time.monotonic):
+        self.catalog = catalog
+        self.min_rssi = min_rssi
+        self.antennas = None if antennas is None else frozenset(antennas)
+        self.prefixes = None if not prefixes else tuple(p.upper() for p in prefixes)
+        self.min_reads = min_reads
+        self.window = window
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        self.enabled = True  # False passes every read (e.g. while a stock-take counts everything)
+        self.negative = {}  # epc -> time until which it is rejected
+        self.pending = {}  # epc -> [reads so far or -1 once confirmed, first read / last seen time]
+        self.rejected = {"antenna": 0, "rssi": 0, "foreign": 0, "unknown": 0}
+        self.lock = threading.Lock()
+        if hasattr(catalog, "subscribe"):  # LiveCatalog: new products must not stay rejected
+            catalog.subscribe(lambda old, new: self.clear_negative())
+
+    @classmethod
+    def from_settings(cls, catalog, settings):
+        """Build from a readers.json ``"filter"`` object (or return None for no filter)."""
+        return cls(catalog, **settings) if settings else None
+
+    def admit(self, epc, rssi=None, antenna=None):
+        """How many reads of ``epc`` to pass on now: 0 drops it, >1 releases held reads."""
+        with self.lock:
+            return self._admit(epc, rssi, antenna)
+
+    def _admit(self, epc, rssi, antenna):
+        if not self.enabled:
+            return 1
+        if antenna is not None and self.antennas is not None and antenna not in self.antennas:
+            self.rejected["antenna"] += 1
+            return 0
+        if rssi is not None and self.min_rssi is not None and rssi < self.min_rssi:
+            self.rejected["rssi"] += 1
+            return 0
+        epc = normalize_epc(epc)
+        negative = self.negative
+        now = self.clock()
+        until = negative.get(epc)
+        if until is not None:
+            if until > now:
+                self.rejected["unknown"] += 1
+                return 0
+            del negative[epc]
+        if self.prefixes is not None and not epc.startswith(self.prefixes):
+            self._remember(negative, epc, now + self.negative_ttl)
+            self.rejected["foreign"] += 1
+            return 0
+        if self.catalog.get(epc) is None:
+            self._remember(negative, epc, now + self.negative_ttl)
+            self.rejected["unknown"] += 1
+            return 0
+        if self.min_reads <= 1:
+            return 1
+        pending = self.pending.get(epc)
+        if pending is None or now - pending[1] > self.window:
+            self._remember(self.pending, epc, [1, now])  # held until it is read again
+            return 0
+        if pending[0] < 0:  # confirmed and still in view: pass straight through
+            pending[1] = now
+            return 1
+        pending[0] += 1
+        if pending[0] < self.min_reads:
+            return 0
+        released = pending[0]
+        pending[0], pending[1] = -1, now
+        return released
+
+    def _remember(self, cache, epc, value):
+        if len(cache) >= MAX_ENTRIES:
+            self._prune(cache)
+        cache[epc] = value
+
+    def _prune(self, cache):
+        now = self.clock()
+        if cache is self.negative:
+            expired = [epc for epc, until in cache.items() if until <= now]
+        else:
+            expired = [epc for epc, (_, last) in cache.items() if now - last > self.window]
+        for epc in expired:
+            del cache[epc]
+        if len(cache) >= MAX_ENTRIES:  # still full (a burst of distinct strays): forget the oldest half
+            for epc in list(cache)[:len(cache) // 2]:
+                del cache[epc]
+
+    def filter(self, reads):
+        """EPCs to scan from ``(epc, rssi, antenna)`` reads (a frames batch iterates like that)."""
+        admit = self._admit
+        out = []
+        with self.lock:
+            for epc, rssi, antenna in reads:
+                n = admit(epc, rssi, antenna)
+                if n:
+                    out.extend([epc] * n)
+        return out
+
+    def clear_negative(self):
+        with self.lock:
+            self.negative.clear()
+
+    def clear(self):
+        with self.lock:
+            self.negative.clear()
+            self.pending.clear()
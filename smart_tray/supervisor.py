@@ -0,0 +1,181 @@
+"""One serial reader that survives cable bumps, USB resets and replugs.
+
+    supervisor = SerialSupervisor("/dev/ttyUSB0", 115200, tray.scan_many, protocol="line")
+    supervisor.start()
+    supervisor.status()   # {"state": "up", "device": ..., "reconnects": 0, ...}
+
+For the single-reader apps (``python -m smart_tray.readers`` does the same
+for many readers on one asyncio loop). A reader thread owns the port: when
+a read fails it closes the port and reopens it, retrying with backoff
+(``readers.RECONNECT_MIN`` doubling up to ``RECONNECT_MAX``) while the
+device is present and checking every ``readers.HOTPLUG_INTERVAL`` while it
+is gone. ``port`` may be a device name, USB serial number or location, so
+a reader that comes back as another ``/dev/ttyUSB*`` / ``COM*`` is found
+again. ``idle_timeout`` also reopens a port that stopped delivering. Any
+other error in the read loop (parser, driver) is logged and handled the
+same way, so the thread never dies while ``status()`` says "up".
+
+Parsed reads go through a bounded queue to a second thread that calls
+``on_reads``, so a slow consumer never stalls the port, and reads taken
+before a failure are delivered while the port is being reopened. The
+input buffer is not flushed on reopen: tags the reader queued meanwhile
+are kept.
+"""
+import queue
+import threading
+import time
+
+from .frames import batch_epcs
+from .readers import HOTPLUG_INTERVAL, Backoff, find_device
+
+QUEUE_SIZE = 1024  # batches between the port and on_reads
+READ_TIMEOUT = 0.2  # seconds a read blocks: bounds how late stop / idle checks are
+
+
+class SerialSupervisor:
+    def __init__(self, port, baud, on_reads, protocol="line", log=None, read_filter=None, idle_timeout=None,
+                 **parser_args):
+        self.match = port
+        self.device = port
+        self.baud = baud
+        self.on_reads = on_reads
+        self.protocol = protocol
+        self.log = log
+        self.read_filter = read_filter
+        self.idle_timeout = idle_timeout
+        self.parser_args = parser_args
+        self.state = "stopped"
+        self.serial = None
+        self.reconnects = 0
+        self.reads = 0
+        self.dropped = 0
+        self.last_data = None
+        self.last_error = None
+        self.queue = queue.Queue(QUEUE_SIZE)
+        self._stop = threading.Event()
+        self._threads = []
+
+    # ── LIFECYCLE ──────────────────────────────────────────────────────────────
+    def start(self):
+        self._stop.clear()
+        self.state = "connecting"
+        self._threads = [threading.Thread(target=self._read_loop, name=f"serial {self.match}", daemon=True),
+                         threading.Thread(target=self._deliver_loop, name=f"reads {self.match}", daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self._close()
+        self.state = "stopped"
+
+    def status(self):
+        return {"state": self.state, "device": self.device, "reconnects": self.reconnects, "reads": self.reads,
+                "idle": None if self.last_data is None else round(time.monotonic() - self.last_data, 3),
+                "buffered": self.queue.qsize(), "dropped": self.dropped, "error": self.last_error}
+
+    # ── PORT ───────────────────────────────────────────────────────────────────
+    def _resolve(self):
+        try:
+            from .readers import list_ports
+            ports = list_ports()
+        except Exception:  # no serial.tools here: use the configured name as is
+            ports = []
+        return find_device(self.match, ports)
+
+    def _open(self):
+        """Open the port, waiting for it to be plugged in; False once stopped."""
+        import serial
+        backoff = Backoff()
+        while not self._stop.is_set():
+            device = self._resolve()
+            if device is None:
+                self.state = "unplugged"
+                self._stop.wait(HOTPLUG_INTERVAL)
+                continue
+            try:
+                self.serial = serial.Serial(device, self.baud, timeout=READ_TIMEOUT)
+            except Exception as e:
+                self.last_error = str(e)
+                self._stop.wait(backoff.next())
+                continue
+            self.device = device
+            self.last_data = time.monotonic()
+            self.state = "up"
+            return True
+        return False
+
+    def _close(self):
+        if self.serial is not None:
+            try:
+                self.serial.close()
+            except Exception:
+                pass  # already gone with the device
+            self.serial = None
+
+    # ── THREADS ────────────────────────────────────────────────────────────────
+    def _on_batch(self, batch):
+        try:
+            epcs = batch_epcs(batch, self.log, self.read_filter, self.device)
+        except Exception as e:
+            # not a port failure: lose this batch, keep the connection
+            print(f"⚠️ Batch from {self.device} dropped: {e!r}")
+            return
+        if not epcs:
+            return
+        self.reads += len(epcs)
+        try:
+            self.queue.put_nowait(epcs)
+        except queue.Full:
+            self.dropped += len(epcs)
+
+    def _read_loop(self):
+        from .frames import PARSERS, FrameReader
+
+        crashes = Backoff()  # waits after non-port errors, so a bug that repeats at once cannot spin
+        while self._open():
+            opened = self.last_data
+            print(f"✅ Listening on {self.device} @ {self.baud} baud"
+                  + (f" (reconnect #{self.reconnects})" if self.reconnects else ""))
+            frames = FrameReader(self.serial, PARSERS[self.protocol](**self.parser_args), self._on_batch)
+            try:
+                while not self._stop.is_set():
+                    if frames.poll():
+                        self.last_data = time.monotonic()
+                    elif self.idle_timeout and time.monotonic() - self.last_data > self.idle_timeout:
+                        raise OSError(f"no data for {self.idle_timeout} s")
+            except OSError as e:  # pyserial's SerialException is an OSError too
+                if self._stop.is_set():
+                    break
+                self.last_error = str(e)
+                print(f"⚠️ Serial error on {self.device}: {e} (reconnecting)")
+                self.reconnects += 1
+                self.state = "connecting"
+            except Exception as e:
+                # a parser or driver bug: the thread must not die with state "up"
+                if self._stop.is_set():
+                    break
+                self.last_error = repr(e)
+                print(f"❌ Reader error on {self.device}: {e!r} (reconnecting)")
+                self.reconnects += 1
+                self.state = "connecting"
+                if self.last_data > opened:
+                    crashes.reset()  # it read fine for a while: retry soon
+                self._close()
+                self._stop.wait(crashes.next())
+            self._close()
+
+    def _deliver_loop(self):
+        while not self._stop.is_set():
+            try:
+                epcs = self.queue.get(timeout=READ_TIMEOUT)
+            except queue.Empty:
+                continue
+            try:
+                self.on_reads(epcs)
+            except Exception as e:
+                print(f"⚠️ Read handler error: {e}")
@@ -0,0 +1,255 @@
+"""Catalog sync from a store master to lane nodes: one snapshot, then deltas.
+
+    python -m smart_tray.sync master --catalog product_db.json --port 8100
+    python -m smart_tray.sync node --master http://10.0.0.2:8100 --catalog lane_db.json
+
+The master watches its ``LiveCatalog`` and keeps a short history of
+per-version deltas (upserts + deletes). A node fetches the full snapshot
+once, then asks for ``changes?since=<version>`` and gets every delta since
+then folded into one zlib-compressed JSON document, so a price change on
+one SKU costs a few hundred bytes per lane instead of the whole file. A
+node that fell behind the history (or a master that restarted) gets 410
+and re-fetches the snapshot.
+
+Anything with ``snapshot()`` / ``changes(since)`` is a transport: the
+in-process ``CatalogMaster`` itself, or ``HttpTransport`` for a remote one.
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+import zlib
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+HISTORY = 256
+
+
+def pack(document):
+    return zlib.compress(json.dumps(document, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def unpack(data):
+    return json.loads(zlib.decompress(data))
+
+
+class Stale(Exception):
+    """The requested version is older than the master's delta history."""
+
+
+# ── MASTER ─────────────────────────────────────────────────────────────────────
+class CatalogMaster:
+    """Versions are handed out as ``"<epoch>.<n>"`` tokens, so a node never
+    mistakes a restarted master's version 3 for the one it already has."""
+
+    def __init__(self, catalog, history=HISTORY):
+        self.catalog = catalog  # LiveCatalog
+        self.lock = threading.Lock()
+        self.epoch = f"{int(time.time() * 1000):x}"
+        self.deltas = deque(maxlen=history)  # (from version, to version, upserts, deletes)
+        self._source = catalog.source
+        self._version = catalog.version
+        self._snapshot = None
+        catalog.subscribe(self._on_publish)
+
+    @property
+    def version(self):
+        return f"{self.epoch}.{self._version}"
+
+    def _on_publish(self, old, new):
+        products = self.catalog.source
+        with self.lock:
+            previous, self._source = self._source, products
+            upserts = {epc: p for epc, p in products.items() if previous.get(epc) != p}
+            deletes = [epc for epc in previous if epc not in products]
+            self.deltas.append((self._version, new.version, upserts, deletes))
+            self._version = new.version
+            self._snapshot = None
+
+    def snapshot(self):
+        """(version, compressed full catalog)."""
+        with self.lock:
+            if self._snapshot is None:
+                self._snapshot = self.version, pack({"version": self.version, "products": self._source})
+            return self._snapshot
+
+    def changes(self, since):
+        """Compressed delta from version ``since`` to now, or None if up to date."""
+        with self.lock:
+            epoch, _, n = str(since).partition(".")
+            if epoch != self.epoch or not n.isdigit():
+                raise Stale(since)
+            n = int(n)
+            if n == self._version:
+                return None
+            deltas = list(self.deltas)
+            start = next((i for i, d in enumerate(deltas) if d[0] == n), None)
+            if start is None:
+                raise Stale(since)
+            upserts, deletes = {}, set()
+            for _, _, up, dels in deltas[start:]:
+                for epc in dels:
+                    upserts.pop(epc, None)
+                    deletes.add(epc)
+                for epc, product in up.items():
+                    deletes.discard(epc)
+                    upserts[epc] = product
+            return pack({"from": since, "version": self.version, "upserts": upserts, "deletes": sorted(deletes)})
+
+
+class _Handler(BaseHTTPRequestHandler):
+    master = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        try:
+            if url.path == "/catalog/snapshot":
+                version, body = self.master.snapshot()
+            elif url.path == "/catalog/changes":
+                since = parse_qs(url.query).get("since", [""])[0]
+                body = self.master.changes(since)
+                version = self.master.version
+                if body is None:
+                    self._reply(204, b"", version)
+                    return
+            else:
+                self._reply(404, b"", None)
+                return
+        except Stale:
+            self._reply(410, b"", self.master.version)
+            return
+        self._reply(200, body, version)
+
+    def _reply(self, status, body, version):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(body)))
+        if version is not None:
+            self.send_header("X-Catalog-Version", str(version))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(master, host="0.0.0.0", port=8100):
+    """Start the master's HTTP endpoint on a daemon thread; returns the server."""
+    handler = type("Handler", (_Handler,), {"master": master})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name="catalog-master", daemon=True).start()
+    return server
+
+
+# ── NODE ───────────────────────────────────────────────────────────────────────
+class HttpTransport:
+    def __init__(self, url, timeout=5.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def snapshot(self):
+        with urllib.request.urlopen(f"{self.url}/catalog/snapshot", timeout=self.timeout) as r:
+            return r.headers["X-Catalog-Version"], r.read()
+
+    def changes(self, since):
+        try:
+            url = f"{self.url}/catalog/changes?{urlencode({'since': since})}"
+            with urllib.request.urlopen(url, timeout=self.timeout) as r:
+                return r.read() if r.status == 200 else None
+        except urllib.error.HTTPError as e:
+            if e.code == 410:
+                raise Stale(since)
+            raise
+
+
+class CatalogNode:
+    def __init__(self, catalog, transport):
+        self.catalog = catalog  # local LiveCatalog, published into as one version per sync
+        self.transport = transport
+        self.version = None  # master version we are at
+        self.bytes_received = 0
+        self._stop = None
+
+    def sync(self):
+        """Catch up with the master; returns True if the catalog changed."""
+        if self.version is not None:
+            try:
+                data = self.transport.changes(self.version)
+            except Stale:
+                self.version = None
+            else:
+                if data is None:
+                    return False
+                self.bytes_received += len(data)
+                delta = unpack(data)
+                self.catalog.apply(delta["upserts"], delta["deletes"])
+                self.version = delta["version"]
+                return True
+        version, data = self.transport.snapshot()
+        self.bytes_received += len(data)
+        self.catalog.replace(unpack(data)["products"])
+        self.version = version
+        return True
+
+    def start(self, interval=2.0):
+        """Sync from a daemon thread every ``interval`` seconds."""
+        if self._stop is None:
+            stop = self._stop = threading.Event()
+
+            def run():
+                while True:
+                    try:
+                        self.sync()
+                    except Exception as e:  # master down: keep selling from the local copy
+                        print(f"⚠️ Catalog sync failed: {e}")
+                    if stop.wait(interval):
+                        return
+
+            threading.Thread(target=run, name="catalog-sync", daemon=True).start()
+        return self._stop
+
+    def stop(self):
+        if self._stop is not None:
+            self._stop.set()
+            self._stop = None
+
+
+def main(argv=None):
+    from .catalog import load_product_db
+    from .live import LiveCatalog
+
+    parser = argparse.ArgumentParser(description="Catalog snapshot + delta sync")
+    sub = parser.add_subparsers(dest="role", required=True)
+    master = sub.add_parser("master", help="serve product_db.json to lane nodes")
+    master.add_argument("--catalog", default="product_db.json")
+    master.add_argument("--host", default="0.0.0.0")
+    master.add_argument("--port", type=int, default=8100)
+    node = sub.add_parser("node", help="mirror a master into a local catalog file")
+    node.add_argument("--master", required=True, help="e.g. http://10.0.0.2:8100")
+    node.add_argument("--catalog", default="product_db.json")
+    node.add_argument("--interval", type=float, default=2.0)
+    args = parser.parse_args(argv)
+
+    if args.role == "master":
+        catalog = LiveCatalog(load_product_db(args.catalog), path=args.catalog)
+        catalog.watch()  # edits of the JSON file (Admin tab, scripts) become deltas
+        serve(CatalogMaster(catalog), args.host, args.port)
+        print(f"✅ Catalog master on {args.host}:{args.port} (version {catalog.version})")
+    else:
+        catalog = LiveCatalog(load_product_db(args.catalog, default={}), path=args.catalog)
+        node = CatalogNode(catalog, HttpTransport(args.master))
+        catalog.subscribe(lambda old, new: print(f"🔄 master v{node.version}: {len(new)} products, "
+                                                 f"{node.bytes_received} bytes received so far"))
+        node.start(args.interval)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
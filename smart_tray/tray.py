@@ -0,0 +1,185 @@
+"""Headless tray / billing engine.
+
+Pure Python, no Gradio or pandas: the UIs, the serial readers and any other
+front-end drive the same ``Tray`` and only render its state when they need to.
+"""
+import csv
+import threading
+
+CURRENCY = "BDT"
+COLUMNS = ["EPC", "Name", "Price", "Qty", "Total"]
+
+
+def normalize_epc(epc):
+    return (epc or "").strip().upper()
+
+
+class TrayBase:
+    """Behaviour shared by every tray backend (``Tray``, ``CompactTray``, ``SqliteTray``).
+
+    Listeners, UI actions, closing a bill and the reads built on ``rows()``
+    and ``summary()``. Subclasses provide ``lock``, ``listeners``, ``get``
+    and the mutations.
+    """
+
+    def subscribe(self, listener):
+        with self.lock:
+            self.listeners = self.listeners + [listener]
+        return listener
+
+    def unsubscribe(self, listener):
+        with self.lock:
+            self.listeners = [l for l in self.listeners if l is not listener]
+
+    def _emit(self, event, epc=None, line=None):
+        for listener in self.listeners:
+            listener(self, event, epc, line)
+
+    def modify(self, epc, action):
+        """Apply a UI action: ``inc``, ``dec`` (never below 1) or ``rem``."""
+        with self.lock:
+            line = self.get(epc)
+            if line is None:
+                return None
+            if action == "inc":
+                return self.set_qty(epc, line["qty"] + 1)
+            if action == "dec":
+                return self.set_qty(epc, max(1, line["qty"] - 1))
+            if action == "rem":
+                return self.set_qty(epc, 0)
+            raise ValueError(f"unknown action: {action}")
+
+    def complete(self):
+        """Close the bill: returns its final snapshot and empties the tray."""
+        with self.lock:
+            bill = self.snapshot()
+            if self.listeners:
+                self._emit("complete", line=bill)
+            self.reset()
+        return bill
+
+    def summary(self):
+        with self.lock:
+            subtotal = self.subtotal
+            discount = self.pricing.discount(subtotal) if self.pricing else 0
+        return {"subtotal": subtotal, "discount": discount, "total": subtotal - discount}
+
+    def snapshot(self):
+        with self.lock:
+            return {"lane": self.lane, "rows": self.rows(), **self.summary(), "version": self.version}
+
+    def write_csv(self, path):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            writer.writerows(self.rows())
+        return path
+
+
+class Tray(TrayBase):
+    def __init__(self, catalog, lane=None):
+        # catalog: any mapping-like object with .get(epc) -> {"name", "price"}
+        self.catalog = catalog
+        self.lane = lane
+        self.items = {}
+        self.subtotal = 0
+        self.version = 0
+        self.lock = threading.RLock()
+        # discount provider with .discount(subtotal), see smart_tray.pricing
+        self.pricing = None
+        # listener(tray, event, epc, line) runs under the tray lock: keep it cheap
+        self.listeners = []
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, epc):
+        return epc in self.items
+
+    def __iter__(self):
+        return iter(list(self.items))
+
+    def get(self, epc):
+        """The tray line for ``epc`` ({"name", "price", "qty"}) or None."""
+        return self.items.get(epc)
+
+    def lines(self):
+        with self.lock:
+            return list(self.items.items())
+
+    # ── MUTATIONS ──────────────────────────────────────────────────────────────
+    def scan(self, epc):
+        """Add one read of ``epc``. Returns the tray line, or None if unknown."""
+        return self._scan(epc, self.catalog)
+
+    def _scan(self, epc, catalog):
+        epc = normalize_epc(epc)
+        product = catalog.get(epc)
+        if product is None:
+            if self.listeners:
+                self._emit("unknown", epc)
+            return None
+        with self.lock:
+            line = self.items.get(epc)
+            if line is None:
+                line = self.items[epc] = {"name": product["name"], "price": product["price"], "qty": 0}
+            line["qty"] += 1
+            self.subtotal += line["price"]
+            self.version += 1
+            if self.listeners:
+                self._emit("scan", epc, line)
+        return line
+
+    def scan_many(self, epcs):
+        """Batch ``scan`` under one lock acquisition. Returns the unknown EPCs."""
+        unknown = []
+        # a live catalog is pinned to one version for the whole batch
+        catalog = getattr(self.catalog, "current", self.catalog)
+        with self.lock:
+            for epc in epcs:
+                if self._scan(epc, catalog) is None:
+                    unknown.append(epc)
+        return unknown
+
+    def set_qty(self, epc, qty):
+        """Set the quantity of a tray line; ``qty <= 0`` removes it."""
+        with self.lock:
+            line = self.items.get(epc)
+            if line is None:
+                return None
+            qty = int(qty)
+            if qty <= 0:
+                del self.items[epc]
+                self.subtotal -= line["price"] * line["qty"]
+                line = None
+            else:
+                self.subtotal += line["price"] * (qty - line["qty"])
+                line["qty"] = qty
+            self.version += 1
+            if self.listeners:
+                self._emit("qty", epc, line)
+        return line
+
+    def reset(self):
+        with self.lock:
+            self.items.clear()
+            self.subtotal = 0
+            self.version += 1
+            if self.listeners:
+                self._emit("reset")
+
+    # ── READS ──────────────────────────────────────────────────────────────────
+    def rows(self):
+        with self.lock:
+            return [
+                [epc, line["name"], line["price"], line["qty"], line["price"] * line["qty"]]
+                for epc, line in self.items.items()
+            ]
+
+
+def summary_text(summary):
+    return (
+        f"Subtotal: {summary['subtotal']:.0f} {CURRENCY}\n"
+        f"Discount: {summary['discount']:.0f} {CURRENCY}\n"
+        f"Total: {summary['total']:.0f} {CURRENCY}"
+    )